@@ -8,13 +8,26 @@ VRChat AI美少女対話システム
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
 from enum import Enum
-import openai
-from pythonosc import udp_client
 import speech_recognition as sr
-import pyttsx3
+from config import config
+from deadline_racing import DeadlineRacer
+from emotion_dynamics import EmotionDynamics
+from context_window import ConversationContext, Message
+from lexicon import Lexicon, LexiconMatch
+from osc_output import OSCParameterBatcher
+from osc_transport import AsyncOSCSender
+from llm_backends import LLMBackend, create_llm_backend
+from memory_store import Memory, MemoryStore
+from response_cache import ResponseCache
+from text_embedding import HashingEmbedder
+from tts_worker import get_tts_worker
+from turn_pipeline import StageMetrics, StageTiming, TurnPipeline
+from sentence_stream import iter_sentences, split_sentences
 
 class EmotionState(Enum):
     """感情状態の定義"""
@@ -35,15 +48,82 @@ class DialogueResponse:
     gesture: str
     voice_tone: float  # 0.0-1.0
     intimacy_level: float  # 0.0-1.0
+    timings: Dict[str, StageTiming] = field(default_factory=dict)  # ステージごとの時間計測
+
+def new_conversation_context() -> ConversationContext:
+    """設定に基づいて会話コンテキストを作成"""
+    return ConversationContext(
+        max_turns=config.max_conversation_history,
+        token_budget=config.context_token_budget,
+        summary_max_tokens=config.context_summary_max_tokens
+    )
+
+@dataclass
+class DialogueSession:
+    """プレイヤーごとの対話状態"""
+    player_id: str
+    emotion_state: EmotionState = EmotionState.CALM
+    intimacy_level: float = 0.0  # 0.0-1.0
+    conversation_history: ConversationContext = field(default_factory=new_conversation_context)
+    last_active: float = field(default_factory=time.monotonic)
+    # 同じプレイヤーのターンを順番に処理するためのロック
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+# 感情分析で優先するカテゴリの順序と対応する感情
+EMOTION_PRIORITY = ("excited", "positive", "negative")
+EMOTION_CATEGORIES = {
+    "excited": EmotionState.EXCITED,
+    "positive": EmotionState.HAPPY,
+    "negative": EmotionState.SAD
+}
 
 class AIDialogueSystem:
     """AI対話システムのメインクラス"""
     
     def __init__(self, vrchat_osc_ip: str = "127.0.0.1", vrchat_osc_port: int = 9000):
-        self.osc_client = udp_client.SimpleUDPClient(vrchat_osc_ip, vrchat_osc_port)
-        self.emotion_state = EmotionState.CALM
-        self.intimacy_level = 0.0
-        self.conversation_history = []
+        # ノンブロッキングのOSC送信（有界キュー付き）
+        self.osc_sender = AsyncOSCSender(vrchat_osc_ip, vrchat_osc_port)
+        # パラメータ更新をバンドルにまとめ、変化したものだけ送る
+        self.osc_output = OSCParameterBatcher(self.osc_sender)
+        # 単一プレイヤー用の既定セッション（複数プレイヤーはSessionManagerで管理）
+        self.session = DialogueSession(player_id="local")
+        # LLMバックエンド（接続プールを持つクライアントをプロセス内で使い回す）
+        self.llm_backend: LLMBackend = create_llm_backend()
+        # 最初のトークンが遅い場合の予備リクエストとつなぎの言葉
+        self.racer = DeadlineRacer(
+            self.llm_backend,
+            backup=create_llm_backend(config.llm_backup_backend) if config.llm_backup_backend else None,
+            hedge_after=config.llm_hedge_after,
+            deadline=config.response_deadline
+        ) if config.response_deadline_enabled else None
+        # 同時に実行するLLM呼び出し数の上限
+        self.llm_semaphore = asyncio.Semaphore(config.max_concurrent_llm_requests)
+        # 感情・親密度判定用のキーワード辞書（起動時に一度だけコンパイル）
+        self.lexicon = Lexicon(config.lexicon_categories)
+        # よくある発話への応答キャッシュ
+        self.response_cache = ResponseCache(
+            max_entries=config.response_cache_size,
+            ttl=config.response_cache_ttl,
+            similarity_threshold=config.response_cache_similarity,
+            intimacy_bands=config.response_cache_intimacy_bands
+        ) if config.response_cache_enabled else None
+        # プレイヤーごとの長期記憶
+        self.memory_store = MemoryStore(
+            config.memory_db_path,
+            embedder=HashingEmbedder(config.memory_embedding_dim),
+            min_score=config.memory_min_score
+        ) if config.memory_enabled else None
+        self._background_tasks = set()
+        # 全セッションの感情の強さ（時間とともに減衰し、発話やタッチで押し上げられる）
+        self.emotion_dynamics = EmotionDynamics(
+            [emotion.value for emotion in EmotionState], EmotionState.CALM.value,
+            on_change=self._on_emotion_change
+        )
+        self._emotion_sessions: Dict[str, DialogueSession] = {}
+        # VRChatから受信したアバターパラメータの最新値
+        self.avatar_parameters: Dict[str, Any] = {}
+        # ターン処理の各ステージの完了時刻
+        self.stage_metrics = StageMetrics()
         self.personality_traits = {
             "friendliness": 0.8,
             "shyness": 0.6,
@@ -51,123 +131,294 @@ class AIDialogueSystem:
             "intelligence": 0.9
         }
         
-        # 音声認識と合成の初期化
+        # 音声認識の初期化（読み上げはプロセスで共有するpyttsx3ワーカーを使う）
         self.recognizer = sr.Recognizer()
-        self.tts_engine = pyttsx3.init()
-        self.setup_voice()
+        self.tts_worker = get_tts_worker()
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
-    def setup_voice(self):
-        """音声合成の設定"""
-        voices = self.tts_engine.getProperty('voices')
-        # 女性の声を選択（利用可能な場合）
-        for voice in voices:
-            if 'female' in voice.name.lower() or 'woman' in voice.name.lower():
-                self.tts_engine.setProperty('voice', voice.id)
-                break
-        
-        self.tts_engine.setProperty('rate', 150)  # 話速
-        self.tts_engine.setProperty('volume', 0.8)  # 音量
+    @property
+    def emotion_state(self) -> EmotionState:
+        return self.session.emotion_state
+    
+    @emotion_state.setter
+    def emotion_state(self, value: EmotionState):
+        self.session.emotion_state = value
+    
+    @property
+    def intimacy_level(self) -> float:
+        return self.session.intimacy_level
     
-    async def process_input(self, user_input: str) -> DialogueResponse:
-        """ユーザー入力を処理して応答を生成"""
-        self.conversation_history.append({"role": "user", "content": user_input})
+    @intimacy_level.setter
+    def intimacy_level(self, value: float):
+        self.session.intimacy_level = value
+    
+    @property
+    def conversation_history(self) -> ConversationContext:
+        return self.session.conversation_history
+    
+    async def process_input(self, user_input: str,
+                            on_sentence: Optional[Callable[[str, str], Awaitable[None]]] = None,
+                            session: Optional[DialogueSession] = None) -> DialogueResponse:
+        """ユーザー入力を処理して応答を生成
         
-        # 感情分析
-        detected_emotion = await self.analyze_emotion(user_input)
+        on_sentenceを指定するとストリーミングモードになり、応答の各文が
+        生成され次第 on_sentence(文, 感情) として渡される。
+        sessionを省略すると既定セッションの状態を使用する
+        """
+        session = session or self.session
+        session.last_active = time.monotonic()
         
-        # 親密度の更新
-        self.update_intimacy(user_input)
+        # 感情分析と親密度判定のキーワードを1回の走査で検出
+        lexicon_match = self.lexicon.match(user_input)
         
-        # AI応答の生成
-        response_text = await self.generate_response(user_input)
+        async def emotion_stage():
+            # 検出した感情で感情状態を押し上げ、その時点で優勢な感情を使う
+            return self.feel(await self.analyze_emotion(user_input, lexicon_match), session)
         
-        # ジェスチャーの決定
-        gesture = self.determine_gesture(detected_emotion, response_text)
+        async def generate(intimacy, emotion):
+            # AI応答の生成（プロンプトとキャッシュキーが親密度に依存する）
+            if on_sentence is None:
+                return await self.generate_response(user_input, session)
+            sentences = []
+            fillers: List[str] = []
+            skipped = 0
+            async for sentence in iter_sentences(self.generate_response_stream(user_input, session, fillers)):
+                await on_sentence(sentence, emotion.value)
+                # つなぎの言葉は読み上げるだけで、応答の本文（履歴・返り値）には含めない
+                filler_sentences = [part for filler in fillers for part in split_sentences(filler)]
+                if skipped < len(filler_sentences) and sentence == filler_sentences[skipped]:
+                    skipped += 1
+                    continue
+                sentences.append(sentence)
+            return "".join(sentences)
         
-        response = DialogueResponse(
-            text=response_text,
-            emotion=detected_emotion,
-            gesture=gesture,
-            voice_tone=self.calculate_voice_tone(),
-            intimacy_level=self.intimacy_level
-        )
+        def record_history(response_text):
+            # 今回のやり取りを履歴に追加し、あふれた分はバックグラウンドで要約
+            session.conversation_history.append({"role": "user", "content": user_input})
+            session.conversation_history.append({"role": "assistant", "content": response_text})
+            session.conversation_history.schedule_summary(
+                self.summarize_history if config.context_summary_use_llm else None
+            )
+            self.remember_turn(user_input, session)
         
-        # VRChatに送信
-        await self.send_to_vrchat(response)
+        async def finalize(emotion, gesture, response_text, intimacy):
+            response = DialogueResponse(
+                text=response_text,
+                emotion=emotion,
+                gesture=gesture,
+                voice_tone=self.calculate_voice_tone(session),
+                intimacy_level=session.intimacy_level
+            )
+            # VRChatに送信
+            await self.send_to_vrchat(response)
+            return response
         
+        # 感情が分かった時点でアバターの反応を先に送り、LLMの応答生成と並行させる
+        pipeline = (
+            TurnPipeline()
+            .add_stage("emotion", emotion_stage)
+            .add_stage("intimacy", lambda: self.update_intimacy(user_input, session, lexicon_match))
+            .add_stage("gesture", lambda emotion: self.determine_gesture(emotion, ""), after=["emotion"])
+            .add_stage("early_osc", self.send_reaction_to_vrchat, after=["emotion", "gesture"])
+            .add_stage("response_text", generate, after=["intimacy", "emotion"])
+            .add_stage("history", record_history, after=["response_text"])
+            .add_stage("response", finalize, after=["emotion", "gesture", "response_text", "intimacy"])
+        )
+        results, timings = await pipeline.run()
+        self.stage_metrics.record(timings)
+        
+        response = results["response"]
+        response.timings = timings
         return response
     
-    async def analyze_emotion(self, text: str) -> EmotionState:
+    async def analyze_emotion(self, text: str, lexicon_match: Optional[LexiconMatch] = None) -> EmotionState:
         """テキストから感情を分析"""
         # 簡単な感情分析（実際にはより高度なNLPを使用）
-        positive_words = ["嬉しい", "楽しい", "好き", "愛してる", "ありがとう"]
-        negative_words = ["悲しい", "つらい", "嫌い", "怒り", "疲れた"]
-        excited_words = ["すごい", "やった", "最高", "興奮"]
-        
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in excited_words):
-            return EmotionState.EXCITED
-        elif any(word in text_lower for word in positive_words):
-            return EmotionState.HAPPY
-        elif any(word in text_lower for word in negative_words):
-            return EmotionState.SAD
-        else:
-            return EmotionState.CALM
+        if lexicon_match is None:
+            lexicon_match = self.lexicon.match(text)
+        category = lexicon_match.first(EMOTION_PRIORITY)
+        return EMOTION_CATEGORIES.get(category, EmotionState.CALM)
     
-    def update_intimacy(self, user_input: str):
+    def analyze_emotions_batch(self, texts: List[str]) -> List[EmotionState]:
+        """複数の発話（チャットログなど）の感情をまとめて分析"""
+        categories = self.lexicon.classify_batch(texts, EMOTION_PRIORITY)
+        return [EMOTION_CATEGORIES.get(category, EmotionState.CALM) for category in categories]
+    
+    def update_intimacy(self, user_input: str, session: Optional[DialogueSession] = None,
+                        lexicon_match: Optional[LexiconMatch] = None):
         """親密度を更新"""
-        # 会話の長さと内容に基づいて親密度を調整
-        intimate_words = ["好き", "愛してる", "大切", "特別"]
-        if any(word in user_input for word in intimate_words):
-            self.intimacy_level = min(1.0, self.intimacy_level + 0.1)
-        else:
-            self.intimacy_level = min(1.0, self.intimacy_level + 0.01)
+        session = session or self.session
+        if lexicon_match is None:
+            lexicon_match = self.lexicon.match(user_input)
+        # 会話の長さと内容に基づいて親密度を調整（親密な言葉は10倍）
+        growth = config.intimacy_growth_rate * (10 if lexicon_match.has("intimate") else 1)
+        session.intimacy_level = min(1.0, session.intimacy_level + growth)
     
-    async def generate_response(self, user_input: str) -> str:
-        """AI応答を生成"""
-        # キャラクター設定を含むプロンプト
+    def feel(self, emotion: EmotionState, session: Optional[DialogueSession] = None,
+             intensity: Optional[float] = None) -> EmotionState:
+        """感情イベントを感情状態に加え、優勢な感情を返す"""
+        session = session or self.session
+        self._emotion_sessions[session.player_id] = session
+        amount = config.emotion_event_intensity if intensity is None else intensity
+        session.emotion_state = EmotionState(self.emotion_dynamics.push(session.player_id, emotion.value, amount))
+        return session.emotion_state
+    
+    def _on_emotion_change(self, player_id: str, emotion: str):
+        """時間経過で優勢な感情が変わった時にセッションとアバターへ反映"""
+        session = self._emotion_sessions.get(player_id)
+        if session is None:
+            return
+        session.emotion_state = EmotionState(emotion)
+        self.osc_output.set("/avatar/parameters/emotion", emotion)
+    
+    def release_session(self, player_id: str):
+        """破棄されたセッションの感情状態を解放"""
+        self._emotion_sessions.pop(player_id, None)
+        self.emotion_dynamics.release(player_id)
+    
+    def build_messages(self, user_input: str, session: Optional[DialogueSession] = None,
+                       memories: Optional[List[Memory]] = None) -> List[Message]:
+        """キャラクター設定を含むプロンプトを組み立て"""
+        session = session or self.session
         system_prompt = f"""
         あなたは可愛い美少女AIです。以下の特徴を持っています：
         - 親しみやすさ: {self.personality_traits['friendliness']}
         - 恥ずかしがり: {self.personality_traits['shyness']}
         - 遊び心: {self.personality_traits['playfulness']}
         - 知性: {self.personality_traits['intelligence']}
-        - 現在の親密度: {self.intimacy_level}
+        - 現在の親密度: {session.intimacy_level}
         
         自然で魅力的な会話を心がけ、感情豊かに応答してください。
         """
         
-        try:
-            # OpenAI APIを使用（実際の実装では適切なAPIキーが必要）
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    *self.conversation_history[-10:],  # 最近の10件の会話履歴
-                    {"role": "user", "content": user_input}
+        if memories:
+            remembered = "\n".join(f"- {memory.text}" for memory in memories)
+            system_prompt += f"\n相手について覚えていること:\n{remembered}\n"
+        
+        # トークン予算内に収まる直近の会話履歴と今回の入力
+        return session.conversation_history.build_messages(system_prompt, user_input)
+    
+    async def summarize_history(self, previous_summary: str, messages: List[Message]) -> str:
+        """古い会話をLLMで要約（応答生成とは別タスクで実行される）"""
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        async with self.llm_semaphore:
+            return await self.llm_backend.complete(
+                [
+                    {"role": "system", "content": "以下の会話の要点を、これまでの要約と合わせて簡潔な日本語でまとめてください。"},
+                    {"role": "user", "content": f"これまでの要約:\n{previous_summary}\n\n会話:\n{transcript}"}
                 ],
-                max_tokens=150,
-                temperature=0.8
+                max_tokens=config.context_summary_max_tokens,
+                temperature=0.3
             )
-            return response.choices[0].message.content
+    
+    async def recall_memories(self, user_input: str, session: Optional[DialogueSession] = None) -> List[Memory]:
+        """今回の入力に関連する長期記憶を検索"""
+        if self.memory_store is None:
+            return []
+        session = session or self.session
+        try:
+            return await self.memory_store.search(session.player_id, user_input, config.memory_top_k)
+        except Exception as e:
+            self.logger.error(f"記憶検索エラー: {e}")
+            return []
+    
+    def remember_turn(self, user_input: str, session: Optional[DialogueSession] = None):
+        """発言をバックグラウンドで長期記憶に保存"""
+        if self.memory_store is None:
+            return
+        session = session or self.session
+        self._spawn(self._store_memory(session.player_id, user_input))
+    
+    async def _store_memory(self, player_id: str, user_input: str):
+        """長期記憶への保存（失敗しても対話は続ける）"""
+        try:
+            await self.memory_store.remember_turn(player_id, user_input)
+        except Exception as e:
+            self.logger.error(f"記憶保存エラー: {e}")
+    
+    def lookup_cached_response(self, user_input: str, session: Optional[DialogueSession] = None) -> Optional[str]:
+        """応答キャッシュを検索"""
+        if self.response_cache is None:
+            return None
+        session = session or self.session
+        return self.response_cache.lookup(user_input, session.intimacy_level, session.emotion_state.value)
+    
+    def store_cached_response(self, user_input: str, response_text: str,
+                              session: Optional[DialogueSession] = None):
+        """LLMの応答をキャッシュに保存"""
+        if self.response_cache is None or not response_text:
+            return
+        session = session or self.session
+        self.response_cache.store(user_input, session.intimacy_level, session.emotion_state.value, response_text)
+    
+    async def generate_response(self, user_input: str, session: Optional[DialogueSession] = None) -> str:
+        """AI応答を生成"""
+        # 相手の記憶を使った応答は他のプレイヤーに返せないので、キャッシュは記憶が無いときだけ使う
+        memories = await self.recall_memories(user_input, session)
+        if not memories:
+            cached = self.lookup_cached_response(user_input, session)
+            if cached is not None:
+                return cached
+        
+        try:
+            # 設定されたLLMバックエンドを使用
+            async with self.llm_semaphore:
+                response_text = await self.llm_backend.complete(
+                    self.build_messages(user_input, session, memories)
+                )
+            if not memories:
+                self.store_cached_response(user_input, response_text, session)
+            return response_text
         except Exception as e:
             self.logger.error(f"AI応答生成エラー: {e}")
             return self.get_fallback_response(user_input)
     
+    async def generate_response_stream(self, user_input: str, session: Optional[DialogueSession] = None,
+                                       fillers: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """AI応答をトークン単位でストリーミング生成
+
+        fillers を渡すと、締め切りを過ぎて話したつなぎの言葉をそこへ追加する
+        """
+        memories = await self.recall_memories(user_input, session)
+        if not memories:
+            cached = self.lookup_cached_response(user_input, session)
+            if cached is not None:
+                yield cached
+                return
+        
+        tokens = []
+        try:
+            messages = self.build_messages(user_input, session, memories)
+            async with self.llm_semaphore:
+                if self.racer is not None:
+                    # 締め切りを過ぎたらつなぎの言葉を先に話し、本来の応答を続けて話す
+                    async for source, token in self.racer.stream(
+                        messages,
+                        filler=random.choice(config.filler_phrases) + "\n",
+                        fallback=self.get_fallback_response(user_input)
+                    ):
+                        if source in ("primary", "hedge"):
+                            tokens.append(token)
+                        elif source == "filler" and fillers is not None:
+                            fillers.append(token)
+                        yield token
+                else:
+                    async for token in self.llm_backend.stream(messages):
+                        tokens.append(token)
+                        yield token
+            if not memories:
+                self.store_cached_response(user_input, "".join(tokens), session)
+        except Exception as e:
+            self.logger.error(f"AIストリーミング応答エラー: {e}")
+            # 途中まで生成済みの場合はそのまま終了し、何も無ければフォールバック
+            if not tokens:
+                yield self.get_fallback_response(user_input)
+    
     def get_fallback_response(self, user_input: str) -> str:
-        """フォールバック応答"""
-        fallback_responses = [
-            "そうなんですね！もっと教えてください♪",
-            "面白いお話ですね〜",
-            "あなたと話していると楽しいです！",
-            "えへへ、そういうことなんですね♡"
-        ]
-        import random
-        return random.choice(fallback_responses)
+        """フォールバック応答（音声は起動時に事前合成される）"""
+        return random.choice(config.fallback_responses)
     
     def determine_gesture(self, emotion: EmotionState, response_text: str) -> str:
         """感情と応答に基づいてジェスチャーを決定"""
@@ -181,8 +432,9 @@ class AIDialogueSystem:
         }
         return gesture_map.get(emotion, "idle")
     
-    def calculate_voice_tone(self) -> float:
+    def calculate_voice_tone(self, session: Optional[DialogueSession] = None) -> float:
         """声のトーンを計算"""
+        session = session or self.session
         base_tone = 0.5
         emotion_modifier = {
             EmotionState.HAPPY: 0.2,
@@ -191,36 +443,95 @@ class AIDialogueSystem:
             EmotionState.SAD: -0.2,
             EmotionState.LOVE: 0.1
         }
-        modifier = emotion_modifier.get(self.emotion_state, 0)
-        return max(0.0, min(1.0, base_tone + modifier + (self.intimacy_level * 0.2)))
+        modifier = emotion_modifier.get(session.emotion_state, 0)
+        return max(0.0, min(1.0, base_tone + modifier + (session.intimacy_level * 0.2)))
+    
+    async def send_reaction_to_vrchat(self, emotion: EmotionState, gesture: str):
+        """応答より先に感情とジェスチャーだけをVRChatに送信"""
+        self.osc_output.set_many({
+            "/avatar/parameters/emotion": emotion.value,
+            "/avatar/parameters/gesture": gesture
+        })
+        self.osc_output.flush()
+    
+    def handle_avatar_parameter(self, address: str, value: Any = None):
+        """VRChatから受信したアバターパラメータを反映（OSC受信ハンドラ）
+
+        パラメータ更新は高頻度で届くため、値の記録だけをその場で行い、
+        触れられた・近づかれた瞬間だけリアクションを送る
+        """
+        name = address.rsplit("/", 1)[-1]
+        previous = self.avatar_parameters.get(name)
+        self.avatar_parameters[name] = value
+
+        if name in config.osc_touch_parameters:
+            if value and not previous:
+                self._spawn(self.react_to_touch(name))
+        elif name == config.osc_proximity_parameter and isinstance(value, (int, float)):
+            threshold = config.osc_proximity_threshold
+            if value > threshold and not (isinstance(previous, (int, float)) and previous > threshold):
+                self._spawn(self.react_to_approach())
+    
+    def _spawn(self, coro: Awaitable):
+        """バックグラウンドタスクとして実行"""
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def react_to_touch(self, parameter: str, session: Optional[DialogueSession] = None):
+        """アバターに触れられた時のリアクション"""
+        session = session or self.session
+        if session.intimacy_level >= 0.6:
+            emotion = EmotionState.LOVE
+        elif session.intimacy_level >= 0.3:
+            emotion = EmotionState.HAPPY
+        else:
+            emotion = EmotionState.SHY
+        emotion = self.feel(emotion, session)
+        self.logger.info(f"タッチを検出: {parameter} -> {emotion.value}")
+        await self.send_reaction_to_vrchat(emotion, self.determine_gesture(emotion, ""))
+    
+    async def react_to_approach(self, session: Optional[DialogueSession] = None):
+        """近づかれた時のリアクション"""
+        session = session or self.session
+        emotion = EmotionState.HAPPY if session.intimacy_level >= 0.3 else EmotionState.SURPRISED
+        emotion = self.feel(emotion, session)
+        self.logger.info(f"接近を検出: {emotion.value}")
+        await self.send_reaction_to_vrchat(emotion, self.determine_gesture(emotion, ""))
     
     async def send_to_vrchat(self, response: DialogueResponse):
         """VRChatにOSC経由でデータを送信"""
-        try:
-            # 感情状態を送信
-            self.osc_client.send_message("/avatar/parameters/emotion", response.emotion.value)
-            
-            # ジェスチャーを送信
-            self.osc_client.send_message("/avatar/parameters/gesture", response.gesture)
-            
-            # 親密度を送信
-            self.osc_client.send_message("/avatar/parameters/intimacy", response.intimacy_level)
-            
-            # 音声トーンを送信
-            self.osc_client.send_message("/avatar/parameters/voice_tone", response.voice_tone)
-            
-            self.logger.info(f"VRChatに送信: {response.emotion.value}, {response.gesture}")
-            
-        except Exception as e:
-            self.logger.error(f"OSC送信エラー: {e}")
+        # 感情・ジェスチャー・親密度・音声トーンを1つのバンドルで送信（変化の無い値は省略）
+        self.osc_output.set_many({
+            "/avatar/parameters/emotion": response.emotion.value,
+            "/avatar/parameters/gesture": response.gesture,
+            "/avatar/parameters/intimacy": response.intimacy_level,
+            "/avatar/parameters/voice_tone": response.voice_tone
+        })
+        sent = self.osc_output.flush()
+        
+        self.logger.info(f"VRChatに送信: {response.emotion.value}, {response.gesture} ({sent}件)")
+    
+    async def close(self):
+        """OSC出力・LLMの接続・長期記憶を閉じる"""
+        await self.emotion_dynamics.close()
+        await self.osc_output.close()
+        await self.osc_sender.close()
+        await self.llm_backend.aclose()
+        if self.racer is not None and self.racer.backup is not None:
+            await self.racer.backup.aclose()
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        if self.memory_store is not None:
+            self.memory_store.close()
     
-    def speak(self, text: str):
+    async def speak(self, text: str) -> bool:
         """テキストを音声で読み上げ"""
         try:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
+            return await self.tts_worker.speak(text, config.voice_rate, config.voice_volume)
         except Exception as e:
             self.logger.error(f"音声合成エラー: {e}")
+            return False
 
 # 使用例
 async def main():
@@ -239,7 +550,7 @@ async def main():
         print(f"感情: {response.emotion.value}, ジェスチャー: {response.gesture}")
         
         # 音声で応答
-        ai_system.speak(response.text)
+        await ai_system.speak(response.text)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
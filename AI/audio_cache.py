@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音声キャッシュ
+合成済みの音声をディスクに保存し、同じ（エンジン・話者・感情設定・テキスト）の
+読み上げでは再合成せずに使い回す。ファイル名は内容のキーのハッシュ
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from metrics import LatencyStats
+
+_SUFFIX = ".audio"
+
+
+def audio_cache_key(engine: str, voice: Any, settings: Any, text: str) -> str:
+    """キャッシュキー（SHA-256の16進文字列）"""
+    material = json.dumps([engine, voice, settings, text], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """バイト数上限付きのLRUディスクキャッシュ
+
+    - 起動時にディレクトリを走査してメモリ上の索引（キー -> サイズ）を作る
+    - 読み出しはmmapで行い、ファイル全体をコピーしない
+    - 合計サイズが max_bytes を超えたら最も長く使われていないものから削除する
+    - 最終使用時刻はファイルの更新時刻に記録し、再起動後もLRU順を保つ
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+
+        # 統計
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_latency = LatencyStats()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _load_index(self):
+        """ディレクトリ内のファイルを最終使用時刻順に索引へ登録"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len(_SUFFIX)], stat.st_size))
+            elif entry.name.endswith(".tmp"):
+                os.remove(entry.path)  # 書き込み途中で終了した残骸
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+        self._evict()
+        if self._index:
+            self.logger.info(f"音声キャッシュを読み込み: {len(self._index)}件 ({self.total_bytes / 1024 / 1024:.1f}MB)")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: str) -> Optional[mmap.mmap]:
+        """キャッシュされた音声を読み取り専用のmmapで返す（無ければNone）
+
+        mmapはファイルオブジェクトとしても bytes-like としても使える
+        """
+        start = time.perf_counter()
+        if key not in self._index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            # 外部から削除された・空ファイルなど
+            self.total_bytes -= self._index.pop(key)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        self.hit_latency.record(time.perf_counter() - start)
+        return data
+
+    def put(self, key: str, data: bytes) -> bool:
+        """音声を保存（書き込み途中のファイルは見えないように置き換える）"""
+        if not data or len(data) > self.max_bytes or not self._write(key, data):
+            return False
+        self._add(key, len(data))
+        return True
+
+    async def put_async(self, key: str, data: bytes) -> bool:
+        """ファイルの書き込みを別スレッドで行って保存（索引の更新はイベントループ上で行う）"""
+        if not data or len(data) > self.max_bytes:
+            return False
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self._write, key, data):
+            return False
+        self._add(key, len(data))
+        return True
+
+    def _write(self, key: str, data: bytes) -> bool:
+        """ファイルに書き込む（ディスクが一杯・置き換え先が使用中などで失敗したらFalse）"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            return True
+        except OSError as e:
+            self.logger.warning(f"音声キャッシュへの保存に失敗: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+    def _add(self, key: str, size: int):
+        if key in self._index:
+            self.total_bytes -= self._index.pop(key)
+        self._index[key] = size
+        self.total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """上限を超えた分を古いものから削除"""
+        while self.total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                # 再生中でファイルを消せない場合は次回起動時に改めて削除される
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """件数・サイズ・ヒット率・ヒット時の読み出し時間"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "hit_p95_ms": self.hit_latency.percentile(95) * 1000.0
+        }
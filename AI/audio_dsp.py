@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音声の後処理（DSP）
+合成済みのPCMに、感情と声のトーンに応じたピッチ・話速・音量の調整をかける。
+感情ごとに合成し直さなくても、1つの基本音声からすべての感情の声を作れる
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio_output import PCMClip, parse_wav
+from config import config
+from metrics import LatencyStats
+
+
+@dataclass
+class VoiceEffect:
+    """1つの文にかける調整"""
+    pitch: float = 0.0  # 半音
+    tempo: float = 1.0  # 1.0より大きいと速く話す
+    loudness: float = 0.0  # 目標音量からの増減（dB）
+
+
+# 感情ごとの (ピッチ[半音], 話速, 音量[dB])
+EMOTION_EFFECTS: Dict[str, VoiceEffect] = {
+    "happy": VoiceEffect(1.0, 1.05, 1.0),
+    "excited": VoiceEffect(2.0, 1.12, 2.0),
+    "sad": VoiceEffect(-1.5, 0.9, -3.0),
+    "shy": VoiceEffect(0.5, 0.95, -4.0),
+    "angry": VoiceEffect(-0.5, 1.08, 3.0),
+    "love": VoiceEffect(1.0, 0.95, -1.0),
+    "calm": VoiceEffect()
+}
+
+
+def time_stretch(samples: np.ndarray, tempo: float, hop: int) -> np.ndarray:
+    """ピッチを変えずに長さを 1/tempo 倍にする（WSOLA）
+
+    50%重なりのハン窓で切り出した区間を、1つ前の区間の自然な続きと最も
+    よく重なる位置（±hop/2）にずらしてから重ね合わせる。候補の切り出しと
+    正規化は行列演算でまとめて行い、ずらす量を決める部分だけを区間ごとに回す
+    """
+    if abs(tempo - 1.0) < 1e-3 or len(samples) < 2 * hop:
+        return samples
+    size = 2 * hop
+    tolerance = hop // 2
+    # 位置合わせは声の基本周波数が分かれば十分なので、相関は約3kHz相当に間引き、
+    # ずらす量も数サンプル単位で探す
+    step = max(1, hop // 30)
+    offset_step = max(1, step // 4)
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(size) / size)).astype(np.float32)
+
+    count = int((len(samples) - size) / (hop * tempo)) + 1
+    starts = np.round(np.arange(count) * hop * tempo).astype(np.intp) + tolerance
+    padded = np.pad(samples, (tolerance, size + tolerance))
+
+    if count > 1:
+        segments = sliding_window_view(padded, hop)[:, ::step]
+        offsets = np.arange(-tolerance, tolerance + 1, offset_step)
+        candidates = segments[starts[1:, None] + offsets[None, :]]
+        norms = np.sqrt(np.einsum("kdm,kdm->kd", candidates, candidates)) + 1e-9
+        # 前の区間を実際にずらした位置の続きと比べるため、ここだけは順番に決める
+        for k in range(1, count):
+            reference = segments[starts[k - 1] + hop]
+            starts[k] += offsets[np.argmax((candidates[k - 1] @ reference) / norms[k - 1])]
+
+    frames = sliding_window_view(padded, size)[starts]
+    frames = frames * window
+    output = np.zeros((count + 1) * hop, dtype=np.float32)
+    output[:count * hop].reshape(count, hop)[:] += frames[:, :hop]
+    output[hop:].reshape(count, hop)[:] += frames[:, hop:]
+    return output
+
+
+def resample(samples: np.ndarray, ratio: float) -> np.ndarray:
+    """入力 ratio サンプルごとに1サンプル出力する（線形補間）"""
+    if abs(ratio - 1.0) < 1e-6:
+        return samples
+    positions = np.arange(int(len(samples) / ratio), dtype=np.float64) * ratio
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def normalize_loudness(samples: np.ndarray, target_db: float, ceiling_db: float = -1.0) -> np.ndarray:
+    """有音部分のRMSを target_db（dBFS）に合わせる（ピークは ceiling_db まで、その場で変更）"""
+    voiced = samples[np.abs(samples) > 1e-3]
+    if len(voiced) == 0:
+        return samples
+    rms = float(np.sqrt(np.mean(voiced * voiced)))
+    gain = 10 ** (target_db / 20) / rms
+    peak = float(np.max(np.abs(samples))) * gain
+    ceiling = 10 ** (ceiling_db / 20)
+    if peak > ceiling:
+        gain *= ceiling / peak
+    samples *= gain
+    return samples
+
+
+class VoiceProcessor:
+    """感情と声のトーンから調整を決め、合成済みの音声にかける"""
+
+    def __init__(self, sample_rate: Optional[int] = None):
+        self.sample_rate = sample_rate or config.audio_output_sample_rate
+        self.logger = logging.getLogger(__name__)
+        self.latency = LatencyStats()  # 1文の処理時間
+
+    def effect_for(self, emotion: str, tone: Optional[float] = None) -> VoiceEffect:
+        """感情の調整に声のトーン（0.0〜1.0、0.5が基準）によるピッチを加える
+
+        トーンは感情を反映済みなので、指定された場合はピッチをトーンだけで決める
+        """
+        base = EMOTION_EFFECTS.get(emotion, EMOTION_EFFECTS["calm"])
+        pitch = base.pitch if tone is None else (tone - 0.5) * config.tts_dsp_tone_semitones
+        return VoiceEffect(pitch, base.tempo, base.loudness)
+
+    def apply(self, audio: Any, emotion: str = "neutral", tone: Optional[float] = None) -> PCMClip:
+        """WAVデータ（またはPCMClip）を調整し、出力のサンプリングレートのPCMClipを返す"""
+        start = time.perf_counter()
+        clip = audio if isinstance(audio, PCMClip) else parse_wav(audio)
+        effect = self.effect_for(emotion, tone)
+
+        pcm = np.frombuffer(clip.samples, dtype="<i2")
+        if clip.channels > 1:
+            pcm = pcm.reshape(-1, clip.channels).mean(axis=1)
+        samples = pcm.astype(np.float32)
+        samples *= 1.0 / 32768
+
+        # ピッチは「長さを変えて再生速度で戻す」ので、話速と合わせて1回ずつ伸縮・補間する
+        pitch_ratio = 2 ** (effect.pitch / 12)
+        hop = max(16, clip.sample_rate // 100)
+        samples = time_stretch(samples, effect.tempo / pitch_ratio, hop)
+        samples = resample(samples, pitch_ratio * clip.sample_rate / self.sample_rate)
+        normalize_loudness(samples, config.tts_dsp_loudness_db + effect.loudness)
+
+        samples *= 32767
+        output = samples.astype("<i2")
+        self.latency.record(time.perf_counter() - start)
+        return PCMClip(memoryview(output).cast("B"), self.sample_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        """1文あたりの処理時間"""
+        return self.latency.summary()
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音声出力ステージ
+プロセスで1つの出力デバイスを開いたままにし、PCMの音声をコピーせずに
+チャンネルごとのキューへ積む。デバイスのコールバックがキューから読み出して
+ミックスし、再生が終わったクリップはasyncioのFutureで通知する
+"""
+
+import asyncio
+import logging
+import struct
+import threading
+import time
+import wave
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from config import config
+from metrics import LatencyStats
+
+
+@dataclass
+class PCMClip:
+    """16bit PCMの音声（samplesは元データのmemoryview）"""
+    samples: memoryview
+    sample_rate: int
+    channels: int = 1
+    lip_sync: Any = None  # 再生前に解析した口の動き（LipSyncTrack）
+
+
+def parse_wav(data) -> PCMClip:
+    """WAVデータ（bytes/mmapなど）のdataチャンクをコピーせずに参照する"""
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("WAV形式ではありません")
+    offset = 12
+    sample_rate = channels = bits = None
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        size = struct.unpack_from("<I", view, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate = struct.unpack_from("<HHI", view, body)
+            bits = struct.unpack_from("<H", view, body + 14)[0]
+            if audio_format != 1 or bits != 16:
+                raise ValueError("16bit PCM以外のWAVには対応していません")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError("fmtチャンクがありません")
+            end = min(body + size, len(view))
+            end -= (end - body) % (2 * channels)
+            return PCMClip(view[body:end], sample_rate, channels)
+        offset = body + size + (size & 1)
+    raise ValueError("dataチャンクがありません")
+
+
+def wav_header(data_size: int, sample_rate: int, channels: int = 1) -> bytes:
+    """16bit PCMのWAVヘッダー"""
+    block_align = 2 * channels
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, channels,
+        sample_rate, sample_rate * block_align, block_align, 16, b"data", data_size
+    )
+
+
+class WavStreamDecoder:
+    """分割して届くWAV（またはヘッダーの無い16bit PCM）を届いた分ずつPCMClipにする
+
+    sample_rate を指定するとヘッダーの無いPCMとして扱う
+    """
+
+    def __init__(self, sample_rate: Optional[int] = None, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._header = sample_rate is None
+        self._buffer = bytearray()
+        self._remaining: Optional[int] = None  # dataチャンクの残り（不明ならNone）
+
+    def feed(self, data: bytes) -> Optional[PCMClip]:
+        """受信したデータを渡し、再生できるようになった分を返す（まだ無ければNone）"""
+        self._buffer += data
+        if self._header and not self._parse_header():
+            return None
+        available = len(self._buffer)
+        if self._remaining is not None:
+            available = min(available, self._remaining)
+        available -= available % (2 * self.channels)
+        if available <= 0:
+            return None
+        samples = bytes(self._buffer[:available])
+        del self._buffer[:available]
+        if self._remaining is not None:
+            self._remaining -= available
+        return PCMClip(memoryview(samples), self.sample_rate, self.channels)
+
+    def _parse_header(self) -> bool:
+        """dataチャンクの手前までを読み、読み終えたらTrue"""
+        view = memoryview(self._buffer)
+        try:
+            if len(view) < 12:
+                return False
+            if bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+                raise ValueError("WAV形式ではありません")
+            offset = 12
+            while offset + 8 <= len(view):
+                chunk_id = bytes(view[offset:offset + 4])
+                size = struct.unpack_from("<I", view, offset + 4)[0]
+                body = offset + 8
+                if chunk_id == b"data":
+                    if self.sample_rate is None:
+                        raise ValueError("fmtチャンクがありません")
+                    # ストリーミングではサイズが未定（0や0xFFFFFFFF）のことがある
+                    self._remaining = size if 0 < size < 0xFFFFFFFF else None
+                    offset = body
+                    break
+                if len(view) < body + size:
+                    return False
+                if chunk_id == b"fmt ":
+                    audio_format, self.channels, self.sample_rate = struct.unpack_from("<HHI", view, body)
+                    bits = struct.unpack_from("<H", view, body + 14)[0]
+                    if audio_format != 1 or bits != 16:
+                        raise ValueError("16bit PCM以外のWAVには対応していません")
+                offset = body + size + (size & 1)
+            else:
+                return False
+        finally:
+            view.release()
+        del self._buffer[:offset]
+        self._header = False
+        return True
+
+
+class PCMStream:
+    """受信しながら再生する音声（合成中の音声を受け取る側と再生する側の間の有界バッファ）
+
+    write() はバッファが max_frames を超えている間は待つので、受信が再生より速くても
+    メモリに溜め込まない。再生されずに捨てられた場合は close() で受信も止める
+    """
+
+    def __init__(self, output: "AudioOutput", max_frames: int):
+        self.output = output
+        self.max_frames = max_frames
+        self.chunks: Deque[np.ndarray] = deque()
+        self.buffered = 0  # バッファ中のサンプル数
+        self.ended = False
+        self.complete = False  # 最後まで受信できたか
+        self.feeder: Optional[asyncio.Task] = None  # 受信してwrite()するタスク
+        self._loop = asyncio.get_running_loop()
+        self._drained = asyncio.Event()
+
+    async def write(self, clip: PCMClip):
+        """受信したPCMをバッファに積む（バッファが一杯なら再生が進むまで待つ）"""
+        samples = self.output._to_samples(clip)
+        while self.buffered >= self.max_frames and not self.ended:
+            self._drained.clear()
+            await self._drained.wait()
+        with self.output._lock:
+            self.chunks.append(samples)
+            self.buffered += len(samples)
+        self.output._wakeup()
+
+    def finish(self, complete: bool = True):
+        """受信の終わり（これ以降はバッファが空になった時点で再生終了）"""
+        with self.output._lock:
+            self.ended = True
+            self.complete = complete
+        self._drained.set()
+        self.output._wakeup()
+
+    def close(self):
+        """受信を止める（再生を止めた・再生せずに捨てた場合）"""
+        if self.feeder is not None:
+            self.feeder.cancel()
+        self.finish(False)
+
+    def _next_chunk(self) -> Optional[np.ndarray]:
+        """デバイスのスレッドから呼ばれる（出力のロックを持った状態で）"""
+        if not self.chunks:
+            return None
+        samples = self.chunks.popleft()
+        self.buffered -= len(samples)
+        if self.buffered < self.max_frames:
+            self._loop.call_soon_threadsafe(self._drained.set)
+        return samples
+
+
+class _Playback:
+    """キュー上の1クリップ"""
+    __slots__ = ("samples", "position", "future", "loop", "queued_at", "started", "on_start", "stream",
+                 "starved")
+
+    def __init__(self, samples: np.ndarray, future: asyncio.Future, loop: asyncio.AbstractEventLoop,
+                 on_start: Optional[Callable[[float], None]] = None, stream: Optional[PCMStream] = None):
+        self.samples = samples
+        self.position = 0
+        self.future = future
+        self.loop = loop
+        self.queued_at = time.perf_counter()
+        self.started = False
+        self.on_start = on_start
+        self.stream = stream
+        self.starved = False
+
+    def advance(self) -> bool:
+        """ストリームなら受信済みの次のPCMに進む（進めたらTrue）"""
+        if self.stream is None:
+            return False
+        samples = self.stream._next_chunk()
+        if samples is None:
+            return False
+        self.samples = samples
+        self.position = 0
+        self.starved = False
+        return True
+
+    def waiting(self) -> bool:
+        """続きの受信を待っているか"""
+        return self.stream is not None and not self.stream.ended
+
+    def finish(self, completed: bool):
+        """イベントループ側でFutureを完了させる（デバイスのスレッドから呼ばれる）"""
+        self.loop.call_soon_threadsafe(_resolve, self.future, completed)
+
+
+def _resolve(future: asyncio.Future, completed: bool):
+    if not future.done():
+        future.set_result(completed)
+
+
+class NullSink:
+    """出力デバイスの代わりに一定間隔でコールバックを呼ぶ（ヘッドレス環境・テスト用）
+
+    path を指定すると、再生中の区間をWAVファイルに書き出す
+    """
+
+    def __init__(self, sample_rate: int, block_frames: int, path: Optional[str] = None,
+                 realtime: bool = True):
+        self.sample_rate = sample_rate
+        self.block_frames = block_frames
+        self.path = path
+        self.realtime = realtime
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._wav = None
+        self.wakeup = threading.Event()
+        self.output_latency = 0.0  # 書き出した時点で出力されたものとみなす
+
+    def open(self, render: Callable[[int], Optional[bytes]]):
+        if self.path:
+            self._wav = wave.open(self.path, "wb")
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(self.sample_rate)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(render,), name="audio-output", daemon=True)
+        self._thread.start()
+
+    def _run(self, render: Callable[[int], Optional[bytes]]):
+        interval = self.block_frames / self.sample_rate
+        deadline = time.monotonic()
+        while self._running:
+            data = render(self.block_frames)
+            if data is None:
+                # 再生するものが無い間は眠る
+                self.wakeup.wait()
+                self.wakeup.clear()
+                deadline = time.monotonic()
+                continue
+            if self._wav is not None:
+                self._wav.writeframes(data)
+            if self.realtime:
+                deadline += interval
+                time.sleep(max(0.0, deadline - time.monotonic()))
+
+    def close(self):
+        self._running = False
+        self.wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+class PyAudioSink:
+    """pyaudioのコールバック方式の出力ストリーム"""
+
+    def __init__(self, sample_rate: int, block_frames: int, device_index: Optional[int] = None):
+        import pyaudio
+        self._pyaudio = pyaudio
+        self.sample_rate = sample_rate
+        self.block_frames = block_frames
+        self.device_index = device_index
+        self._audio = None
+        self._stream = None
+        self._silence = b"\x00\x00" * block_frames
+        self.wakeup = threading.Event()  # コールバック方式では使わない
+        self.output_latency = 0.0  # コールバックで渡してからスピーカーから出るまで（秒）
+
+    def open(self, render: Callable[[int], Optional[bytes]]):
+        pyaudio = self._pyaudio
+
+        def callback(in_data, frame_count, time_info, status):
+            data = render(frame_count)
+            if data is None:
+                data = self._silence if frame_count == self.block_frames else b"\x00\x00" * frame_count
+            return data, pyaudio.paContinue
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(
+            format=pyaudio.paInt16, channels=1, rate=self.sample_rate, output=True,
+            frames_per_buffer=self.block_frames, output_device_index=self.device_index,
+            stream_callback=callback
+        )
+        self._stream.start_stream()
+        self.output_latency = self._stream.get_output_latency()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+
+class AudioOutput:
+    """常駐する音声出力ステージ
+
+    - デバイスは最初の再生時に一度だけ開き、以降は開いたままにする
+    - クリップはチャンネルごとのキューに順番に積まれ、チャンネル同士はミックスされる
+    - 再生の完了・中断は play() が返すまで待つだけで分かる（ポーリング不要）
+    - open_stream() のストリームは受信しながら再生し、続きが届くまではそのチャンネルだけ無音になる
+    """
+
+    def __init__(self, sink: Optional[str] = None, sample_rate: Optional[int] = None,
+                 block_ms: Optional[int] = None, path: Optional[str] = None):
+        self.sink_name = sink or config.audio_output_sink
+        self.sample_rate = sample_rate or config.audio_output_sample_rate
+        self.block_frames = self.sample_rate * (block_ms or config.audio_output_block_ms) // 1000
+        self.path = path or config.audio_output_file
+        self.logger = logging.getLogger(__name__)
+
+        self._channels: Dict[str, Deque[_Playback]] = {}
+        self._lock = threading.Lock()
+        self._mix = np.zeros(self.block_frames, dtype=np.int32)
+        self._sink = None
+        self._output_latency = 0.0
+
+        # 統計
+        self.clips = 0
+        self.stopped = 0
+        self.underruns = 0  # ストリームの続きが届かず途切れた回数
+        self.device_init_time = 0.0
+        self.start_latency = LatencyStats()  # 空いているチャンネルで play() から最初のブロックが出力されるまで
+
+    def start(self):
+        """出力デバイスを開く（開いていれば何もしない）"""
+        if self._sink is not None:
+            return
+        started = time.perf_counter()
+        sink = None
+        if self.sink_name == "pyaudio":
+            try:
+                sink = PyAudioSink(self.sample_rate, self.block_frames)
+                sink.open(self._render)
+            except Exception as e:
+                self.logger.warning(f"音声出力デバイスを開けません（無音出力に切り替えます）: {e}")
+                self.sink_name = "null"
+                sink = None
+        if sink is None:
+            sink = NullSink(self.sample_rate, self.block_frames,
+                            path=self.path if self.sink_name == "file" else None,
+                            realtime=config.audio_output_realtime)
+            sink.open(self._render)
+        self._sink = sink
+        self._output_latency = sink.output_latency
+        self.device_init_time = time.perf_counter() - started
+        self.logger.info(f"音声出力を開始: {self.sink_name} ({self.sample_rate}Hz, "
+                         f"{self.device_init_time * 1000:.1f}ms)")
+
+    def _to_samples(self, clip: PCMClip) -> np.ndarray:
+        """デバイスの形式（モノラル・同じサンプリングレート）のint16配列にする
+
+        形式が同じならmemoryviewをそのまま参照し、コピーしない
+        """
+        samples = np.frombuffer(clip.samples, dtype="<i2")
+        if clip.channels > 1:
+            samples = samples.reshape(-1, clip.channels).mean(axis=1).astype(np.int16)
+        if clip.sample_rate != self.sample_rate:
+            positions = np.arange(0, len(samples), clip.sample_rate / self.sample_rate)
+            samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+        return samples
+
+    def open_stream(self, buffer_ms: Optional[int] = None) -> PCMStream:
+        """受信しながら再生するストリームを作る（buffer_ms 分まで先に受信する）"""
+        self.start()
+        buffer_ms = buffer_ms or config.tts_stream_buffer_ms
+        return PCMStream(self, self.sample_rate * buffer_ms // 1000)
+
+    def _wakeup(self):
+        if self._sink is not None:
+            self._sink.wakeup.set()
+
+    async def play(self, audio: Any, channel: str = "voice",
+                   on_start: Optional[Callable[[float], None]] = None) -> bool:
+        """クリップ（PCMClip・WAVデータ・PCMStream）を再生し、終わるまで待つ
+
+        最後まで再生したらTrue、stop()で止められたり、ストリームの受信が
+        途中で失敗したりしたらFalse。
+        待っている間にキャンセルされた場合はその場で再生を止める。
+        on_start は最初のサンプルがスピーカーから出る時刻（time.monotonic()）を
+        引数に、イベントループ上で呼ばれる
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        if isinstance(audio, PCMStream):
+            entry = _Playback(np.zeros(0, dtype=np.int16), loop.create_future(), loop, on_start, audio)
+        else:
+            clip = audio if isinstance(audio, PCMClip) else parse_wav(audio)
+            entry = _Playback(self._to_samples(clip), loop.create_future(), loop, on_start)
+        with self._lock:
+            queue = self._channels.setdefault(channel, deque())
+            if queue:
+                entry.queued_at = None  # 前のクリップの再生待ちは計測しない
+            queue.append(entry)
+        self.clips += 1
+        self._sink.wakeup.set()
+        try:
+            return await entry.future
+        except asyncio.CancelledError:
+            self._remove(channel, entry)
+            raise
+
+    def _remove(self, channel: str, entry: _Playback):
+        with self._lock:
+            queue = self._channels.get(channel)
+            if queue is not None and entry in queue:
+                queue.remove(entry)
+                self.stopped += 1
+        if entry.stream is not None:
+            entry.stream.close()
+
+    def stop(self, channel: Optional[str] = None) -> int:
+        """チャンネル（省略時は全チャンネル）の再生中・再生待ちのクリップを止める"""
+        with self._lock:
+            names = [channel] if channel is not None else list(self._channels)
+            removed: List[_Playback] = []
+            for name in names:
+                queue = self._channels.get(name)
+                if queue:
+                    removed.extend(queue)
+                    queue.clear()
+        for entry in removed:
+            entry.finish(False)
+            if entry.stream is not None:
+                entry.stream.close()
+        self.stopped += len(removed)
+        return len(removed)
+
+    def _render(self, frame_count: int) -> Optional[bytes]:
+        """デバイスのコールバック: 各チャンネルの先頭から読み出してミックス（再生するものが無ければNone）"""
+        if frame_count != len(self._mix):
+            self._mix = np.zeros(frame_count, dtype=np.int32)
+        mix = self._mix
+        mix[:] = 0
+        finished: List[_Playback] = []
+        active = False
+        now = time.perf_counter()
+        block_start = time.monotonic() + self._output_latency
+
+        with self._lock:
+            for queue in self._channels.values():
+                filled = 0
+                while filled < frame_count and queue:
+                    entry = queue[0]
+                    if entry.position >= len(entry.samples) and not entry.advance():
+                        if entry.waiting():
+                            # 続きが届くまでこのチャンネルは無音（後ろのクリップも待たせる）
+                            if entry.started and not entry.starved:
+                                entry.starved = True
+                                self.underruns += 1
+                            break
+                        finished.append(queue.popleft())
+                        continue
+                    if not entry.started:
+                        entry.started = True
+                        if entry.queued_at is not None:
+                            self.start_latency.record(now - entry.queued_at)
+                        if entry.on_start is not None:
+                            entry.loop.call_soon_threadsafe(
+                                entry.on_start, block_start + filled / self.sample_rate
+                            )
+                    take = min(frame_count - filled, len(entry.samples) - entry.position)
+                    mix[filled:filled + take] += entry.samples[entry.position:entry.position + take]
+                    entry.position += take
+                    filled += take
+                    active = True
+
+        for entry in finished:
+            entry.finish(entry.stream is None or entry.stream.complete)
+        if not active:
+            return None
+        np.clip(mix, -32768, 32767, out=mix)
+        return mix.astype(np.int16).tobytes()
+
+    def stats(self) -> Dict[str, Any]:
+        """再生数・中断数・デバイスの初期化時間・再生開始までの時間"""
+        with self._lock:
+            queued = sum(len(queue) for queue in self._channels.values())
+        return {
+            "sink": self.sink_name,
+            "clips": self.clips,
+            "stopped": self.stopped,
+            "underruns": self.underruns,
+            "queued": queued,
+            "device_init_ms": self.device_init_time * 1000.0,
+            "start_latency": self.start_latency.summary()
+        }
+
+    def close(self):
+        """再生中のクリップを止めてデバイスを閉じる"""
+        self.stop()
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+
+_shared_output: Optional[AudioOutput] = None
+
+
+def get_audio_output() -> AudioOutput:
+    """プロセスで共有する音声出力ステージ"""
+    global _shared_output
+    if _shared_output is None:
+        _shared_output = AudioOutput()
+    return _shared_output
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+サーキットブレーカー
+失敗が続いた接続先への要求をしばらく止め、一定時間後に1件だけ試して
+復旧を確かめる
+"""
+
+import time
+from typing import Any, Dict
+
+CLOSED = "closed"  # 通常どおり要求を送る
+OPEN = "open"  # 要求を送らない
+HALF_OPEN = "half_open"  # 復旧を確かめるため1件だけ送る
+
+
+class CircuitBreaker:
+    """連続失敗数で開き、reset_timeout 秒後に半開きで1件試す"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        # 統計
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def available(self) -> bool:
+        """今要求を送れるか（状態は変えない）"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._trial_in_flight)
+
+    def allow(self) -> bool:
+        """要求を送ってよいか（半開きなら試行枠を1件取る）"""
+        if not self.available():
+            return False
+        if self._state == HALF_OPEN:
+            self._trial_in_flight = True
+        return True
+
+    def release(self):
+        """結果が出ないまま終わった試行（取り消しなど）の枠を返す"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self._consecutive_failures = 0
+        self._state = CLOSED
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._consecutive_failures += 1
+        if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        """すぐに開く（ヘルスチェックの失敗など）"""
+        if self._state != OPEN:
+            self.trips += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def reset(self):
+        """すぐに閉じる（ヘルスチェックで復旧を確認した場合など）"""
+        self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "trips": self.trips
+        }
@@ -6,44 +6,176 @@ VRChat AI美少女システム設定ファイル
 
 import os
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, List, Any
 
 @dataclass
 class AIConfig:
     """AI設定クラス"""
     
+    # LLMバックエンド設定
+    llm_backend: str = "openai"  # "openai", "local"
+    llm_max_connections: int = 16  # バックエンドごとの接続プールの上限
+    
     # OpenAI設定
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = "gpt-3.5-turbo"
+    openai_base_url: str = ""  # 空ならOpenAI公式API
+    openai_timeout: float = 30.0  # リクエストのタイムアウト（秒）
+    openai_max_retries: int = 2
     max_tokens: int = 150
     temperature: float = 0.8
     
+    # ローカルLLM設定（OpenAI互換サーバー: llama.cpp server, Ollamaなど）
+    local_llm_url: str = "http://localhost:8080/v1"
+    local_llm_model: str = "local-model"
+    local_llm_api_key: str = ""
+    local_llm_timeout: float = 60.0
+    local_llm_max_retries: int = 1
+    
+    # 応答の締め切り設定（ストリーミング時）
+    response_deadline_enabled: bool = True
+    llm_hedge_after: float = 1.5  # 最初のトークンがこの秒数で来なければ予備リクエストを送る
+    response_deadline: float = 3.0  # この秒数で何も来なければつなぎの言葉を話す
+    llm_backup_backend: str = ""  # 予備リクエスト先（空なら同じバックエンド）
+    filler_phrases: List[str] = None
+    fallback_responses: List[str] = None  # 応答を生成できなかった時の定型文
+    greeting_phrases: List[str] = None  # あいさつの定型文
+    streaming_response: bool = True  # 応答を文単位でストリーミング読み上げ
+    
     # VRChat OSC設定
     vrchat_osc_ip: str = "127.0.0.1"
     vrchat_osc_port: int = 9000
+    osc_tick_rate: float = 60.0  # パラメータ更新をまとめて送る頻度（Hz）
+    osc_min_interval: float = 0.05  # 同じアドレスへの最小送信間隔（秒）
+    osc_float_epsilon: float = 1e-3  # これ以下の変化は送信しない
+    osc_queue_size: int = 256  # 送信キューの上限
+    osc_drop_policy: str = "drop_oldest"  # キューが満杯の時: "drop_oldest", "drop_newest"
+    osc_listen_enabled: bool = True  # VRChatからのOSCを受信する
+    osc_listen_ip: str = "127.0.0.1"
+    osc_listen_port: int = 9001  # VRChatのOSC送信先ポート
+    osc_chatbox_player_id: str = "vrchat"  # チャットボックス入力を扱うセッション
+    osc_touch_parameters: List[str] = None  # 触れられた時に反応するアバターパラメータ
+    osc_proximity_parameter: str = "Proximity"  # 距離を表すアバターパラメータ（0〜1、1が最接近）
+    osc_proximity_threshold: float = 0.8  # これを超えたら近づかれたとして反応
     
     # 音声設定
     voice_engine: str = "pyttsx3"  # "pyttsx3", "voicevox", "elevenlabs"
     voice_rate: int = 150
     voice_volume: float = 0.8
+    tts_lookahead: int = 2  # 再生中の文の後ろに先行して合成しておく文の数
+    
+    # 音声出力設定（VOICEVOX・ElevenLabs）
+    audio_output_sink: str = "pyaudio"  # "pyaudio", "null"（無音）, "file"（WAVに書き出し）
+    audio_output_file: str = "audio_output.wav"  # "file" の書き出し先
+    audio_output_sample_rate: int = 24000
+    audio_output_block_ms: int = 20  # デバイスのコールバック1回分（停止の反映もこの単位）
+    audio_output_realtime: bool = True  # "null"/"file" で実時間に合わせて再生する
+    tts_dsp_enabled: bool = True  # 感情を合成後の音声処理で表現する（感情ごとに合成し直さない）
+    tts_dsp_tone_semitones: float = 4.0  # 声のトーン0.0〜1.0で変えるピッチの幅（半音）
+    tts_dsp_loudness_db: float = -20.0  # 読み上げの目標音量（dBFS）
+    lip_sync_enabled: bool = True  # 再生中の音声から口の開きと口の形をOSCで送る
+    lip_sync_frame_rate: float = 15.0  # 口の動きを送る頻度（Hz、1/osc_min_interval 以下）
+    lip_sync_mouth_parameter: str = "MouthOpen"  # 口の開き（Float 0.0〜1.0）
+    lip_sync_viseme_parameter: str = "MouthShape"  # 口の形（Int 0:無音 1:あ 2:い 3:う 4:え 5:お）
+    
+    # 割り込み設定
+    barge_in_enabled: bool = True  # 新しい発話で実行中の応答と読み上げを中断する
+    barge_in_timeout: float = 0.5  # 中断の完了を待つ最大秒数
+    
+    # 音声入力設定
+    voice_input_enabled: bool = False  # マイクまたはWAVファイルからの音声入力
+    voice_input_source: str = "microphone"  # "microphone" またはWAVファイルのパス
+    speech_recognizer_engine: str = "google"  # speech_recognitionの recognize_<engine> を使用
+    speech_language: str = "ja-JP"
+    speech_sample_rate: int = 16000
+    speech_frame_ms: int = 20  # VADの判定単位
+    speech_partial_interval: float = 0.5  # 発話中に途中経過を認識する間隔（秒、0で無効）
+    speech_max_utterance: float = 15.0  # これより長い発話は区切って認識（秒）
+    vad_margin_db: float = 12.0  # 背景雑音よりこれだけ大きければ音声とみなす
+    vad_min_level_db: float = -50.0  # これより小さい音は常に無音
+    vad_hangover: float = 0.3  # この秒数無音が続いたら発話終了
+    vad_min_speech: float = 0.1  # この秒数音声が続いたら発話開始
+    vad_pre_roll: float = 0.2  # 発話開始の直前も認識に含める（秒）
     
     # VOICEVOX設定（使用する場合）
     voicevox_url: str = "http://localhost:50021"
     voicevox_speaker_id: int = 1  # ずんだもん
+    voicevox_timeout: float = 10.0  # 1リクエストのタイムアウト（秒）
+    voicevox_max_concurrency: int = 2  # 同時に送るリクエスト数
+    # エンジン側での感情の付け方: "prosody"（話速・抑揚などを調整）または "speaker"（感情別のスピーカー）
+    # tts_dsp_enabled が有効な場合は感情を音声処理で付けるので使われない（未設定なら "prosody"）
+    voicevox_emotion_mode: str = None
+    voicevox_query_cache_size: int = 512  # 使い回す音声クエリの件数
+    voicevox_batch_size: int = 8  # /multi_synthesis にまとめる文の数の上限
+    voicevox_urls: List[str] = None  # 複数のエンジンに振り分ける場合のURL（未設定なら voicevox_url のみ）
     
     # ElevenLabs設定（使用する場合）
     elevenlabs_api_key: str = os.getenv("ELEVENLABS_API_KEY", "")
     elevenlabs_voice_id: str = "21m00Tcm4TlvDq8ikWAM"  # Rachel
+    elevenlabs_timeout: float = 30.0
+    elevenlabs_max_concurrency: int = 2
+    
+    # 音声キャッシュ設定（VOICEVOX・ElevenLabs）
+    tts_cache_enabled: bool = True
+    tts_cache_dir: str = "tts_cache"
+    tts_cache_max_bytes: int = 256 * 1024 * 1024  # ディスク上の合計サイズの上限
+    tts_prewarm: bool = True  # 起動時に定型文を事前合成する
+    tts_prewarm_emotions: List[str] = None  # 事前合成する感情
+    
+    # 音声合成APIのHTTP接続設定
+    tts_http_max_connections: int = 4  # エンジンごとの接続プールの大きさ
+    tts_http_max_retries: int = 2
+    tts_http_retry_backoff: float = 0.2  # 再試行の待ち時間の基準（秒、試行ごとに倍）
+    tts_streaming_enabled: bool = False  # 長い文は合成結果を受信しながら再生する（音声処理・口の動きは省略）
+    tts_stream_min_chars: int = 40  # これ以上の長さの文を受信しながら再生する
+    tts_stream_buffer_ms: int = 2000  # 再生より先に受信しておく上限（ミリ秒）
+    
+    # 音声合成エンジンのプール設定（VOICEVOX・ElevenLabs）
+    tts_health_interval: float = 5.0  # ヘルスチェックの間隔（秒、0で無効）
+    tts_health_timeout: float = 1.0
+    tts_breaker_failures: int = 3  # この回数続けて失敗したエンジンを一時的に外す
+    tts_breaker_reset: float = 10.0  # 外したエンジンを再び試すまでの秒数
+    tts_fallback_enabled: bool = True  # 使えるエンジンが無い時はpyttsx3で読み上げる
     
     # 性格設定
     personality_traits: Dict[str, float] = None
     
+    # キーワード辞書（カテゴリ -> {単語: 重み}）
+    # 感情分析: excited / positive / negative、親密度: intimate
+    lexicon_categories: Dict[str, Dict[str, float]] = None
+    
     # 対話設定
-    max_conversation_history: int = 20
+    max_conversation_history: int = 20  # リングバッファに保持する発言数
+    context_token_budget: int = 1500  # プロンプト全体のトークン予算
+    context_summary_max_tokens: int = 200  # 古い会話の要約の最大トークン数
+    context_summary_use_llm: bool = False  # 要約にLLMを使う（Falseなら簡易要約）
     response_delay: float = 1.0  # 応答遅延（秒）
     
+    # 長期記憶設定
+    memory_enabled: bool = True
+    memory_db_path: str = "ai_memory.db"
+    memory_top_k: int = 5  # 1ターンでプロンプトに入れる記憶の数
+    memory_min_score: float = 0.2  # 関連するとみなす最小の類似度
+    memory_embedding_dim: int = 256
+    
+    # マルチセッション設定
+    max_sessions: int = 100  # 同時に保持するプレイヤーセッション数
+    session_idle_timeout: float = 1800.0  # 無操作セッションの破棄までの時間（秒）
+    max_concurrent_llm_requests: int = 8  # 同時に実行するLLM呼び出し数
+    max_concurrent_tts_requests: int = 2  # 同時に実行する音声合成数
+    
+    # 応答キャッシュ設定
+    response_cache_enabled: bool = True
+    response_cache_size: int = 1000  # 最大エントリ数
+    response_cache_ttl: float = 3600.0  # 有効期限（秒）
+    response_cache_similarity: float = 0.85  # 類似度ヒットとみなすコサイン類似度
+    response_cache_intimacy_bands: int = 4  # 親密度を何段階に区切ってキーにするか
+    
     # 感情設定
-    emotion_decay_rate: float = 0.1  # 感情の減衰率
+    emotion_decay_rate: float = 0.1  # 感情の減衰率（1秒あたり）
+    emotion_threshold: float = 0.2  # 最も強い感情がこれ未満なら平常状態
+    emotion_event_intensity: float = 0.6  # 発話などのイベント1回で加わる感情の強さ
+    emotion_tick_rate: float = 10.0  # 感情状態を更新する頻度（Hz）
     intimacy_growth_rate: float = 0.01  # 親密度の成長率
     
     # ログ設定
@@ -62,6 +194,42 @@ class AIConfig:
                 "humor": 0.6,           # ユーモア
                 "romanticism": 0.5      # ロマンチック
             }
+        
+        if self.filler_phrases is None:
+            self.filler_phrases = [
+                "えっと…",
+                "うーん、そうですね…",
+                "ちょっと待ってね…"
+            ]
+        
+        if self.fallback_responses is None:
+            self.fallback_responses = [
+                "そうなんですね！もっと教えてください♪",
+                "面白いお話ですね〜",
+                "あなたと話していると楽しいです！",
+                "えへへ、そういうことなんですね♡"
+            ]
+        
+        if self.greeting_phrases is None:
+            self.greeting_phrases = [
+                "こんにちは！会えて嬉しいです♪",
+                "おかえりなさい！",
+                "また来てくれたんですね♡"
+            ]
+        
+        if self.tts_prewarm_emotions is None:
+            self.tts_prewarm_emotions = ["happy", "calm"]
+        
+        if self.osc_touch_parameters is None:
+            self.osc_touch_parameters = ["HeadPat", "HeadTouch", "CheekTouch", "HandTouch"]
+        
+        if self.lexicon_categories is None:
+            self.lexicon_categories = {
+                "excited": {"すごい": 1.0, "やった": 1.0, "最高": 1.0, "興奮": 1.0},
+                "positive": {"嬉しい": 1.0, "楽しい": 1.0, "好き": 1.0, "愛してる": 1.0, "ありがとう": 1.0},
+                "negative": {"悲しい": 1.0, "つらい": 1.0, "嫌い": 1.0, "怒り": 1.0, "疲れた": 1.0},
+                "intimate": {"好き": 1.0, "愛してる": 1.0, "大切": 1.0, "特別": 1.0}
+            }
 
 # グローバル設定インスタンス
 config = AIConfig()
@@ -71,12 +239,27 @@ def validate_config():
     """設定の妥当性をチェック"""
     errors = []
     
-    if not config.openai_api_key and config.voice_engine != "local":
+    if not config.openai_api_key and config.llm_backend == "openai":
         errors.append("OpenAI APIキーが設定されていません")
     
     if config.vrchat_osc_port < 1024 or config.vrchat_osc_port > 65535:
         errors.append("OSCポート番号が無効です")
     
+    if config.osc_listen_enabled and config.osc_listen_port == config.vrchat_osc_port:
+        errors.append("OSCの受信ポートと送信ポートが同じです")
+    
+    if config.response_deadline_enabled and config.llm_hedge_after >= config.response_deadline:
+        errors.append("予備リクエストを送るまでの時間がつなぎの言葉の締め切り以上です")
+    
+    if config.voicevox_emotion_mode is not None:
+        if config.voicevox_emotion_mode not in ("prosody", "speaker"):
+            errors.append("voicevox_emotion_mode は \"prosody\" か \"speaker\" を指定してください")
+        elif config.tts_dsp_enabled:
+            errors.append("音声処理で感情を付ける設定では VOICEVOX の感情の付け方 (voicevox_emotion_mode) は使われません")
+    
+    if config.lip_sync_enabled and config.lip_sync_frame_rate * config.osc_min_interval > 1.0:
+        errors.append("口の動きの送信頻度がOSCの最小送信間隔より速すぎます")
+    
     if not (0.0 <= config.temperature <= 2.0):
         errors.append("temperature値が範囲外です (0.0-2.0)")
     
@@ -128,9 +311,17 @@ def update_from_env():
     env_mappings = {
         "VRCHAT_OSC_IP": "vrchat_osc_ip",
         "VRCHAT_OSC_PORT": "vrchat_osc_port",
+        "OSC_LISTEN_PORT": "osc_listen_port",
         "VOICE_ENGINE": "voice_engine",
+        "VOICE_INPUT_SOURCE": "voice_input_source",
+        "AUDIO_OUTPUT_SINK": "audio_output_sink",
         "OPENAI_MODEL": "openai_model",
+        "OPENAI_BASE_URL": "openai_base_url",
+        "LLM_BACKEND": "llm_backend",
+        "LOCAL_LLM_URL": "local_llm_url",
+        "LOCAL_LLM_MODEL": "local_llm_model",
         "VOICEVOX_URL": "voicevox_url",
+        "VOICEVOX_URLS": "voicevox_urls",  # カンマ区切り
         "LOG_LEVEL": "log_level"
     }
     
@@ -142,6 +333,8 @@ def update_from_env():
                 value = int(value)
             elif config_attr.endswith("_rate") or config_attr.endswith("_volume"):
                 value = float(value)
+            elif config_attr.endswith("_urls"):
+                value = [url.strip() for url in value.split(",") if url.strip()]
             
             setattr(config, config_attr, value)
 
@@ -152,8 +345,14 @@ update_from_env()
 def print_config():
     """現在の設定を表示"""
     print("=== AI美少女システム設定 ===")
-    print(f"OpenAI Model: {config.openai_model}")
+    print(f"LLM Backend: {config.llm_backend}")
+    if config.llm_backend == "local":
+        print(f"Local LLM: {config.local_llm_model} ({config.local_llm_url})")
+    else:
+        print(f"OpenAI Model: {config.openai_model}")
     print(f"VRChat OSC: {config.vrchat_osc_ip}:{config.vrchat_osc_port}")
+    if config.osc_listen_enabled:
+        print(f"OSC受信: {config.osc_listen_ip}:{config.osc_listen_port}")
     print(f"Voice Engine: {config.voice_engine}")
     print(f"Log Level: {config.log_level}")
     print("性格特性:")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会話コンテキスト管理
+会話履歴をリングバッファで保持し、トークン予算に収まるようにプロンプトを組み立てる。
+予算からあふれた古いターンは、応答生成とは別のタスクで要約に畳み込む
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+Message = Dict[str, str]
+Summarizer = Callable[[str, List[Message]], Awaitable[str]]
+
+# メッセージごとのロール等のオーバーヘッド
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(text: str) -> int:
+    """トークン数を数える（tiktokenが無い場合は概算）"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    # 日本語などの非ASCII文字はおよそ1文字1トークン、ASCIIはおよそ4文字1トークン
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def message_tokens(message: Message) -> int:
+    """1メッセージのトークン数"""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """末尾（新しい内容）を優先してトークン数以内に切り詰める"""
+    lines = text.split("\n")
+    # 古い行から丸ごと落とし、最後の1行だけが残っても超える場合は先頭を削る
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    text = lines[0] if len(lines) == 1 else "\n".join(lines)
+    while text and count_tokens(text) > max_tokens:
+        text = text[max(1, len(text) // 10):]
+    return text
+
+
+async def extractive_summary(previous_summary: str, messages: List[Message],
+                             max_tokens: int = 200) -> str:
+    """各発言の先頭部分を並べる簡易要約（LLMを使わない）"""
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        speaker = "ユーザー" if message["role"] == "user" else "AI"
+        content = message["content"].strip().replace("\n", " ")
+        lines.append(f"{speaker}: {content[:40]}")
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class ConversationContext:
+    """トークン予算付きの会話履歴
+
+    直近の発言はリングバッファ（最大max_turns件）に保持し、
+    あふれた発言や予算に入らない発言は要約待ちに回す。
+    """
+
+    def __init__(self, max_turns: int = 20, token_budget: int = 1500, summary_max_tokens: int = 200):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.summary = ""
+        self.logger = logging.getLogger(__name__)
+
+        self._messages: deque = deque()  # (メッセージ, トークン数)
+        self._pending: List[Message] = []  # 要約待ちの発言
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def append(self, message: Message):
+        """発言を追加（上限を超えた古い発言は要約待ちへ）"""
+        self._messages.append((message, message_tokens(message)))
+        while len(self._messages) > self.max_turns:
+            self._pending.append(self._messages.popleft()[0])
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return (message for message, _ in self._messages)
+
+    def recent(self, count: int) -> List[Message]:
+        """直近count件の発言"""
+        return [message for message, _ in list(self._messages)[-count:]] if count > 0 else []
+
+    def build_messages(self, system_prompt: str, user_input: str,
+                       token_budget: Optional[int] = None) -> List[Message]:
+        """予算内に収まるプロンプトを組み立て
+
+        システムプロンプト（要約を含む）と今回の入力は必ず含め、
+        残りの予算に新しい順で履歴を詰める。入りきらなかった古い発言は要約待ちに回す
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+
+        if self.summary:
+            system_prompt = f"{system_prompt}\n\nこれまでの会話の要約:\n{self.summary}"
+        system_message = {"role": "system", "content": system_prompt}
+        user_message = {"role": "user", "content": user_input}
+        remaining = budget - message_tokens(system_message) - message_tokens(user_message)
+
+        history: List[Tuple[Message, int]] = []
+        for message, tokens in reversed(self._messages):
+            if tokens > remaining:
+                break
+            history.append((message, tokens))
+            remaining -= tokens
+
+        # 予算に入らなかった古い発言を要約待ちへ移す
+        overflow = len(self._messages) - len(history)
+        for _ in range(overflow):
+            self._pending.append(self._messages.popleft()[0])
+
+        return [system_message, *(message for message, _ in reversed(history)), user_message]
+
+    @property
+    def has_pending(self) -> bool:
+        """要約待ちの発言があるか"""
+        return bool(self._pending)
+
+    def schedule_summary(self, summarizer: Optional[Summarizer] = None) -> Optional[asyncio.Task]:
+        """要約待ちの発言をバックグラウンドで要約に畳み込む"""
+        if not self._pending or (self._summary_task is not None and not self._summary_task.done()):
+            return None
+        self._summary_task = asyncio.create_task(self._summarize(summarizer))
+        return self._summary_task
+
+    async def _summarize(self, summarizer: Optional[Summarizer]):
+        """要約を更新"""
+        pending, self._pending = self._pending, []
+        try:
+            if summarizer is not None:
+                summary = await summarizer(self.summary, pending)
+            else:
+                summary = await extractive_summary(self.summary, pending, self.summary_max_tokens)
+        except Exception as e:
+            self.logger.error(f"会話要約エラー: {e}")
+            summary = await extractive_summary(self.summary, pending, self.summary_max_tokens)
+        self.summary = truncate_to_tokens(summary, self.summary_max_tokens)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+締め切り付き応答レース
+最初のトークンが遅い場合に予備リクエストを並走させ、
+締め切りを過ぎたらつなぎの言葉を先に返して本来の応答を待ち続ける
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from llm_backends import LLMBackend, Message
+from metrics import LatencyStats
+
+# ストリーム終了を表す印
+_END = object()
+
+
+class DeadlineRacer:
+    """締め切り付きでLLMのストリームを競争させる
+
+    - hedge_after秒以内に最初のトークンが来なければ、予備バックエンド
+      （無ければ同じバックエンド）へ2本目のリクエストを送る
+    - 先に最初のトークンを返した方を採用し、もう一方はキャンセルする
+    - deadline秒を過ぎても何も来なければ、つなぎの言葉を先に返し、
+      本来の応答は届き次第そのまま続けて返す
+
+    stream() は (出どころ, トークン) を返す。出どころは
+    "primary" / "hedge" / "filler" / "fallback" のいずれか
+    """
+
+    def __init__(self, primary: LLMBackend, backup: Optional[LLMBackend] = None,
+                 hedge_after: float = 1.5, deadline: float = 3.0):
+        self.primary = primary
+        self.backup = backup
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self.logger = logging.getLogger(__name__)
+
+        # 計測
+        self.first_audio_latency = LatencyStats()  # つなぎを含む最初の出力まで
+        self.first_token_latency = LatencyStats()  # 本来の応答の最初のトークンまで
+        self.turn_latency = LatencyStats()  # ターン全体
+        self.counters: Dict[str, int] = {
+            "turns": 0, "hedged": 0, "hedge_wins": 0, "fillers": 0, "failures": 0
+        }
+
+    async def stream(self, messages: List[Message], filler: Optional[str] = None,
+                     fallback: Optional[str] = None) -> AsyncIterator[Tuple[str, str]]:
+        """締め切り付きでトークンを生成"""
+        start = time.perf_counter()
+        self.counters["turns"] += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[str, asyncio.Task] = {}
+        finished = set()
+        winner = None
+        first_output = False  # つなぎを含め何かを返したか
+        deadline_passed = False
+
+        def launch(label: str, backend: LLMBackend):
+            tasks[label] = asyncio.create_task(self._pump(label, backend, messages, queue))
+
+        launch("primary", self.primary)
+        try:
+            # 最初のトークンを待つ
+            while winner is None:
+                elapsed = time.perf_counter() - start
+                if "hedge" not in tasks:
+                    timeout = self.hedge_after - elapsed
+                elif not deadline_passed:
+                    timeout = self.deadline - elapsed
+                else:
+                    timeout = None
+
+                try:
+                    if timeout is not None and timeout <= 0:
+                        raise asyncio.TimeoutError
+                    label, token = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    if "hedge" not in tasks:
+                        self.counters["hedged"] += 1
+                        self.logger.info(f"最初のトークンが{self.hedge_after}秒以内に来ないため予備リクエストを送信")
+                        launch("hedge", self.backup or self.primary)
+                    else:
+                        deadline_passed = True
+                        if filler:
+                            first_output = True
+                            self.counters["fillers"] += 1
+                            self.first_audio_latency.record(time.perf_counter() - start)
+                            yield "filler", filler
+                    continue
+
+                if token is _END:
+                    finished.add(label)
+                    if "hedge" not in tasks:
+                        # 1本目がトークン無しで失敗した場合はすぐに予備を送る
+                        self.counters["hedged"] += 1
+                        launch("hedge", self.backup or self.primary)
+                    elif finished >= set(tasks):
+                        # すべて失敗
+                        self.counters["failures"] += 1
+                        if fallback:
+                            if not first_output:
+                                self.first_audio_latency.record(time.perf_counter() - start)
+                            yield "fallback", fallback
+                        return
+                    continue
+
+                winner = label
+                for other, task in tasks.items():
+                    if other != winner:
+                        task.cancel()
+                if winner == "hedge":
+                    self.counters["hedge_wins"] += 1
+                self.first_token_latency.record(time.perf_counter() - start)
+                if not first_output:
+                    self.first_audio_latency.record(time.perf_counter() - start)
+                yield winner, token
+
+            # 採用したストリームの残りを返す
+            while True:
+                label, token = await queue.get()
+                if label != winner:
+                    continue
+                if token is _END:
+                    break
+                yield winner, token
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            self.turn_latency.record(time.perf_counter() - start)
+
+    async def _pump(self, label: str, backend: LLMBackend, messages: List[Message], queue: asyncio.Queue):
+        """バックエンドのストリームをキューへ流す"""
+        try:
+            async for token in backend.stream(messages):
+                await queue.put((label, token))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"LLMストリームエラー ({label}/{backend.name}): {e}")
+        finally:
+            queue.put_nowait((label, _END))
+
+    def stats(self) -> Dict[str, object]:
+        """p50/p95/p99と各カウンター"""
+        return {
+            **self.counters,
+            "first_audio": self.first_audio_latency.summary(),
+            "first_token": self.first_token_latency.summary(),
+            "turn": self.turn_latency.summary()
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+感情ダイナミクス
+セッションごとの感情の強さを時間とともに減衰させ、イベントで押し上げる。
+全セッションの状態を1つのNumPy配列に持ち、tickごとに1回の演算でまとめて更新する
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import config
+
+# on_change(セッションID, 優勢な感情)
+EmotionChangeCallback = Callable[[str, str], None]
+
+
+class EmotionDynamics:
+    """全セッションの感情強度ベクトル
+
+    - intensities[行, 感情] が各セッションの感情の強さ（0〜1）
+    - 強さは exp(-decay_rate * 経過秒) で減衰する
+    - 最も強い感情がthreshold未満なら baseline（平常）とみなす
+    - 優勢な感情が変わったセッションだけ on_change を呼ぶ
+    """
+
+    def __init__(self, emotions: Sequence[str], baseline: str,
+                 decay_rate: Optional[float] = None, threshold: Optional[float] = None,
+                 tick_rate: Optional[float] = None, on_change: Optional[EmotionChangeCallback] = None,
+                 capacity: int = 64):
+        self.emotions: List[str] = list(emotions)
+        self._emotion_index = {emotion: i for i, emotion in enumerate(self.emotions)}
+        self.baseline = self._emotion_index[baseline]
+        self.decay_rate = config.emotion_decay_rate if decay_rate is None else decay_rate
+        self.threshold = config.emotion_threshold if threshold is None else threshold
+        self.tick_interval = 1.0 / (tick_rate or config.emotion_tick_rate)
+        self.on_change = on_change
+        self.logger = logging.getLogger(__name__)
+
+        self.intensities = np.zeros((capacity, len(self.emotions)), dtype=np.float32)
+        self.dominant = np.full(capacity, self.baseline, dtype=np.int32)
+        self._slots: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = [None] * capacity
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+
+        self._last_step = time.monotonic()
+        self._tick_task: Optional[asyncio.Task] = None
+        self.ticks = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _grow(self):
+        """配列の容量を倍にする"""
+        capacity = len(self.intensities)
+        self.intensities = np.concatenate([self.intensities, np.zeros_like(self.intensities)])
+        self.dominant = np.concatenate([self.dominant, np.full(capacity, self.baseline, dtype=np.int32)])
+        self._keys.extend([None] * capacity)
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def register(self, key: str) -> int:
+        """セッションの行を確保（登録済みならその行）"""
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[key] = slot
+            self._keys[slot] = key
+        return slot
+
+    def release(self, key: str):
+        """セッションの行を解放"""
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self.intensities[slot] = 0.0
+        self.dominant[slot] = self.baseline
+        self._keys[slot] = None
+        self._free.append(slot)
+
+    def push(self, key: str, emotion: str, amount: float) -> str:
+        """イベントで感情を押し上げ、現在の優勢な感情を返す"""
+        slot = self.register(key)
+        self._ensure_ticking()
+        index = self._emotion_index[emotion]
+        if index != self.baseline:
+            row = self.intensities[slot]
+            row[index] = min(1.0, row[index] + amount)
+        return self._refresh(slot)
+
+    def _refresh(self, slot: int) -> str:
+        """1行分の優勢な感情を再計算"""
+        row = self.intensities[slot]
+        index = int(row.argmax())
+        dominant = index if row[index] >= self.threshold else self.baseline
+        self.dominant[slot] = dominant
+        return self.emotions[dominant]
+
+    def current(self, key: str) -> str:
+        """現在の優勢な感情"""
+        slot = self._slots.get(key)
+        return self.emotions[self.baseline] if slot is None else self.emotions[self.dominant[slot]]
+
+    def levels(self, key: str) -> Dict[str, float]:
+        """感情ごとの現在の強さ"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return {emotion: 0.0 for emotion in self.emotions}
+        return dict(zip(self.emotions, self.intensities[slot].tolist()))
+
+    def step(self, dt: float) -> List[str]:
+        """dt秒分だけ全セッションを減衰させ、優勢な感情が変わったセッションを返す"""
+        if dt <= 0.0:
+            return []
+        self.intensities *= np.float32(np.exp(-self.decay_rate * dt))
+
+        strongest = self.intensities.argmax(axis=1).astype(np.int32)
+        peak = self.intensities[np.arange(len(strongest)), strongest]
+        dominant = np.where(peak >= self.threshold, strongest, self.baseline).astype(np.int32)
+        changed = np.flatnonzero(dominant != self.dominant)
+        self.dominant = dominant
+
+        keys = [self._keys[slot] for slot in changed if self._keys[slot] is not None]
+        if self.on_change is not None:
+            for key in keys:
+                self.on_change(key, self.current(key))
+        return keys
+
+    def tick(self, now: Optional[float] = None) -> List[str]:
+        """前回からの経過時間分だけ進める"""
+        now = time.monotonic() if now is None else now
+        dt, self._last_step = now - self._last_step, now
+        self.ticks += 1
+        return self.step(dt)
+
+    def _ensure_ticking(self):
+        """イベントループ上で一定間隔のtickを起動"""
+        if self._tick_task is not None and not self._tick_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # ループ外ではtick()を明示的に呼ぶ
+        # 止まっていた間の減衰を反映してから再開する
+        self.tick()
+        self._tick_task = loop.create_task(self._run())
+
+    async def _run(self):
+        """tickを繰り返し、全セッションが平常に戻ったら終了する（次の push() で再び起動される）"""
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                self.tick()
+            except Exception as e:
+                self.logger.error(f"感情更新エラー: {e}")
+            if (self.dominant == self.baseline).all():
+                return
+
+    async def close(self):
+        """tickを止める"""
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+            self._tick_task = None
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同期HTTPクライアント
+音声合成エンジンなどの外部APIを、keep-aliveの接続プールを持つ
+1つのクライアントで呼び出す。同時実行数の制限とリトライ付き
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from metrics import LatencyStats
+
+# 再試行するステータスコード（混雑・一時的な障害）
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class AsyncHTTPClient:
+    """エンジンごとの非同期HTTPクライアント
+
+    - httpx.AsyncClient の接続プールを使い回し、リクエストごとの接続確立を避ける
+    - 同時リクエスト数を max_concurrency に制限する
+    - 接続エラー・タイムアウト・一時的なエラー応答は指数バックオフで再試行する
+    - stream() は応答本文を受信しながら読める（再試行は応答ヘッダーを受け取るまで）
+    """
+
+    def __init__(self, name: str, base_url: str = "", timeout: float = 10.0,
+                 max_connections: int = 4, max_concurrency: int = 2, max_retries: int = 2,
+                 backoff: float = 0.2, headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.logger = logging.getLogger(__name__)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            headers=headers,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        # 統計
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.latency = LatencyStats()
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """リクエストを送信し、成功した応答を返す（失敗時は最後の例外を送出）"""
+        self.requests += 1
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(method, url, **kwargs)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    raise httpx.HTTPStatusError(
+                        f"{response.status_code}", request=response.request, response=response
+                    )
+                response.raise_for_status()
+                self.latency.record(time.perf_counter() - start)
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                await self._backoff(e, attempt)
+                attempt += 1
+
+    async def _backoff(self, error: Exception, attempt: int):
+        """再試行できる失敗なら待ち、できなければ送出する"""
+        retriable = not isinstance(error, httpx.HTTPStatusError) or \
+            error.response.status_code in RETRY_STATUS_CODES
+        if not retriable or attempt >= self.max_retries:
+            self.failures += 1
+            raise error
+        delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+        self.retries += 1
+        self.logger.warning(f"{self.name}: リクエスト失敗のため{delay:.2f}秒後に再試行 ({error})")
+        await asyncio.sleep(delay)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """本文を読み終えるまで接続を保持した応答を返す（同時実行数の枠もそれまで使う）
+
+        レイテンシは応答ヘッダーを受け取るまでを記録する。本文の受信中の失敗は再試行しない
+        """
+        self.requests += 1
+        attempt = 0
+        receiving = False
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    async with self.client.stream(method, url, **kwargs) as response:
+                        if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                            raise httpx.HTTPStatusError(
+                                f"{response.status_code}", request=response.request, response=response
+                            )
+                        response.raise_for_status()
+                        self.latency.record(time.perf_counter() - start)
+                        receiving = True
+                        yield response
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if receiving:
+                    self.failures += 1
+                    raise
+                await self._backoff(e, attempt)
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """リクエスト数・再試行数・失敗数・レイテンシ"""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency": self.latency.summary()
+        }
+
+    async def aclose(self):
+        """接続プールを閉じる"""
+        await self.client.aclose()
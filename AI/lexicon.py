@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+キーワード辞書マッチャー
+Aho–Corasick法で複数カテゴリの単語リストを一度にコンパイルし、
+テキストを1回走査するだけで全カテゴリのヒットと重みを求める
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+# カテゴリ -> 単語リスト、または 単語 -> 重み の辞書
+LexiconSpec = Mapping[str, Union[Sequence[str], Mapping[str, float]]]
+
+
+@dataclass
+class LexiconMatch:
+    """1つのテキストに対するマッチ結果"""
+    hits: Dict[str, List[str]] = field(default_factory=dict)  # カテゴリ -> ヒットした単語
+    weights: Dict[str, float] = field(default_factory=dict)  # カテゴリ -> 重みの合計
+
+    def has(self, category: str) -> bool:
+        """カテゴリにヒットがあるか"""
+        return category in self.hits
+
+    def first(self, priority: Iterable[str]) -> Optional[str]:
+        """優先順位の中で最初にヒットしたカテゴリ"""
+        for category in priority:
+            if category in self.hits:
+                return category
+        return None
+
+    def strongest(self) -> Optional[str]:
+        """重みの合計が最大のカテゴリ"""
+        if not self.weights:
+            return None
+        return max(self.weights, key=self.weights.get)
+
+
+class Lexicon:
+    """コンパイル済みの複数パターン辞書"""
+
+    def __init__(self, categories: LexiconSpec, case_insensitive: bool = True):
+        self.case_insensitive = case_insensitive
+        self.categories = list(categories)
+
+        # トライ木（遷移表・失敗リンク・出力）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[Tuple[str, str, float], ...]] = [()]
+
+        for category, words in categories.items():
+            if isinstance(words, Mapping):
+                items = words.items()
+            else:
+                items = ((word, 1.0) for word in words)
+            for word, weight in items:
+                self._add(category, word, float(weight))
+
+        self._build_failure_links()
+
+    def _add(self, category: str, word: str, weight: float):
+        """単語をトライ木に追加"""
+        if self.case_insensitive:
+            word = word.lower()
+        if not word:
+            return
+
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += ((category, word, weight),)
+
+    def _build_failure_links(self):
+        """幅優先で失敗リンクを張り、出力を失敗先とマージ"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # 失敗先の出力を事前にマージしておくことで走査時の辿り直しを無くす
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def match(self, text: str) -> LexiconMatch:
+        """テキストを1回走査して全カテゴリのヒットを返す"""
+        if self.case_insensitive:
+            text = text.lower()
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        result = LexiconMatch()
+        hits = result.hits
+        weights = result.weights
+
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for category, word, weight in output[state]:
+                hits.setdefault(category, []).append(word)
+                weights[category] = weights.get(category, 0.0) + weight
+
+        return result
+
+    def match_batch(self, texts: Iterable[str]) -> List[LexiconMatch]:
+        """複数の発話をまとめて分類"""
+        match = self.match
+        return [match(text) for text in texts]
+
+    def classify(self, text: str, priority: Sequence[str], default: Optional[str] = None) -> Optional[str]:
+        """優先順位に従って最初にヒットしたカテゴリを返す"""
+        category = self.match(text).first(priority)
+        return default if category is None else category
+
+    def classify_batch(self, texts: Iterable[str], priority: Sequence[str],
+                       default: Optional[str] = None) -> List[Optional[str]]:
+        """複数の発話を優先順位に従って分類"""
+        results = []
+        for result in self.match_batch(texts):
+            category = result.first(priority)
+            results.append(default if category is None else category)
+        return results
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+リップシンク
+再生する音声からフレームごとの口の開き（音量の包絡）と大まかな口の形（母音）を
+再生前にまとめて解析し、再生の時刻に合わせてアバターパラメータとしてOSCで送る
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from audio_output import PCMClip
+from config import config
+from metrics import LatencyStats
+
+# 口の形（OSCではこの番号を送る）
+VISEMES = ("sil", "a", "i", "u", "e", "o")
+
+# 日本語の母音（あいうえお）の第1・第2フォルマントの目安（Hz）
+VOWEL_FORMANTS = np.array([
+    [850.0, 1400.0],
+    [330.0, 2800.0],
+    [380.0, 1550.0],
+    [530.0, 2400.0],
+    [520.0, 950.0]
+])
+
+SILENCE_DB = -50.0  # これ以下のフレームは無音
+MOUTH_RANGE_DB = 24.0  # 口を閉じてから開ききるまでの音量の幅
+MOUTH_THRESHOLD = 0.08  # これ未満の開きは閉じているとみなす
+LIFTER_SECONDS = 0.003  # スペクトル包絡に残すケプストラムの範囲（声の周期より短く）
+
+
+@dataclass
+class LipSyncTrack:
+    """1クリップ分の口の動き（i番目のフレームは再生開始から i / frame_rate 秒）"""
+    frame_rate: float
+    mouth_open: np.ndarray  # float32、0.0〜1.0
+    visemes: np.ndarray  # int8、VISEMES の番号
+
+    def __len__(self) -> int:
+        return len(self.mouth_open)
+
+
+class LipSyncAnalyzer:
+    """PCMからフレームごとの口の開きと口の形を求める
+
+    フレームの切り出し・音量・スペクトルはすべて行列演算でまとめて計算する
+    """
+
+    def __init__(self, frame_rate: Optional[float] = None):
+        self.frame_rate = frame_rate or config.lip_sync_frame_rate
+        self.latency = LatencyStats()  # 1クリップの解析時間
+        self.audio_seconds = 0.0
+        self.analysis_seconds = 0.0
+
+    def analyze(self, clip: PCMClip) -> LipSyncTrack:
+        start = time.perf_counter()
+        pcm = np.frombuffer(clip.samples, dtype="<i2")
+        if clip.channels > 1:
+            pcm = pcm.reshape(-1, clip.channels).mean(axis=1)
+        samples = pcm.astype(np.float32)
+        samples *= 1.0 / 32768
+
+        # フレーム i は再生開始から i / frame_rate 秒の前後半フレーム分
+        hop = max(16, int(round(clip.sample_rate / self.frame_rate)))
+        count = len(samples) // hop + 1
+        padded = np.pad(samples, (hop // 2, max(0, count * hop - len(samples) - hop // 2)))
+        frames = padded[:count * hop].reshape(count, hop)
+
+        rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / hop)
+        level = 20 * np.log10(rms + 1e-6)
+        voiced = level > SILENCE_DB
+        # 音量の幅はクリップの大きめの声を基準にする（音量を揃えていない音声でも同じ動きになる）
+        reference = float(np.percentile(level[voiced], 90)) if voiced.any() else 0.0
+        mouth = np.clip((level - (reference - MOUTH_RANGE_DB)) / MOUTH_RANGE_DB, 0.0, 1.0)
+        mouth[~voiced] = 0.0
+        mouth = np.convolve(mouth, [0.25, 0.5, 0.25], mode="same").astype(np.float32)
+        mouth[mouth < MOUTH_THRESHOLD] = 0.0
+
+        visemes = self._classify(frames, clip.sample_rate)
+        visemes[mouth == 0.0] = 0
+        # 1フレームだけ別の形になるちらつきを前後の形に揃える
+        if count > 2:
+            flicker = (visemes[:-2] == visemes[2:]) & (visemes[1:-1] != visemes[:-2])
+            visemes[1:-1][flicker] = visemes[:-2][flicker]
+
+        elapsed = time.perf_counter() - start
+        self.latency.record(elapsed)
+        self.analysis_seconds += elapsed
+        self.audio_seconds += len(samples) / clip.sample_rate
+        return LipSyncTrack(self.frame_rate, mouth, visemes)
+
+    @staticmethod
+    def _classify(frames: np.ndarray, sample_rate: int) -> np.ndarray:
+        """スペクトル包絡の帯域ごとのピークを第1・第2フォルマントとみなし、最も近い母音を選ぶ
+
+        包絡はケプストラムの低次だけを残して求め、声の高さによる倍音の山を消す
+        """
+        size = frames.shape[1]
+        window = np.hanning(size).astype(np.float32)
+        log_power = np.log(np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-10)
+        cepstrum = np.fft.irfft(log_power, n=size, axis=1)
+        cutoff = max(1, int(sample_rate * LIFTER_SECONDS))
+        cepstrum[:, cutoff:size - cutoff + 1] = 0.0
+        envelope = np.fft.rfft(cepstrum, axis=1).real
+        freqs = np.fft.rfftfreq(size, 1.0 / sample_rate)
+
+        formants = []
+        for low, high in ((250.0, 1000.0), (900.0, 3200.0)):
+            band = (freqs >= low) & (freqs < high)
+            formants.append(freqs[band][np.argmax(envelope[:, band], axis=1)])
+        estimated = np.log(np.maximum(np.stack(formants, axis=1), 1.0))
+
+        distance = ((estimated[:, None, :] - np.log(VOWEL_FORMANTS)[None, :, :]) ** 2).sum(axis=2)
+        return (np.argmin(distance, axis=1) + 1).astype(np.int8)
+
+    def stats(self) -> Dict[str, Any]:
+        """1クリップの解析時間と、実時間の何倍の速さで解析できているか"""
+        return {
+            **self.latency.summary(),
+            "speed": self.audio_seconds / self.analysis_seconds if self.analysis_seconds else 0.0
+        }
+
+
+class LipSyncDriver:
+    """解析済みの口の動きを再生の時刻に合わせてOSCで送る
+
+    - 送るのは再生開始時刻からの経過時間に対応するフレームで、遅れたフレームは飛ばす
+    - 再生が終わった・止められたら口を閉じる
+    """
+
+    def __init__(self, osc_output, frame_rate: Optional[float] = None):
+        self.osc_output = osc_output  # set_many()/flush() を持つ送信先（OSCParameterBatcherなど）
+        self.analyzer = LipSyncAnalyzer(frame_rate)
+        self.mouth_address = f"/avatar/parameters/{config.lip_sync_mouth_parameter}"
+        self.viseme_address = f"/avatar/parameters/{config.lip_sync_viseme_parameter}"
+        self.logger = logging.getLogger(__name__)
+        self._task: Optional[asyncio.Task] = None
+
+        # 統計
+        self.tracks = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.lag = LatencyStats()  # 各フレームの予定時刻から送信までの遅れ
+
+    def begin(self, track: LipSyncTrack, started_at: float) -> asyncio.Task:
+        """再生が started_at（time.monotonic()）に始まったクリップの口の動きを送り始める
+
+        返り値は end() に渡すハンドル（前のクリップの送信は止める）
+        """
+        if self._task is not None:
+            self._task.cancel()
+        self.tracks += 1
+        self._task = asyncio.get_running_loop().create_task(self._run(track, started_at))
+        return self._task
+
+    def end(self, handle: asyncio.Task):
+        """handle の送信を止め、それが今送っているクリップなら口を閉じる"""
+        handle.cancel()
+        if handle is not self._task:
+            return  # 次のクリップがもう始まっている
+        self._task = None
+        self._send(0.0, 0)
+
+    def _send(self, mouth: float, viseme: int):
+        self.osc_output.set_many({self.mouth_address: mouth, self.viseme_address: viseme})
+        self.osc_output.flush()
+
+    async def _run(self, track: LipSyncTrack, started_at: float):
+        interval = 1.0 / track.frame_rate
+        index = 0
+        while index < len(track):
+            now = time.monotonic()
+            due = started_at + index * interval
+            if now < due:
+                await asyncio.sleep(due - now)
+                continue
+            current = int((now - started_at) / interval)
+            if current >= len(track):
+                self.frames_skipped += len(track) - index
+                break
+            if current > index:
+                self.frames_skipped += current - index
+                index = current
+            self.lag.record(now - (started_at + index * interval))
+            self._send(float(track.mouth_open[index]), int(track.visemes[index]))
+            self.frames_sent += 1
+            index += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """送ったクリップ数・フレーム数・飛ばしたフレーム数・遅れ・解析時間"""
+        return {
+            "tracks": self.tracks,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "lag": self.lag.summary(),
+            "analysis": self.analyzer.stats()
+        }
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLMバックエンド
+OpenAI APIとローカルのOpenAI互換サーバー（llama.cpp / Ollamaなど）に対応
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import openai
+
+from config import config
+
+Message = Dict[str, str]
+
+
+class LLMBackend(ABC):
+    """LLMバックエンドの抽象基底クラス"""
+
+    name: str = "base"
+
+    @abstractmethod
+    async def complete(self, messages: List[Message], max_tokens: Optional[int] = None,
+                       temperature: Optional[float] = None) -> str:
+        """応答全体を生成"""
+        pass
+
+    @abstractmethod
+    def stream(self, messages: List[Message], max_tokens: Optional[int] = None,
+               temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """応答をトークン単位で生成"""
+        pass
+
+    async def aclose(self):
+        """接続を閉じる"""
+        pass
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """OpenAI互換のChat Completions APIを使うバックエンド
+
+    プロセス内で1つのAsyncOpenAIクライアント（keep-aliveの接続プール付き）を使い回し、
+    ターンごとの接続確立を避ける。タイムアウトとリトライはバックエンドごとに設定する
+    """
+
+    def __init__(self, name: str, api_key: str, model: str, base_url: Optional[str] = None,
+                 timeout: float = 30.0, max_retries: int = 2, max_connections: int = 16):
+        self.name = name
+        self.model = model
+        self.logger = logging.getLogger(__name__)
+        self.http_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            timeout=timeout,
+            max_retries=max_retries,
+            http_client=self.http_client
+        )
+
+    async def complete(self, messages: List[Message], max_tokens: Optional[int] = None,
+                       temperature: Optional[float] = None) -> str:
+        """応答全体を生成"""
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens or config.max_tokens,
+            temperature=config.temperature if temperature is None else temperature
+        )
+        return response.choices[0].message.content or ""
+
+    async def stream(self, messages: List[Message], max_tokens: Optional[int] = None,
+                     temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """応答をトークン単位で生成"""
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens or config.max_tokens,
+            temperature=config.temperature if temperature is None else temperature,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+        finally:
+            # 途中で読むのをやめた場合も接続をプールに返す
+            await stream.close()
+
+    async def aclose(self):
+        """接続プールを閉じる"""
+        await self.client.close()
+        await self.http_client.aclose()
+
+
+class OpenAIBackend(OpenAICompatibleBackend):
+    """OpenAI APIバックエンド"""
+
+    def __init__(self):
+        super().__init__(
+            name="openai",
+            api_key=config.openai_api_key,
+            model=config.openai_model,
+            base_url=config.openai_base_url,
+            timeout=config.openai_timeout,
+            max_retries=config.openai_max_retries,
+            max_connections=config.llm_max_connections
+        )
+
+
+class LocalLLMBackend(OpenAICompatibleBackend):
+    """ローカルのOpenAI互換サーバー（llama.cpp server / Ollamaなど）"""
+
+    def __init__(self):
+        super().__init__(
+            name="local",
+            # ローカルサーバーはキーを検証しないが、クライアントには何らかの値が必要
+            api_key=config.local_llm_api_key or "local",
+            model=config.local_llm_model,
+            base_url=config.local_llm_url,
+            timeout=config.local_llm_timeout,
+            max_retries=config.local_llm_max_retries,
+            max_connections=config.llm_max_connections
+        )
+
+
+def create_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    """設定に基づいてLLMバックエンドを作成"""
+    backend = (name or config.llm_backend).lower()
+
+    if backend == "local":
+        return LocalLLMBackend()
+    else:  # デフォルトはOpenAI
+        return OpenAIBackend()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+長期記憶ストア
+プレイヤーごとの事実や過去の発言をSQLiteに保存し、
+メモリ上のベクトルインデックスから関連する記憶を高速に検索する
+"""
+
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from text_embedding import HashingEmbedder
+
+# 自己紹介や好みなど、事実として記憶する発言のパターン
+FACT_PATTERNS = [
+    re.compile(r"(私|わたし|僕|ぼく|俺|おれ)(の名前)?(は|が)"),
+    re.compile(r"名前は"),
+    re.compile(r"(が|も)(好き|大好き|嫌い|苦手)"),
+    re.compile(r"(住んで|働いて|通って)(いる|る|います)"),
+    re.compile(r"(趣味|誕生日|仕事)は")
+]
+
+# 事実は発言より優先して思い出す
+FACT_SCORE_BONUS = 0.1
+
+
+@dataclass
+class Memory:
+    """1件の記憶"""
+    id: int
+    player_id: str
+    kind: str  # "fact" または "turn"
+    text: str
+    created_at: float
+    score: float = 0.0
+
+
+class _PlayerIndex:
+    """1プレイヤー分の埋め込み行列（容量は倍々で拡張）"""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.is_fact = np.zeros(capacity, dtype=bool)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+
+    def add(self, memory_id: int, vector: np.ndarray, is_fact: bool):
+        if self.size == len(self.ids):
+            capacity = len(self.ids) * 2
+            self.ids = np.resize(self.ids, capacity)
+            self.is_fact = np.resize(self.is_fact, capacity)
+            vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+            vectors[:self.size] = self.vectors
+            self.vectors = vectors
+        self.ids[self.size] = memory_id
+        self.is_fact[self.size] = is_fact
+        self.vectors[self.size] = vector
+        self.size += 1
+
+    def search(self, query: np.ndarray, k: int, min_score: float) -> List[Tuple[int, float]]:
+        """コサイン類似度の上位k件 (id, スコア)"""
+        if self.size == 0:
+            return []
+        scores = self.vectors[:self.size] @ query
+        scores += self.is_fact[:self.size] * np.float32(FACT_SCORE_BONUS)
+        k = min(k, self.size)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+class MemoryStore:
+    """SQLiteに永続化される長期記憶
+
+    書き込みと本文の読み出しは専用スレッドで行い、イベントループを止めない。
+    類似度検索はメモリ上のインデックスのみで完結する
+    """
+
+    def __init__(self, path: str = "ai_memory.db", embedder: Optional[HashingEmbedder] = None,
+                 min_score: float = 0.2):
+        self.path = path
+        self.embedder = embedder or HashingEmbedder()
+        self.min_score = min_score
+        self.logger = logging.getLogger(__name__)
+
+        self._indexes: Dict[str, _PlayerIndex] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-store")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS memories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                embedding BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_player ON memories(player_id)")
+        self._conn.commit()
+        self._load_index()
+
+    def _load_index(self):
+        """起動時に全記憶の埋め込みをインデックスへ読み込む"""
+        count = 0
+        rows = self._conn.execute("SELECT id, player_id, kind, embedding FROM memories ORDER BY id")
+        for memory_id, player_id, kind, blob in rows:
+            vector = np.frombuffer(blob, dtype=np.float32)
+            if vector.shape[0] != self.embedder.dim:
+                continue
+            self._index_for(player_id).add(memory_id, vector, kind == "fact")
+            count += 1
+        self.logger.info(f"長期記憶を{count}件読み込みました ({self.path})")
+
+    def _index_for(self, player_id: str) -> _PlayerIndex:
+        index = self._indexes.get(player_id)
+        if index is None:
+            index = self._indexes[player_id] = _PlayerIndex(self.embedder.dim)
+        return index
+
+    async def add(self, player_id: str, text: str, kind: str = "turn") -> int:
+        """記憶を追加してIDを返す"""
+        vector = self.embedder.embed(text)
+        created_at = time.time()
+        loop = asyncio.get_running_loop()
+        memory_id = await loop.run_in_executor(
+            self._executor, self._insert, player_id, kind, text, created_at, vector.tobytes()
+        )
+        self._index_for(player_id).add(memory_id, vector, kind == "fact")
+        return memory_id
+
+    def _insert(self, player_id: str, kind: str, text: str, created_at: float, blob: bytes) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO memories (player_id, kind, text, created_at, embedding) VALUES (?, ?, ?, ?, ?)",
+            (player_id, kind, text, created_at, blob)
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    async def remember_turn(self, player_id: str, user_input: str) -> int:
+        """発言を記憶する（事実らしい発言は事実として1件だけ記憶する）"""
+        kind = "fact" if is_fact_statement(user_input) else "turn"
+        return await self.add(player_id, user_input, kind)
+
+    async def search(self, player_id: str, query: str, k: int = 5) -> List[Memory]:
+        """クエリに関連する記憶を上位k件返す"""
+        index = self._indexes.get(player_id)
+        if index is None:
+            return []
+
+        hits = index.search(self.embedder.embed(query), k, self.min_score)
+        if not hits:
+            return []
+
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(self._executor, self._fetch, [memory_id for memory_id, _ in hits])
+        return [
+            Memory(memory_id, *rows[memory_id], score)
+            for memory_id, score in hits
+            if memory_id in rows
+        ]
+
+    def _fetch(self, ids: List[int]) -> Dict[int, Tuple[str, str, str, float]]:
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn.execute(
+            f"SELECT id, player_id, kind, text, created_at FROM memories WHERE id IN ({placeholders})", ids
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def count(self, player_id: Optional[str] = None) -> int:
+        """インデックス上の記憶件数"""
+        if player_id is not None:
+            index = self._indexes.get(player_id)
+            return index.size if index else 0
+        return sum(index.size for index in self._indexes.values())
+
+    def close(self):
+        """書き込みを完了させて接続を閉じる"""
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+def is_fact_statement(text: str) -> bool:
+    """自己紹介や好みなど、事実として残すべき発言か"""
+    return any(pattern.search(text) for pattern in FACT_PATTERNS)
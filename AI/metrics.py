@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+計測ユーティリティ
+レイテンシなどの計測値を保持し、平均やパーセンタイルを集計する
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class LatencyStats:
+    """直近の計測値（秒）を保持してパーセンタイルを計算"""
+
+    def __init__(self, max_samples: int = 1000):
+        self.samples: deque = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        """計測値を追加"""
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        """withブロックの実行時間を記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start)
+
+    def percentile(self, p: float) -> float:
+        """直近サンプルのパーセンタイル（秒）"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    @property
+    def mean(self) -> float:
+        """累計の平均値（秒）"""
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """件数・平均・p50/p95/p99をミリ秒で返す"""
+        return {
+            "count": self.count,
+            "mean_ms": self.mean * 1000.0,
+            "p50_ms": self.percentile(50) * 1000.0,
+            "p95_ms": self.percentile(95) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0
+        }
+
+
+class EventLoopMonitor:
+    """イベントループの停止時間を計測
+
+    interval秒ごとに起きるタスクを動かし、予定より遅れて起きた分を
+    イベントループが他の処理で止まっていた時間として記録する
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stalls = LatencyStats(max_samples=10000)
+        self.max_stall = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            stall = max(0.0, time.perf_counter() - expected)
+            self.stalls.record(stall)
+            self.max_stall = max(self.max_stall, stall)
+
+    def summary(self) -> Dict[str, float]:
+        """停止時間のp50/p95/p99と最大値（ミリ秒）"""
+        return {**self.stalls.summary(), "max_ms": self.max_stall * 1000.0}
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OSCエンコーダー・デコーダー
+アドレスと型タグのエンコード結果をキャッシュし、値の部分だけを毎回エンコードする。
+デコード時も型タグごとに事前コンパイルしたstructで引数をまとめて読む
+"""
+
+import struct
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+# 即時実行を表すタイムタグ
+IMMEDIATELY = struct.pack(">Q", 1)
+BUNDLE_HEADER = b"#bundle\x00"
+
+_INT32 = struct.Struct(">i")
+_FLOAT32 = struct.Struct(">f")
+
+# (アドレス, 型タグ) -> エンコード済みのプレフィックス
+_prefix_cache: Dict[Tuple[str, str], bytes] = {}
+
+
+def pad_string(value: bytes) -> bytes:
+    """NUL終端して4バイト境界に揃える"""
+    return value + b"\x00" * (4 - len(value) % 4)
+
+
+def pad_blob(value: bytes) -> bytes:
+    """サイズを前置して4バイト境界に揃える"""
+    padding = (4 - len(value) % 4) % 4
+    return _INT32.pack(len(value)) + value + b"\x00" * padding
+
+
+def _type_tag(value: Any) -> str:
+    if value is True:
+        return "T"
+    if value is False:
+        return "F"
+    if value is None:
+        return "N"
+    if isinstance(value, int):
+        return "i"
+    if isinstance(value, float):
+        return "f"
+    if isinstance(value, str):
+        return "s"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "b"
+    raise TypeError(f"OSCで送信できない型です: {type(value).__name__}")
+
+
+def _prefix(address: str, tags: str) -> bytes:
+    """アドレスと型タグのエンコード結果（キャッシュ付き）"""
+    key = (address, tags)
+    prefix = _prefix_cache.get(key)
+    if prefix is None:
+        prefix = pad_string(address.encode("utf-8")) + pad_string(("," + tags).encode("ascii"))
+        _prefix_cache[key] = prefix
+    return prefix
+
+
+def encode_message(address: str, args: Sequence[Any] = ()) -> bytes:
+    """OSCメッセージをエンコード"""
+    if not isinstance(args, (list, tuple)):
+        args = (args,)
+    tags = "".join(_type_tag(arg) for arg in args)
+    parts = [_prefix(address, tags)]
+    for tag, arg in zip(tags, args):
+        if tag == "f":
+            parts.append(_FLOAT32.pack(arg))
+        elif tag == "i":
+            parts.append(_INT32.pack(arg))
+        elif tag == "s":
+            parts.append(pad_string(arg.encode("utf-8")))
+        elif tag == "b":
+            parts.append(pad_blob(bytes(arg)))
+    return b"".join(parts)
+
+
+def encode_bundle(elements: Iterable[bytes], timetag: bytes = IMMEDIATELY) -> bytes:
+    """エンコード済みのメッセージをOSCバンドルにまとめる"""
+    parts = [BUNDLE_HEADER, timetag]
+    for element in elements:
+        parts.append(_INT32.pack(len(element)))
+        parts.append(element)
+    return b"".join(parts)
+
+
+# ---- デコード ----
+
+# 型タグ文字列 -> (固定長部分のstruct, 可変長の型を含むか)
+_tag_cache: Dict[bytes, Tuple[struct.Struct, bool]] = {}
+# エンコード済みアドレス -> 文字列
+_address_cache: Dict[bytes, str] = {}
+_FIXED_FORMATS = {ord("i"): "i", ord("f"): "f", ord("d"): "d", ord("h"): "q", ord("t"): "Q"}
+
+
+def _read_string(data: bytes, offset: int) -> Tuple[bytes, int]:
+    """NUL終端文字列を読み、次の4バイト境界のオフセットを返す"""
+    end = data.index(b"\x00", offset)
+    return data[offset:end], (end + 4) & ~3
+
+
+def _compiled_tags(tags: bytes) -> Tuple[struct.Struct, bool]:
+    """固定長の型だけなら1つのstructで一度に読めるようにする"""
+    compiled = _tag_cache.get(tags)
+    if compiled is None:
+        if all(tag in _FIXED_FORMATS or tag in b"TFN" for tag in tags):
+            fmt = ">" + "".join(_FIXED_FORMATS[tag] for tag in tags if tag in _FIXED_FORMATS)
+            compiled = (struct.Struct(fmt), False)
+        else:
+            compiled = (struct.Struct(">"), True)
+        _tag_cache[tags] = compiled
+    return compiled
+
+
+def decode_message(data: bytes, offset: int = 0, end: Optional[int] = None) -> Tuple[str, Tuple[Any, ...]]:
+    """OSCメッセージを (アドレス, 引数) にデコード"""
+    end = len(data) if end is None else end
+    raw_address, offset = _read_string(data, offset)
+    address = _address_cache.get(raw_address)
+    if address is None:
+        address = raw_address.decode("utf-8")
+        if len(_address_cache) < 4096:
+            _address_cache[raw_address] = address
+
+    if offset >= end or data[offset] != ord(","):
+        return address, ()
+    tags, offset = _read_string(data, offset + 1)
+    fixed, variable = _compiled_tags(tags)
+
+    if not variable:
+        values = fixed.unpack_from(data, offset)
+        if len(values) == len(tags):
+            return address, values
+        # T/F/Nを含む場合は値を差し込む
+        args = []
+        index = 0
+        for tag in tags:
+            if tag == 84:  # T
+                args.append(True)
+            elif tag == 70:  # F
+                args.append(False)
+            elif tag == 78:  # N
+                args.append(None)
+            else:
+                args.append(values[index])
+                index += 1
+        return address, tuple(args)
+
+    args = []
+    for tag in tags:
+        if tag == 105:  # i
+            args.append(_INT32.unpack_from(data, offset)[0])
+            offset += 4
+        elif tag == 102:  # f
+            args.append(_FLOAT32.unpack_from(data, offset)[0])
+            offset += 4
+        elif tag == 115:  # s
+            value, offset = _read_string(data, offset)
+            args.append(value.decode("utf-8"))
+        elif tag == 98:  # b
+            size = _INT32.unpack_from(data, offset)[0]
+            args.append(data[offset + 4:offset + 4 + size])
+            offset += 4 + size + (4 - size % 4) % 4
+        elif tag == 84:
+            args.append(True)
+        elif tag == 70:
+            args.append(False)
+        elif tag == 78:
+            args.append(None)
+        elif tag in _FIXED_FORMATS:
+            value_struct = struct.Struct(">" + _FIXED_FORMATS[tag])
+            args.append(value_struct.unpack_from(data, offset)[0])
+            offset += value_struct.size
+        else:
+            raise ValueError(f"未対応のOSC型タグです: {chr(tag)}")
+    return address, tuple(args)
+
+
+def decode_packet(data: bytes) -> Iterator[Tuple[str, Tuple[Any, ...]]]:
+    """OSCパケット（メッセージまたはバンドル）を (アドレス, 引数) の列にデコード"""
+    if not data.startswith(BUNDLE_HEADER):
+        yield decode_message(data)
+        return
+    offset = len(BUNDLE_HEADER) + 8  # タイムタグは読み飛ばす
+    while offset < len(data):
+        size = _INT32.unpack_from(data, offset)[0]
+        offset += 4
+        if data.startswith(BUNDLE_HEADER, offset):
+            yield from decode_packet(data[offset:offset + size])
+        else:
+            yield decode_message(data, offset, offset + size)
+        offset += size
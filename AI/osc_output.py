@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OSC出力レイヤー
+1フレーム分のパラメータ更新を1つのOSCバンドルにまとめ、
+値が変わっていないパラメータは送らない
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config import config
+from osc_codec import encode_bundle, encode_message
+
+
+class OSCParameterBatcher:
+    """アバターパラメータの差分送信とバンドル化
+
+    - 同じtick内の同じアドレスへの更新は最後の値だけを残す
+    - 前回送った値と同じ値は送らない
+    - アドレスごとに最小送信間隔を守り、早すぎる更新は次のtickに回す
+    """
+
+    def __init__(self, sender, tick_rate: Optional[float] = None, min_interval: Optional[float] = None,
+                 float_epsilon: Optional[float] = None):
+        self.sender = sender  # send(bytes) を持つ送信先（AsyncOSCSenderなど）
+        self.tick_interval = 1.0 / (tick_rate or config.osc_tick_rate)
+        self.min_interval = config.osc_min_interval if min_interval is None else min_interval
+        self.float_epsilon = config.osc_float_epsilon if float_epsilon is None else float_epsilon
+        self.logger = logging.getLogger(__name__)
+
+        self._pending: Dict[str, Any] = {}
+        self._last_sent: Dict[str, Any] = {}
+        self._last_sent_at: Dict[str, float] = {}
+        self._tick_task: Optional[asyncio.Task] = None
+
+        # 統計
+        self.bundles_sent = 0
+        self.messages_sent = 0
+        self.coalesced = 0
+        self.unchanged_dropped = 0
+        self.rate_limited = 0
+
+    def set(self, address: str, value: Any):
+        """パラメータ更新を登録（送信は次のflush）"""
+        if address in self._pending:
+            self.coalesced += 1
+        self._pending[address] = value
+        self._ensure_ticking()
+
+    def set_many(self, values: Dict[str, Any]):
+        """複数のパラメータ更新を登録"""
+        for address, value in values.items():
+            self.set(address, value)
+
+    def _unchanged(self, address: str, value: Any) -> bool:
+        """前回送った値と同じか"""
+        if address not in self._last_sent:
+            return False
+        last = self._last_sent[address]
+        if isinstance(value, float) and isinstance(last, float):
+            return abs(value - last) <= self.float_epsilon
+        return type(value) is type(last) and value == last
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """保留中の更新を1つのバンドルで送信し、送ったメッセージ数を返す"""
+        if not self._pending:
+            return 0
+        now = time.monotonic() if now is None else now
+
+        ready = {}
+        deferred = {}
+        for address, value in self._pending.items():
+            if self._unchanged(address, value):
+                self.unchanged_dropped += 1
+            elif now - self._last_sent_at.get(address, float("-inf")) < self.min_interval:
+                self.rate_limited += 1
+                deferred[address] = value
+            else:
+                ready[address] = value
+        self._pending = deferred
+
+        if not ready:
+            return 0
+
+        try:
+            if len(ready) == 1:
+                address, value = next(iter(ready.items()))
+                self.sender.send(encode_message(address, value))
+            else:
+                self.sender.send(encode_bundle(
+                    encode_message(address, value) for address, value in ready.items()
+                ))
+                self.bundles_sent += 1
+        except Exception as e:
+            self.logger.error(f"OSC送信エラー: {e}")
+            return 0
+
+        for address, value in ready.items():
+            self._last_sent[address] = value
+            self._last_sent_at[address] = now
+        self.messages_sent += len(ready)
+        return len(ready)
+
+    def _ensure_ticking(self):
+        """イベントループ上でtickタスクを起動"""
+        if self._tick_task is not None and not self._tick_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # ループ外ではflush()を明示的に呼ぶ
+        self._tick_task = loop.create_task(self._run())
+
+    async def _run(self):
+        """保留中の更新を送信する
+
+        送信間隔待ちの更新が残っていれば、そのうち最も早く送れる時刻まで待つ。
+        1tick待っても保留が無ければ終了する（次の set() で再び起動される）
+        """
+        while True:
+            self.flush()
+            delay = self.tick_interval
+            if self._pending:
+                due = min(self._last_sent_at.get(address, float("-inf")) for address in self._pending)
+                delay = max(delay, due + self.min_interval - time.monotonic())
+            await asyncio.sleep(delay)
+            if not self._pending:
+                return
+
+    def forget(self, address: Optional[str] = None):
+        """前回値を忘れ、次回は必ず送信させる（アバター切り替え時など）"""
+        if address is None:
+            self._last_sent.clear()
+        else:
+            self._last_sent.pop(address, None)
+
+    def stats(self) -> Dict[str, int]:
+        """送信統計"""
+        return {
+            "bundles_sent": self.bundles_sent,
+            "messages_sent": self.messages_sent,
+            "coalesced": self.coalesced,
+            "unchanged_dropped": self.unchanged_dropped,
+            "rate_limited": self.rate_limited,
+            "pending": len(self._pending)
+        }
+
+    async def close(self):
+        """tickを止め、残りを送信"""
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+        self._last_sent_at.clear()
+        self.flush()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OSC受信サーバー
+VRChatが送信するアバターパラメータやチャットボックスのメッセージを受け取り、
+アドレスパターンのトライ木で登録済みのハンドラに振り分ける
+"""
+
+import asyncio
+import inspect
+import logging
+import socket
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import config
+from osc_codec import decode_packet
+
+# バースト受信時にカーネル側で取りこぼさないための受信バッファサイズ
+RECEIVE_BUFFER_SIZE = 1 << 20
+
+# handler(address, *args)。同期関数・非同期関数のどちらも登録できる
+OSCHandler = Callable[..., Any]
+
+
+class _TrieNode:
+    __slots__ = ("children", "wildcard", "handlers")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.wildcard: Optional["_TrieNode"] = None
+        self.handlers: List[OSCHandler] = []
+
+
+class AddressTrie:
+    """OSCアドレスパターンのトライ木
+
+    パターンは "/" 区切りのセグメントで、"*" は任意の1セグメントに一致する。
+    一度解決したアドレスの結果はキャッシュし、以降は辞書引き1回で振り分ける
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self._root = _TrieNode()
+        self._cache: Dict[str, Tuple[OSCHandler, ...]] = {}
+        self._cache_size = cache_size
+
+    def add(self, pattern: str, handler: OSCHandler):
+        """パターンにハンドラを登録"""
+        node = self._root
+        for segment in pattern.strip("/").split("/"):
+            if segment == "*":
+                if node.wildcard is None:
+                    node.wildcard = _TrieNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _TrieNode())
+        node.handlers.append(handler)
+        self._cache.clear()
+
+    def match(self, address: str) -> Tuple[OSCHandler, ...]:
+        """アドレスに一致するハンドラ（登録順）"""
+        handlers = self._cache.get(address)
+        if handlers is not None:
+            return handlers
+
+        nodes = [self._root]
+        for segment in address.strip("/").split("/"):
+            next_nodes = []
+            for node in nodes:
+                child = node.children.get(segment)
+                if child is not None:
+                    next_nodes.append(child)
+                if node.wildcard is not None:
+                    next_nodes.append(node.wildcard)
+            if not next_nodes:
+                break
+            nodes = next_nodes
+        else:
+            handlers = tuple(handler for node in nodes for handler in node.handlers)
+
+        if handlers is None:
+            handlers = ()
+        if len(self._cache) < self._cache_size:
+            self._cache[address] = handlers
+        return handlers
+
+
+class _ServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "OSCServer"):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server.dispatch_packet(data)
+
+    def error_received(self, exc):
+        self.server.logger.debug(f"OSC受信エラー: {exc}")
+
+
+class OSCServer:
+    """非同期OSC受信サーバー
+
+    受信したパケットはイベントループ上でそのままデコード・振り分けを行う。
+    同期ハンドラはその場で呼び、非同期ハンドラはタスクとして実行する
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None):
+        self.host = host or config.osc_listen_ip
+        self.port = port or config.osc_listen_port
+        self.routes = AddressTrie()
+        self.logger = logging.getLogger(__name__)
+
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._tasks = set()
+
+        # 統計
+        self.received = 0
+        self.dispatched = 0
+        self.unmatched = 0
+        self.decode_errors = 0
+        self.handler_errors = 0
+
+    def route(self, pattern: str, handler: OSCHandler) -> "OSCServer":
+        """アドレスパターンにハンドラを登録"""
+        self.routes.add(pattern, handler)
+        return self
+
+    async def start(self):
+        """受信を開始"""
+        if self._transport is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ServerProtocol(self), local_addr=(self.host, self.port)
+        )
+        sock = self._transport.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+            except OSError:
+                pass
+        self.logger.info(f"OSC受信を開始: {self.host}:{self.port}")
+
+    def dispatch_packet(self, data: bytes):
+        """受信したパケットをデコードしてハンドラに振り分ける"""
+        try:
+            for address, args in decode_packet(data):
+                self.dispatch(address, args)
+        except (ValueError, IndexError, UnicodeDecodeError, struct.error) as e:
+            self.decode_errors += 1
+            self.logger.debug(f"OSCデコードエラー: {e}")
+
+    def dispatch(self, address: str, args: Tuple[Any, ...]):
+        """1メッセージを一致するハンドラに渡す"""
+        self.received += 1
+        handlers = self.routes.match(address)
+        if not handlers:
+            self.unmatched += 1
+            return
+        for handler in handlers:
+            try:
+                result = handler(address, *args)
+            except Exception as e:
+                self.handler_errors += 1
+                self.logger.error(f"OSCハンドラエラー ({address}): {e}")
+                continue
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+            self.dispatched += 1
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.handler_errors += 1
+            self.logger.error(f"OSCハンドラエラー: {task.exception()}")
+
+    def stats(self) -> Dict[str, int]:
+        """受信統計"""
+        return {
+            "received": self.received,
+            "dispatched": self.dispatched,
+            "unmatched": self.unmatched,
+            "decode_errors": self.decode_errors,
+            "handler_errors": self.handler_errors,
+            "pending_tasks": len(self._tasks)
+        }
+
+    async def close(self):
+        """受信を止め、実行中のハンドラを待つ"""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同期OSC送信
+asyncioのDatagramTransportで送信し、送信キューがあふれた場合は設定に従って破棄する。
+高頻度のパラメータ送信が対話ループを止めることは無い
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from config import config
+from metrics import LatencyStats
+from osc_codec import encode_message
+
+
+class _SenderProtocol(asyncio.DatagramProtocol):
+    """送信バッファが詰まったら書き込みを一時停止"""
+
+    def __init__(self):
+        self.can_write = asyncio.Event()
+        self.can_write.set()
+        self.logger = logging.getLogger(__name__)
+
+    def pause_writing(self):
+        self.can_write.clear()
+
+    def resume_writing(self):
+        self.can_write.set()
+
+    def error_received(self, exc):
+        # 受信側が居ない場合のICMPエラーなど。送信は続ける
+        self.logger.debug(f"OSC送信先エラー: {exc}")
+
+
+class AsyncOSCSender:
+    """有界キュー付きの非同期OSC送信
+
+    send() はキューに積むだけで即座に戻る。キューが満杯の場合、
+    drop_policy が "drop_oldest" なら最も古いパケットを、
+    "drop_newest" なら今回のパケットを破棄する
+    """
+
+    def __init__(self, host: str, port: int, queue_size: Optional[int] = None,
+                 drop_policy: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.drop_policy = drop_policy or config.osc_drop_policy
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or config.osc_queue_size)
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._protocol: Optional[_SenderProtocol] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._start_task: Optional[asyncio.Task] = None
+
+        # 統計
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.send_latency = LatencyStats()  # キュー投入から送信まで
+
+    @property
+    def connected(self) -> bool:
+        """送信用トランスポートが開いているか"""
+        return self._transport is not None and not self._transport.is_closing()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self):
+        """トランスポートを開いて送信タスクを起動"""
+        if self._transport is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._transport, self._protocol = await loop.create_datagram_endpoint(
+            _SenderProtocol, remote_addr=(self.host, self.port)
+        )
+        self._worker = loop.create_task(self._run())
+        self.logger.info(f"OSC送信を開始: {self.host}:{self.port}")
+
+    def _ensure_started(self):
+        if self._start_task is not None:
+            return
+        try:
+            self._start_task = asyncio.get_running_loop().create_task(self.start())
+        except RuntimeError:
+            return  # ループ外ではstart()を明示的に呼ぶ
+        self._start_task.add_done_callback(self._on_started)
+
+    def _on_started(self, task: asyncio.Task):
+        """開けなかったら次の send() で開き直す"""
+        if task.cancelled() or task.exception() is None:
+            return
+        self.errors += 1
+        self.logger.error(f"OSC送信を開始できません ({self.host}:{self.port}): {task.exception()}")
+        if self._start_task is task:
+            self._start_task = None
+
+    def send(self, data: bytes) -> bool:
+        """エンコード済みのパケットをキューに積む（破棄した場合はFalse）"""
+        self._ensure_started()
+        item = (data, time.perf_counter())
+        if self._queue.full():
+            self.dropped += 1
+            if self.drop_policy == "drop_newest":
+                return False
+            self._queue.get_nowait()
+        self._queue.put_nowait(item)
+        return True
+
+    def send_message(self, address: str, args: Sequence[Any] = ()) -> bool:
+        """OSCメッセージをエンコードして送信"""
+        return self.send(encode_message(address, args))
+
+    async def _run(self):
+        """キューのパケットを順に送信"""
+        while True:
+            data, enqueued_at = await self._queue.get()
+            if not self._protocol.can_write.is_set():
+                await self._protocol.can_write.wait()
+            try:
+                self._transport.sendto(data)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"OSC送信エラー: {e}")
+            self.send_latency.record(time.perf_counter() - enqueued_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """送信・破棄件数、キュー長、送信レイテンシ"""
+        return {
+            "connected": self.connected,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "send_latency": self.send_latency.summary()
+        }
+
+    async def close(self):
+        """キューを送り切ってから閉じる"""
+        if self._start_task is not None and not self._start_task.done():
+            self._start_task.cancel()
+            await asyncio.gather(self._start_task, return_exceptions=True)
+        if self._worker is not None and self._transport is not None:
+            deadline = time.monotonic() + 1.0
+            while not self._queue.empty() and time.monotonic() < deadline:
+                await asyncio.sleep(0.005)
+            self._worker.cancel()
+            self._transport.close()
+        self._worker = None
+        self._start_task = None
+        self._transport = None
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+応答キャッシュ
+挨拶や褒め言葉のようなよくある発話に対して、LLMを呼ばずに過去の応答を返す
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import LatencyStats
+from text_embedding import HashingEmbedder, normalize_text
+
+# (正規化テキスト, 親密度帯, 感情)
+CacheKey = Tuple[str, int, str]
+
+
+@dataclass
+class _CacheEntry:
+    """キャッシュエントリ"""
+    response: str
+    slot: int  # 埋め込み行列の行番号
+    expires_at: float
+
+
+class ResponseCache:
+    """完全一致と類似度の2段階の応答キャッシュ
+
+    キーは正規化した入力と、ペルソナ状態（親密度帯・感情）の組。
+    類似度検索は同じペルソナ状態のエントリに限定し、
+    固定サイズのNumPy行列に対するコサイン類似度で行う。
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0,
+                 similarity_threshold: float = 0.9, intimacy_bands: int = 4,
+                 embedder: Optional[HashingEmbedder] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.intimacy_bands = intimacy_bands
+        self.embedder = embedder or HashingEmbedder()
+
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._slot_buckets = np.full(max_entries, -1, dtype=np.int32)  # -1は空き
+        self._slot_keys: List[Optional[CacheKey]] = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._bucket_ids: Dict[Tuple[int, str], int] = {}
+
+        # 統計
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lookup_latency = LatencyStats()
+
+    def make_key(self, text: str, intimacy_level: float, emotion: str) -> CacheKey:
+        """入力とペルソナ状態からキャッシュキーを作成"""
+        band = min(self.intimacy_bands - 1, int(intimacy_level * self.intimacy_bands))
+        return normalize_text(text), band, emotion
+
+    def lookup(self, text: str, intimacy_level: float, emotion: str) -> Optional[str]:
+        """キャッシュされた応答を検索（無ければNone）"""
+        start = time.perf_counter()
+        try:
+            key = self.make_key(text, intimacy_level, emotion)
+            now = time.monotonic()
+
+            # 完全一致
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    return entry.response
+                self._remove(key)
+
+            # 類似度
+            response = self._lookup_similar(key, now)
+            if response is not None:
+                self.similar_hits += 1
+                return response
+
+            self.misses += 1
+            return None
+        finally:
+            self.lookup_latency.record(time.perf_counter() - start)
+
+    def _lookup_similar(self, key: CacheKey, now: float) -> Optional[str]:
+        """同じペルソナ状態のエントリからコサイン類似度で検索"""
+        bucket = self._bucket_ids.get(key[1:])
+        if bucket is None or not key[0]:
+            return None
+
+        candidates = np.flatnonzero(self._slot_buckets == bucket)
+        if candidates.size == 0:
+            return None
+
+        query = self.embedder.embed(key[0])
+        scores = self._vectors[candidates] @ query
+        # 期限切れを避けるため、スコアの高い順に確認
+        for index in np.argsort(scores)[::-1]:
+            if scores[index] < self.similarity_threshold:
+                break
+            slot_key = self._slot_keys[candidates[index]]
+            entry = self._entries[slot_key]
+            if entry.expires_at > now:
+                self._entries.move_to_end(slot_key)
+                return entry.response
+            self._remove(slot_key)
+        return None
+
+    def store(self, text: str, intimacy_level: float, emotion: str, response: str):
+        """応答をキャッシュに保存"""
+        key = self.make_key(text, intimacy_level, emotion)
+        if not key[0]:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        if not self._free_slots:
+            self._evict()
+
+        slot = self._free_slots.pop()
+        bucket = self._bucket_ids.setdefault(key[1:], len(self._bucket_ids))
+        self._vectors[slot] = self.embedder.embed(key[0])
+        self._slot_buckets[slot] = bucket
+        self._slot_keys[slot] = key
+        self._entries[key] = _CacheEntry(response, slot, time.monotonic() + self.ttl)
+
+    def _evict(self):
+        """期限切れを優先して削除し、無ければ最も古く使われたものを削除"""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.evictions += len(expired)
+        if not self._free_slots:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey):
+        """エントリを削除して行を解放"""
+        entry = self._entries.pop(key)
+        self._slot_buckets[entry.slot] = -1
+        self._slot_keys[entry.slot] = None
+        self._free_slots.append(entry.slot)
+
+    def clear(self):
+        """全エントリを削除"""
+        for key in list(self._entries):
+            self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """ヒット率"""
+        total = self.exact_hits + self.similar_hits + self.misses
+        return (self.exact_hits + self.similar_hits) / total if total else 0.0
+
+    def memory_bytes(self) -> int:
+        """おおよそのメモリ使用量（バイト）"""
+        size = self._vectors.nbytes + self._slot_buckets.nbytes
+        for key, entry in self._entries.items():
+            size += sys.getsizeof(key[0]) + sys.getsizeof(entry.response)
+        return size
+
+    def stats(self) -> Dict[str, float]:
+        """ヒット率・検索レイテンシ・メモリ使用量を返す"""
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+            "lookup_p50_ms": self.lookup_latency.percentile(50) * 1000.0,
+            "lookup_p95_ms": self.lookup_latency.percentile(95) * 1000.0,
+            "memory_bytes": self.memory_bytes()
+        }
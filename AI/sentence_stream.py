@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文単位のストリーム分割
+LLMのトークンストリームを日本語の文境界で区切り、音声合成へ逐次渡す
+"""
+
+from typing import AsyncIterator, List
+
+# 文末とみなす文字
+SENTENCE_TERMINATORS = frozenset("。！？!?♪♡…")
+
+# 文末の直後に続いても同じ文に含める文字（閉じ括弧・記号の連続など）
+TRAILING_CLOSERS = frozenset("」』）)】〕〉》\"'〜ー")
+
+
+class SentenceChunker:
+    """トークンを受け取り、完成した文を順次返す分割器"""
+
+    def __init__(self, min_chars: int = 4):
+        # 「♪」単体のような短すぎる断片を避けるための最小文字数
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        """トークンを追加し、確定した文のリストを返す"""
+        if not token:
+            return []
+
+        self._buffer += token
+        sentences = []
+        start = 0
+        i = 0
+        length = len(self._buffer)
+
+        while i < length:
+            if self._buffer[i] == "\n":
+                # 改行は強制的な区切り（バッファ末尾でも保留しない）
+                sentence = self._buffer[start:i].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = i + 1
+                i += 1
+            elif self._buffer[i] in SENTENCE_TERMINATORS:
+                end = i + 1
+                # 「！？」「♪♪」のような連続記号や閉じ括弧はまとめる
+                while end < length and (self._buffer[end] in SENTENCE_TERMINATORS
+                                        or self._buffer[end] in TRAILING_CLOSERS):
+                    end += 1
+                # バッファ末尾の文末記号は、次のトークンで続く可能性があるので保留
+                if end == length:
+                    break
+                sentence = self._buffer[start:end].strip()
+                if len(sentence) >= self.min_chars:
+                    sentences.append(sentence)
+                    start = end
+                i = end
+            else:
+                i += 1
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """残りのバッファを文として返す"""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
+
+
+def split_sentences(text: str, min_chars: int = 4) -> List[str]:
+    """テキスト全体を文に分割"""
+    chunker = SentenceChunker(min_chars)
+    return chunker.feed(text) + chunker.flush()
+
+
+async def iter_sentences(tokens: AsyncIterator[str], min_chars: int = 4) -> AsyncIterator[str]:
+    """トークンの非同期ストリームを文の非同期ストリームに変換"""
+    chunker = SentenceChunker(min_chars)
+    async for token in tokens:
+        for sentence in chunker.feed(token):
+            yield sentence
+    for sentence in chunker.flush():
+        yield sentence
+
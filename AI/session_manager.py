@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+マルチセッション管理
+1つのプロセスで複数のVRChatプレイヤーとの対話を同時に処理する
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Set
+
+from ai_dialogue_system import AIDialogueSystem, DialogueResponse, DialogueSession
+from config import config
+from metrics import LatencyStats
+
+
+class SessionManager:
+    """プレイヤーIDごとの対話セッションを管理
+
+    異なるプレイヤーのターンは同じイベントループ上で並行に実行し、
+    同じプレイヤーのターンはセッションのロックで順番に処理する。
+    LLMと音声合成の同時実行数はそれぞれのセマフォで制限される。
+    submit() で始めたターンは、同じプレイヤーの新しい発話や cancel_turn() で
+    LLMのストリーム・読み上げ待ちの文・再生中の音声ごと中断できる（割り込み）。
+    """
+
+    def __init__(self, dialogue_system: AIDialogueSystem, voice_manager=None):
+        self.dialogue_system = dialogue_system
+        self.voice_manager = voice_manager
+        self.sessions: Dict[str, DialogueSession] = {}
+        self.logger = logging.getLogger(__name__)
+        self._tasks: Set[asyncio.Task] = set()
+        # プレイヤーごとの実行中のターン
+        self._turns: Dict[str, asyncio.Task] = {}
+
+        # 割り込みの統計
+        self.cancellations = 0
+        self.cancel_latency = LatencyStats()  # キャンセル要求からターンが止まるまで
+
+        # 既定セッションもマネージャーから参照できるようにする
+        default_session = dialogue_system.session
+        self.sessions[default_session.player_id] = default_session
+
+    def get_session(self, player_id: str) -> DialogueSession:
+        """プレイヤーのセッションを取得（無ければ作成）"""
+        session = self.sessions.get(player_id)
+        if session is None:
+            if len(self.sessions) >= config.max_sessions:
+                self.prune_idle_sessions()
+            if len(self.sessions) >= config.max_sessions:
+                self._evict_oldest_session()
+            session = DialogueSession(player_id=player_id)
+            self.sessions[player_id] = session
+            self.logger.info(f"セッション作成: {player_id} (計{len(self.sessions)}件)")
+        return session
+
+    def remove_session(self, player_id: str) -> Optional[DialogueSession]:
+        """セッションを破棄"""
+        self.dialogue_system.release_session(player_id)
+        return self.sessions.pop(player_id, None)
+
+    def prune_idle_sessions(self, now: Optional[float] = None) -> int:
+        """一定時間操作の無いセッションを破棄し、破棄した件数を返す"""
+        now = time.monotonic() if now is None else now
+        idle = [
+            player_id for player_id, session in self.sessions.items()
+            if session is not self.dialogue_system.session
+            and not session.lock.locked()
+            and now - session.last_active > config.session_idle_timeout
+        ]
+        for player_id in idle:
+            self.remove_session(player_id)
+        if idle:
+            self.logger.info(f"無操作セッションを{len(idle)}件破棄しました")
+        return len(idle)
+
+    def _evict_oldest_session(self):
+        """最も長く操作の無いセッションを破棄"""
+        candidates = [
+            session for session in self.sessions.values()
+            if session is not self.dialogue_system.session and not session.lock.locked()
+        ]
+        if candidates:
+            oldest = min(candidates, key=lambda session: session.last_active)
+            self.remove_session(oldest.player_id)
+            self.logger.info(f"セッション上限のため破棄: {oldest.player_id}")
+
+    async def handle_turn(self, player_id: str, user_input: str) -> DialogueResponse:
+        """1プレイヤーの1ターンを処理し、音声出力まで行う"""
+        session = self.get_session(player_id)
+
+        async with session.lock:
+            if self.voice_manager is not None and config.streaming_response:
+                speech = self.voice_manager.open_stream()
+
+                async def on_sentence(sentence: str, emotion: str):
+                    # 文が届いた時点のセッションの状態から声のトーンを決める
+                    await speech.put(sentence, emotion, self.dialogue_system.calculate_voice_tone(session))
+
+                try:
+                    response = await self.dialogue_system.process_input(
+                        user_input, on_sentence=on_sentence, session=session
+                    )
+                except BaseException:
+                    # キャンセル時は読み上げ待ちの文も含めて止める
+                    await speech.cancel()
+                    raise
+                await speech.close()
+            else:
+                response = await self.dialogue_system.process_input(user_input, session=session)
+                if self.voice_manager is not None:
+                    await self.voice_manager.speak(response.text, response.emotion.value, response.voice_tone)
+
+        return response
+
+    def submit(self, player_id: str, user_input: str) -> asyncio.Task:
+        """ターンをバックグラウンドで開始し、タスクを返す
+
+        割り込みが有効なら、同じプレイヤーの実行中のターンを中断してから始める
+        """
+        previous = self._turns.get(player_id)
+        task = asyncio.create_task(self._run_turn(player_id, user_input, previous))
+        self._tasks.add(task)
+        self._turns[player_id] = task
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda task: self._turn_finished(player_id, task))
+        return task
+
+    async def _run_turn(self, player_id: str, user_input: str,
+                        previous: Optional[asyncio.Task]) -> DialogueResponse:
+        if config.barge_in_enabled and previous is not None:
+            await self._cancel_task(previous, player_id, "新しい発話")
+        return await self.handle_turn(player_id, user_input)
+
+    def _turn_finished(self, player_id: str, task: asyncio.Task):
+        if self._turns.get(player_id) is task:
+            del self._turns[player_id]
+
+    async def cancel_turn(self, player_id: str, reason: str = "キャンセル要求") -> bool:
+        """プレイヤーの実行中のターンを中断（中断した場合はTrue）"""
+        task = self._turns.get(player_id)
+        if task is None:
+            return False
+        return await self._cancel_task(task, player_id, reason)
+
+    async def cancel_all(self, reason: str = "キャンセル要求") -> int:
+        """すべての実行中のターンを中断し、中断した件数を返す"""
+        results = await asyncio.gather(*[
+            self._cancel_task(task, player_id, reason) for player_id, task in list(self._turns.items())
+        ])
+        return sum(results)
+
+    async def _cancel_task(self, task: asyncio.Task, player_id: str, reason: str) -> bool:
+        """ターンをキャンセルし、止まるまで（最大 barge_in_timeout 秒）待つ"""
+        if task.done() or task is asyncio.current_task():
+            return False
+        started = time.perf_counter()
+        task.cancel()
+        await asyncio.wait({task}, timeout=config.barge_in_timeout)
+        latency = time.perf_counter() - started
+        self.cancellations += 1
+        self.cancel_latency.record(latency)
+        if task.done():
+            self.logger.info(f"ターンを中断 [{player_id}] ({reason}): {latency * 1000:.1f}ms")
+        else:
+            self.logger.warning(f"ターンの中断が{config.barge_in_timeout}秒以内に完了しません [{player_id}]")
+        return True
+
+    def barge_in_stats(self) -> Dict[str, Any]:
+        """中断回数、中断までのレイテンシ、読み上げずに捨てた文の数"""
+        stats = {
+            "cancellations": self.cancellations,
+            "cancel_latency": self.cancel_latency.summary()
+        }
+        if self.voice_manager is not None:
+            stats["tts_cancelled"] = self.voice_manager.cancelled
+            stats["tts_discarded"] = self.voice_manager.discarded
+        return stats
+
+    @property
+    def active_turns(self) -> int:
+        """実行中のターン数"""
+        return len(self._tasks)
+
+    async def shutdown(self):
+        """実行中のターンの完了を待つ"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ストリーミング音声入力
+マイクまたはWAVファイルの音声フレームをリングバッファに書き込み、
+音声区間検出（VAD）で区切った発話を別スレッドの音声認識に渡す。
+認識結果は途中経過（partial）と確定（final）の非同期ストリームとして受け取る
+"""
+
+import asyncio
+import logging
+import math
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+import numpy as np
+
+from config import config
+from metrics import LatencyStats
+
+
+@dataclass
+class Transcript:
+    """音声認識の結果"""
+    text: str
+    final: bool
+    utterance_id: int
+    latency: float = 0.0  # 発話終了（partialは認識要求）から結果までの秒数
+
+
+class AudioRingBuffer:
+    """事前確保したint16のリングバッファ
+
+    位置は書き込み開始からの通算サンプル数で表す
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self.written = 0
+
+    def write(self, samples: np.ndarray):
+        """サンプルを追記（容量を超えた分は古いものから上書き）"""
+        if len(samples) >= self.capacity:
+            self.written += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+        position = self.written % self.capacity
+        first = min(len(samples), self.capacity - position)
+        self._buffer[position:position + first] = samples[:first]
+        self._buffer[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """[start, end) のサンプルをコピーして返す（上書き済みの部分は切り詰める）"""
+        start = max(start, self.written - self.capacity, 0)
+        end = min(end, self.written)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        begin = start % self.capacity
+        length = end - start
+        if begin + length <= self.capacity:
+            return self._buffer[begin:begin + length].copy()
+        return np.concatenate([self._buffer[begin:], self._buffer[:begin + length - self.capacity]])
+
+
+class VoiceActivityDetector:
+    """フレームのエネルギーによる音声区間検出
+
+    背景雑音のレベルを無音フレームから追従し、それより margin_db 以上大きい
+    フレームが min_speech 秒続いたら発話開始、hangover 秒無音が続いたら発話終了とする
+    """
+
+    def __init__(self, sample_rate: int, frame_samples: int, margin_db: Optional[float] = None,
+                 min_level_db: Optional[float] = None, hangover: Optional[float] = None,
+                 min_speech: Optional[float] = None, pre_roll: Optional[float] = None):
+        self.frame_samples = frame_samples
+        self.margin_db = config.vad_margin_db if margin_db is None else margin_db
+        self.min_level_db = config.vad_min_level_db if min_level_db is None else min_level_db
+        self.hangover_samples = int(sample_rate * (config.vad_hangover if hangover is None else hangover))
+        self.min_speech_samples = int(sample_rate * (config.vad_min_speech if min_speech is None else min_speech))
+        self.pre_roll_samples = int(sample_rate * (config.vad_pre_roll if pre_roll is None else pre_roll))
+
+        self.noise_floor_db = self.min_level_db
+        self.in_speech = False
+        self._voiced = 0
+        self._silence = 0
+
+    @staticmethod
+    def level_db(frame: np.ndarray) -> float:
+        """フレームの音量（dBFS）"""
+        if len(frame) == 0:
+            return -120.0
+        samples = frame.astype(np.float32)
+        rms = math.sqrt(float(np.dot(samples, samples)) / len(samples))
+        return 20.0 * math.log10(rms / 32768.0 + 1e-9)
+
+    def process(self, frame: np.ndarray, end: int) -> Optional[Tuple[str, int]]:
+        """1フレームを判定し、発話の開始・終了があれば ("start"|"end", 位置) を返す
+
+        end はこのフレームの直後の通算サンプル位置
+        """
+        level = self.level_db(frame)
+        voiced = level > max(self.noise_floor_db + self.margin_db, self.min_level_db)
+
+        if not self.in_speech:
+            if voiced:
+                self._voiced += len(frame)
+                if self._voiced >= self.min_speech_samples:
+                    self.in_speech = True
+                    self._silence = 0
+                    return "start", max(0, end - self._voiced - self.pre_roll_samples)
+            else:
+                self._voiced = 0
+                # 無音フレームで背景雑音レベルを追従
+                self.noise_floor_db += 0.05 * (level - self.noise_floor_db)
+            return None
+
+        if voiced:
+            self._silence = 0
+            return None
+        self._silence += len(frame)
+        if self._silence >= self.hangover_samples:
+            self.in_speech = False
+            self._voiced = 0
+            return "end", end - self._silence
+        return None
+
+    def reset(self):
+        self.in_speech = False
+        self._voiced = 0
+        self._silence = 0
+
+
+class SpeechRecognitionBackend:
+    """speech_recognition を使う認識器（ワーカースレッドから呼ばれる）"""
+
+    def __init__(self, recognizer=None, engine: Optional[str] = None, language: Optional[str] = None):
+        import speech_recognition as sr
+        self._sr = sr
+        self.recognizer = recognizer or sr.Recognizer()
+        self._recognize = getattr(self.recognizer, f"recognize_{engine or config.speech_recognizer_engine}")
+        self.language = language or config.speech_language
+
+    def transcribe(self, samples: np.ndarray, sample_rate: int) -> str:
+        """int16のモノラル音声を文字起こし（聞き取れなければ空文字列）"""
+        audio = self._sr.AudioData(samples.tobytes(), sample_rate, 2)
+        try:
+            return self._recognize(audio, language=self.language)
+        except self._sr.UnknownValueError:
+            return ""
+
+
+class WavFileSource:
+    """WAVファイルを音声フレームの列として読み込む（マイクの代わり）"""
+
+    def __init__(self, path: str, sample_rate: int, frame_samples: int, realtime: bool = True):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.realtime = realtime  # Trueなら実時間の速さでフレームを渡す
+
+    def _load(self) -> np.ndarray:
+        with wave.open(self.path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError("16bit PCMのWAVファイルのみ対応しています")
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        if rate != self.sample_rate:
+            positions = np.arange(0, len(samples), rate / self.sample_rate)
+            samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+        return samples
+
+    async def frames(self) -> AsyncIterator[np.ndarray]:
+        samples = self._load()
+        interval = self.frame_samples / self.sample_rate
+        started = time.monotonic()
+        for index, offset in enumerate(range(0, len(samples), self.frame_samples)):
+            if self.realtime:
+                await asyncio.sleep(max(0.0, started + index * interval - time.monotonic()))
+            yield samples[offset:offset + self.frame_samples]
+
+
+class MicrophoneSource:
+    """pyaudioのコールバックでマイクの音声フレームを受け取る"""
+
+    def __init__(self, sample_rate: int, frame_samples: int, device_index: Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.device_index = device_index
+
+    async def frames(self) -> AsyncIterator[np.ndarray]:
+        import pyaudio
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def callback(data, frame_count, time_info, status):
+            loop.call_soon_threadsafe(queue.put_nowait, np.frombuffer(data, dtype=np.int16))
+            return None, pyaudio.paContinue
+
+        audio = pyaudio.PyAudio()
+        stream = audio.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+                            frames_per_buffer=self.frame_samples, input_device_index=self.device_index,
+                            stream_callback=callback)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            stream.stop_stream()
+            stream.close()
+            audio.terminate()
+
+
+class SpeechInput:
+    """音声フレーム -> リングバッファ -> VAD -> 認識 のストリーミングパイプライン
+
+    発話中は partial_interval 秒ごとにそれまでの音声を認識して途中経過を返し、
+    発話終了時に確定結果を返す。認識は1本のワーカースレッドで順に行うので、
+    途中経過の認識中に次の途中経過は要求しない
+    """
+
+    def __init__(self, recognizer, source, sample_rate: Optional[int] = None,
+                 frame_ms: Optional[int] = None, partial_interval: Optional[float] = None,
+                 max_utterance: Optional[float] = None,
+                 on_speech_start: Optional[Callable[[], None]] = None):
+        self.recognizer = recognizer  # transcribe(samples, sample_rate) -> str
+        self.source = source  # frames() で音声フレームを返すもの
+        self.on_speech_start = on_speech_start  # 発話開始の検出時（割り込みなど）
+        self.sample_rate = sample_rate or config.speech_sample_rate
+        self.frame_samples = self.sample_rate * (frame_ms or config.speech_frame_ms) // 1000
+        self.partial_interval = config.speech_partial_interval if partial_interval is None else partial_interval
+        self.max_utterance_samples = int(self.sample_rate * (max_utterance or config.speech_max_utterance))
+        self.logger = logging.getLogger(__name__)
+
+        # 最長の発話に前後の余裕を足した分だけ確保しておく
+        self.ring = AudioRingBuffer(self.max_utterance_samples + 2 * self.sample_rate)
+        self.vad = VoiceActivityDetector(self.sample_rate, self.frame_samples)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech")
+
+        # 統計
+        self.utterances = 0
+        self.partials = 0
+        self.recognition_errors = 0
+        self.final_latency = LatencyStats()  # 発話終了から確定結果まで
+
+    async def transcripts(self) -> AsyncIterator[Transcript]:
+        """音声ソースが尽きるまで認識結果を返す"""
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue = asyncio.Queue()
+        pending = set()
+        utterance_start: Optional[int] = None
+        partial_task: Optional[asyncio.Future] = None
+        next_partial = 0
+
+        def recognize(start: int, end: int, final: bool):
+            samples = self.ring.read(start, end)
+            requested = time.perf_counter()
+            future = loop.run_in_executor(self._executor, self._transcribe, samples)
+            task = asyncio.ensure_future(self._deliver(future, results, self.utterances, final, requested))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            return task
+
+        async def consume():
+            nonlocal utterance_start, partial_task, next_partial
+            try:
+                async for frame in self.source.frames():
+                    self.ring.write(frame)
+                    position = self.ring.written
+                    event = self.vad.process(frame, position)
+
+                    if event is not None and event[0] == "start":
+                        utterance_start = event[1]
+                        self.utterances += 1
+                        if self.on_speech_start is not None:
+                            self.on_speech_start()
+                        next_partial = position + int(self.partial_interval * self.sample_rate)
+                    elif utterance_start is not None:
+                        too_long = position - utterance_start >= self.max_utterance_samples
+                        if event is not None or too_long:
+                            end = event[1] if event is not None else position
+                            recognize(utterance_start, end, final=True)
+                            utterance_start = None
+                            if too_long:
+                                self.vad.reset()
+                        elif (self.partial_interval > 0 and position >= next_partial
+                              and (partial_task is None or partial_task.done())):
+                            partial_task = recognize(utterance_start, position, final=False)
+                            next_partial = position + int(self.partial_interval * self.sample_rate)
+
+                # 音声ソースの終端で発話中なら確定させる
+                if utterance_start is not None:
+                    recognize(utterance_start, self.ring.written, final=True)
+                if pending:
+                    await asyncio.gather(*list(pending))
+            finally:
+                # 音声ソースが例外で終わっても読み出し側を待たせない（例外は await consumer で伝わる）
+                results.put_nowait(None)
+
+        consumer = asyncio.ensure_future(consume())
+        try:
+            while True:
+                transcript = await results.get()
+                if transcript is None:
+                    break
+                yield transcript
+            await consumer
+        finally:
+            consumer.cancel()
+            for task in list(pending):
+                task.cancel()
+
+    def _transcribe(self, samples: np.ndarray) -> str:
+        return self.recognizer.transcribe(samples, self.sample_rate)
+
+    async def _deliver(self, future, results: asyncio.Queue, utterance_id: int, final: bool, requested: float):
+        """認識結果をストリームに流す（空の結果は流さない）"""
+        try:
+            text = (await future).strip()
+        except Exception as e:
+            self.recognition_errors += 1
+            self.logger.error(f"音声認識エラー: {e}")
+            return
+        latency = time.perf_counter() - requested
+        if final:
+            self.final_latency.record(latency)
+        else:
+            self.partials += 1
+        if text:
+            await results.put(Transcript(text, final, utterance_id, latency))
+
+    def stats(self):
+        """発話数・途中経過数・確定までのレイテンシ"""
+        return {
+            "utterances": self.utterances,
+            "partials": self.partials,
+            "recognition_errors": self.recognition_errors,
+            "final_latency": self.final_latency.summary()
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_speech_input(recognizer=None, source: Optional[str] = None,
+                        on_speech_start: Optional[Callable[[], None]] = None) -> SpeechInput:
+    """設定に従って音声入力を作成（sourceは "microphone" またはWAVファイルのパス）"""
+    source = source or config.voice_input_source
+    sample_rate = config.speech_sample_rate
+    frame_samples = sample_rate * config.speech_frame_ms // 1000
+    if source == "microphone":
+        frames = MicrophoneSource(sample_rate, frame_samples)
+    else:
+        frames = WavFileSource(source, sample_rate, frame_samples)
+    return SpeechInput(SpeechRecognitionBackend(recognizer), frames, on_speech_start=on_speech_start)
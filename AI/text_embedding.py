@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ローカルテキスト埋め込み
+外部APIを使わず、文字n-gramのハッシュから固定長ベクトルを計算する
+"""
+
+import re
+import unicodedata
+import zlib
+from typing import Iterable, Tuple
+
+import numpy as np
+
+# 正規化で取り除く記号・空白
+_STRIP_PATTERN = re.compile(r"[\s、。，．,.!！?？♪♡☆★〜~ー…・「」『』（）()\[\]【】\"'💕✨]+")
+# 3回以上の同じ文字の繰り返しを2回に縮める（「すごーーーい」など）
+_REPEAT_PATTERN = re.compile(r"(.)\1{2,}")
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー・埋め込み用にテキストを正規化"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _STRIP_PATTERN.sub("", text)
+    return _REPEAT_PATTERN.sub(r"\1\1", text)
+
+
+class HashingEmbedder:
+    """文字n-gramのハッシュによる埋め込み
+
+    ハッシュにはzlib.crc32を使うため、プロセスをまたいでも同じベクトルになる
+    """
+
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, text: str) -> np.ndarray:
+        """正規化済みの単位ベクトル（float32）を返す"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        self._accumulate(normalize_text(text), vector)
+        norm = float(np.linalg.norm(vector))
+        if norm > 0.0:
+            vector /= norm
+        return vector
+
+    def embed_batch(self, texts: Iterable[str]) -> np.ndarray:
+        """複数テキストを (件数, dim) の行列として埋め込む"""
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(matrix, texts):
+            self._accumulate(normalize_text(text), row)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0.0)
+        return matrix
+
+    def _accumulate(self, text: str, vector: np.ndarray):
+        """n-gramのハッシュ位置に符号付きで加算"""
+        dim = self.dim
+        low, high = self.ngram_range
+        # 文字境界を保つため、n-gramは文字単位で切り出してからハッシュする
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pyttsx3の読み上げワーカー
+pyttsx3のエンジンはスレッドセーフではなく初期化も遅いため、プロセスで1つの
+専用スレッドがエンジンを持ち、(テキスト, 話速, 音量) のジョブをキューで受け取る。
+溜まっているジョブはまとめて1回の runAndWait で読み上げる
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from config import config
+
+
+class _SpeechJob:
+    """キュー上の1件の読み上げ"""
+    __slots__ = ("name", "text", "rate", "volume", "future", "loop", "cancelled", "done")
+
+    def __init__(self, name: str, text: str, rate: int, volume: float,
+                 future: asyncio.Future, loop: asyncio.AbstractEventLoop):
+        self.name = name
+        self.text = text
+        self.rate = rate
+        self.volume = volume
+        self.future = future
+        self.loop = loop
+        self.cancelled = False
+        self.done = False
+
+    def finish(self, completed: bool):
+        """イベントループ側でFutureを完了させる（ワーカースレッドから呼ばれる）"""
+        self.done = True
+        self.loop.call_soon_threadsafe(_resolve, self.future, completed)
+
+
+def _resolve(future: asyncio.Future, completed: bool):
+    if not future.done():
+        future.set_result(completed)
+
+
+class PyttsxWorker:
+    """pyttsx3のエンジンを所有する専用スレッド
+
+    - エンジンの生成・設定・読み上げはすべてこのスレッドで行う
+    - 話速と音量はジョブごとに指定し、読み上げの直前にこのスレッドで設定する
+    - キャンセルされたジョブは、読み上げ前ならキューから外し、読み上げ中なら
+      次の単語の区切りで止める（同じ runAndWait の残りのジョブは読み直す）
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._jobs: Deque[_SpeechJob] = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._names = itertools.count()
+        self._engine = None
+        self._batch: Dict[str, _SpeechJob] = {}
+        self._stopping = False
+
+        # 統計
+        self.jobs = 0
+        self.batches = 0
+        self.cancelled = 0
+        self.engine_init_time = 0.0
+
+    def start(self):
+        """ワーカースレッドを起動（起動済みなら何もしない）"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="pyttsx3", daemon=True)
+            self._thread.start()
+
+    async def speak(self, text: str, rate: Optional[int] = None, volume: Optional[float] = None) -> bool:
+        """読み上げて終わるまで待つ（キャンセルで止められたらFalse）
+
+        待っている間にキャンセルされた場合は読み上げも止める
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        job = _SpeechJob(
+            f"utterance-{next(self._names)}", text,
+            int(max(50, min(300, rate if rate is not None else config.voice_rate))),
+            max(0.0, min(1.0, volume if volume is not None else config.voice_volume)),
+            loop.create_future(), loop
+        )
+        with self._condition:
+            self._jobs.append(job)
+            self._condition.notify()
+        self.jobs += 1
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            self.cancel(job)
+            raise
+
+    def cancel(self, job: _SpeechJob):
+        """ジョブを取り消す（読み上げ中なら次の単語の区切りで止まる）"""
+        if job.cancelled or job.done:
+            return
+        job.cancelled = True
+        self.cancelled += 1
+        with self._condition:
+            if job in self._jobs:
+                self._jobs.remove(job)
+                job.finish(False)
+
+    def _setup_voice(self, engine):
+        """日本語または女性の声を優先して選択"""
+        for voice in engine.getProperty('voices'):
+            name = voice.name.lower()
+            if 'japanese' in name or 'female' in name or 'woman' in name:
+                engine.setProperty('voice', voice.id)
+                break
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            self._setup_voice(engine)
+            engine.connect('started-utterance', self._on_utterance_started)
+            engine.connect('started-word', self._on_word)
+            engine.connect('finished-utterance', self._on_utterance_finished)
+            self._engine = engine
+        except Exception as e:
+            self.logger.error(f"pyttsx3の初期化エラー: {e}")
+            with self._condition:
+                self._running = False
+                failed = list(self._jobs)
+                self._jobs.clear()
+                self._thread = None
+            for job in failed:
+                job.finish(False)
+            return
+        self.engine_init_time = time.perf_counter() - started
+        self.logger.info(f"pyttsx3ワーカーを開始 ({self.engine_init_time * 1000:.0f}ms)")
+
+        while True:
+            with self._condition:
+                while self._running and not self._jobs:
+                    self._condition.wait()
+                if not self._running:
+                    break
+                batch = list(self._jobs)
+                self._jobs.clear()
+            self._speak_batch(engine, batch)
+
+        with self._condition:
+            remaining = list(self._jobs)
+            self._jobs.clear()
+        for job in remaining:
+            job.finish(False)
+
+    def _speak_batch(self, engine, batch: List[_SpeechJob]):
+        """溜まっていたジョブを1回の runAndWait で読み上げる"""
+        self._batch = {job.name: job for job in batch}
+        self._stopping = False
+        rate = volume = None
+        for job in batch:
+            # 話速・音量の変更も読み上げと同じ順にエンジンのキューへ積まれる
+            if job.rate != rate:
+                engine.setProperty('rate', job.rate)
+                rate = job.rate
+            if job.volume != volume:
+                engine.setProperty('volume', job.volume)
+                volume = job.volume
+            engine.say(job.text, job.name)
+        self.batches += 1
+        try:
+            engine.runAndWait()
+        except Exception as e:
+            self.logger.error(f"pyttsx3読み上げエラー: {e}")
+            self._stopping = False
+            for job in batch:
+                if not job.done:
+                    job.finish(False)
+
+        # stop() で一緒に捨てられた後続のジョブは先頭に戻して読み直す
+        unfinished = [job for job in batch if not job.done]
+        retry = [job for job in unfinished if not job.cancelled] if self._stopping else []
+        for job in unfinished:
+            if job not in retry:
+                job.finish(not job.cancelled)
+        if retry:
+            with self._condition:
+                self._jobs.extendleft(reversed(retry))
+        self._batch = {}
+
+    def _on_utterance_started(self, name: str):
+        self._stop_if_cancelled(name)
+
+    def _on_word(self, name: str, location: int, length: int):
+        self._stop_if_cancelled(name)
+
+    def _stop_if_cancelled(self, name: str):
+        """ワーカースレッド（エンジンのコールバック）の中で止める"""
+        job = self._batch.get(name)
+        if job is not None and job.cancelled and not self._stopping:
+            self._stopping = True
+            self._engine.stop()
+            job.finish(False)
+
+    def _on_utterance_finished(self, name: str, completed: bool):
+        job = self._batch.get(name)
+        if job is not None and not job.done:
+            job.finish(completed and not job.cancelled)
+
+    def stats(self) -> Dict[str, Any]:
+        """ジョブ数・runAndWait の回数・1回あたりのジョブ数・取り消し数"""
+        with self._condition:
+            queued = len(self._jobs)
+        return {
+            "jobs": self.jobs,
+            "batches": self.batches,
+            "jobs_per_batch": self.jobs / self.batches if self.batches else 0.0,
+            "cancelled": self.cancelled,
+            "queued": queued,
+            "engine_init_ms": self.engine_init_time * 1000.0
+        }
+
+    def close(self):
+        """読み上げ待ちのジョブを捨ててスレッドを止める"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join(timeout=1.0)
+
+
+_shared_worker: Optional[PyttsxWorker] = None
+
+
+def get_tts_worker() -> PyttsxWorker:
+    """プロセスで共有するpyttsx3ワーカー"""
+    global _shared_worker
+    if _shared_worker is None:
+        _shared_worker = PyttsxWorker()
+    return _shared_worker
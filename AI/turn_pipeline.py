@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ターン処理パイプライン
+1ターンの処理を依存関係付きのステージとして表し、
+入力が揃ったステージから並行に実行する
+"""
+
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from metrics import LatencyStats
+
+StageFunc = Callable[..., Any]
+
+
+@dataclass
+class StageTiming:
+    """ステージの開始・終了時刻（ターン開始からの秒数）"""
+    started: float
+    finished: float
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+class TurnPipeline:
+    """依存関係グラフとして表したターン処理
+
+    各ステージの関数は、依存ステージの結果をステージ名のキーワード引数として受け取る。
+    同期関数・非同期関数のどちらも登録できる
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[StageFunc, Tuple[str, ...]]] = {}
+
+    def add_stage(self, name: str, func: StageFunc, after: Iterable[str] = ()) -> "TurnPipeline":
+        """ステージを追加"""
+        deps = tuple(after)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"未定義のステージに依存しています: {name} -> {dep}")
+        self._stages[name] = (func, deps)
+        return self
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, StageTiming]]:
+        """全ステージを実行し、(結果, 時間計測) を返す"""
+        start = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, StageTiming] = {}
+
+        async def run_stage(name: str, func: StageFunc, deps: Tuple[str, ...]):
+            inputs = {dep: await tasks[dep] for dep in deps}
+            started = time.perf_counter() - start
+            result = func(**inputs)
+            if inspect.isawaitable(result):
+                result = await result
+            timings[name] = StageTiming(started, time.perf_counter() - start)
+            return result
+
+        # 登録順は依存関係の順になっているので、そのままタスクを作成できる
+        for name, (func, deps) in self._stages.items():
+            tasks[name] = asyncio.create_task(run_stage(name, func, deps))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}, timings
+
+
+class StageMetrics:
+    """ステージごとの完了時刻の統計"""
+
+    def __init__(self):
+        self.finished_at: Dict[str, LatencyStats] = {}
+        self.durations: Dict[str, LatencyStats] = {}
+
+    def record(self, timings: Dict[str, StageTiming]):
+        for name, timing in timings.items():
+            self.finished_at.setdefault(name, LatencyStats()).record(timing.finished)
+            self.durations.setdefault(name, LatencyStats()).record(timing.duration)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """ステージ名 -> 完了時刻のp50/p95（ミリ秒）"""
+        return {name: stats.summary() for name, stats in self.finished_at.items()}
@@ -6,67 +6,106 @@
 """
 
 import asyncio
+import io
 import logging
-import requests
 import json
+import time
+import zipfile
 from abc import ABC, abstractmethod
-from typing import Optional
-import pyttsx3
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import httpx
 from config import config
+from audio_cache import AudioCache, audio_cache_key
+from audio_output import PCMClip, PCMStream, WavStreamDecoder, get_audio_output, parse_wav, wav_header
+from audio_dsp import VoiceProcessor
+from circuit_breaker import CircuitBreaker
+from http_client import AsyncHTTPClient
+from lip_sync import LipSyncDriver
+from metrics import LatencyStats
+from sentence_stream import split_sentences
+from tts_worker import get_tts_worker
+
+# 音声処理で感情を付ける場合にエンジンへ渡す感情
+DSP_BASE_EMOTION = "neutral"
 
 class VoiceSynthesizer(ABC):
     """音声合成の抽象基底クラス"""
     
+    # render()/play() で合成と再生を分けられるか
+    supports_render = False
+    # render_batch() が1回のリクエストにまとめて合成するか
+    supports_batch = False
+    # render_stream() で受信しながら再生できるか
+    supports_stream = False
+    
     @abstractmethod
     async def synthesize(self, text: str, emotion: str = "neutral") -> bool:
         """テキストを音声合成して再生"""
         pass
+    
+    def cache_identity(self, emotion: str) -> Optional[Tuple]:
+        """音声キャッシュのキーに含める (エンジン, 話者, 感情設定)（キャッシュしない場合はNone）"""
+        return None
+    
+    async def render(self, text: str, emotion: str = "neutral") -> Optional[bytes]:
+        """再生せずに音声データだけを合成（対応しない場合はNone）"""
+        return None
+    
+    async def render_batch(self, items: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        """複数の (テキスト, 感情) をまとめて合成（既定では1件ずつ並行して合成）"""
+        return list(await asyncio.gather(*(self.render(text, emotion) for text, emotion in items)))
+    
+    async def render_stream(self, text: str, emotion: str = "neutral") -> AsyncIterator[PCMClip]:
+        """合成した音声を受信した分ずつ返す（何も返さずに終わったら合成失敗）
+
+        ストリーミングに対応していないエンジンは何も返さない
+        """
+        return
+        yield
+    
+    async def synthesize_fallback(self, text: str, emotion: str = "neutral") -> bool:
+        """合成できなかった文を代替のエンジンで読み上げる（代替が無ければFalse）"""
+        return False
+    
+    async def health_check(self) -> bool:
+        """エンジンが応答するか（確認手段が無いエンジンは常にTrue）"""
+        return True
+    
+    async def play(self, audio_data, on_start=None) -> bool:
+        """合成済みの音声データ（WAV）を共有の音声出力で再生（止められたらFalse）
+
+        on_start は再生が始まった時刻（time.monotonic()）を受け取る
+        """
+        try:
+            return await get_audio_output().play(audio_data, on_start=on_start)
+        except ValueError as e:
+            logging.getLogger(__name__).error(f"音声再生エラー: {e}")
+            return False
+    
+    async def aclose(self):
+        """接続などのリソースを解放"""
+        pass
 
 class PyttsxVoiceSynthesizer(VoiceSynthesizer):
-    """pyttsx3を使用した音声合成"""
+    """pyttsx3を使用した音声合成（共有の読み上げワーカーに任せる）"""
     
     def __init__(self):
-        self.engine = pyttsx3.init()
-        self.setup_voice()
+        self.worker = get_tts_worker()
         self.logger = logging.getLogger(__name__)
     
-    def setup_voice(self):
-        """音声設定"""
-        voices = self.engine.getProperty('voices')
-        
-        # 日本語または女性の声を優先選択
-        for voice in voices:
-            if ('japanese' in voice.name.lower() or 
-                'female' in voice.name.lower() or 
-                'woman' in voice.name.lower()):
-                self.engine.setProperty('voice', voice.id)
-                break
-        
-        self.engine.setProperty('rate', config.voice_rate)
-        self.engine.setProperty('volume', config.voice_volume)
-    
     async def synthesize(self, text: str, emotion: str = "neutral") -> bool:
         """音声合成と再生"""
         try:
-            # 感情に応じて音声パラメータを調整
-            self.adjust_voice_for_emotion(emotion)
-            
-            # 非同期で音声合成
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._speak, text)
-            
-            return True
+            # 感情に応じた話速・音量で読み上げ（キャンセルされたらワーカー側で止まる）
+            rate, volume = self.voice_for_emotion(emotion)
+            return await self.worker.speak(text, rate, volume)
         except Exception as e:
             self.logger.error(f"pyttsx3音声合成エラー: {e}")
             return False
     
-    def _speak(self, text: str):
-        """同期的な音声合成"""
-        self.engine.say(text)
-        self.engine.runAndWait()
-    
-    def adjust_voice_for_emotion(self, emotion: str):
-        """感情に応じて音声パラメータを調整"""
+    def voice_for_emotion(self, emotion: str) -> Tuple[int, float]:
+        """感情に応じた (話速, 音量)"""
         emotion_settings = {
             "happy": {"rate": config.voice_rate + 20, "volume": config.voice_volume + 0.1},
             "excited": {"rate": config.voice_rate + 40, "volume": config.voice_volume + 0.2},
@@ -77,19 +116,42 @@ class PyttsxVoiceSynthesizer(VoiceSynthesizer):
         }
         
         settings = emotion_settings.get(emotion, emotion_settings["calm"])
-        
-        self.engine.setProperty('rate', max(50, min(300, settings["rate"])))
-        self.engine.setProperty('volume', max(0.0, min(1.0, settings["volume"])))
+        return settings["rate"], settings["volume"]
 
 class VoicevoxVoiceSynthesizer(VoiceSynthesizer):
     """VOICEVOXを使用した音声合成"""
     
-    def __init__(self):
-        self.base_url = config.voicevox_url
+    supports_render = True
+    supports_batch = True
+    supports_stream = True
+    
+    def __init__(self, base_url: Optional[str] = None,
+                 query_cache: "Optional[OrderedDict[Tuple[str, int], dict]]" = None):
+        self.base_url = base_url or config.voicevox_url
         self.speaker_id = config.voicevox_speaker_id
         self.logger = logging.getLogger(__name__)
+        # 接続プール付きの非同期HTTPクライアント（イベントループを止めない）
+        self.http = AsyncHTTPClient(
+            f"voicevox({self.base_url})",
+            base_url=self.base_url,
+            timeout=config.voicevox_timeout,
+            max_connections=config.tts_http_max_connections,
+            max_concurrency=config.voicevox_max_concurrency,
+            max_retries=config.tts_http_max_retries,
+            backoff=config.tts_http_retry_backoff
+        )
         
-        # 感情とスピーカーIDのマッピング
+        # 音声クエリ（アクセント・モーラの解析結果）は (テキスト, スピーカー) だけで決まるので使い回す
+        # 同じバージョンのエンジン同士は結果が同じなので、プールではキャッシュを共有する
+        self.query_cache: "OrderedDict[Tuple[str, int], dict]" = \
+            query_cache if query_cache is not None else OrderedDict()
+        self.query_cache_size = config.voicevox_query_cache_size
+        self.query_hits = 0
+        self.query_misses = 0
+        self._pending_queries: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.multi_synthesis_supported = True
+        
+        # 感情とスピーカーIDのマッピング（voicevox_emotion_mode が "speaker" の場合）
         self.emotion_speakers = {
             "happy": 1,      # ずんだもん（ノーマル）
             "excited": 7,    # ずんだもん（ツンツン）
@@ -99,39 +161,163 @@ class VoicevoxVoiceSynthesizer(VoiceSynthesizer):
             "calm": 1,       # ずんだもん（ノーマル）
             "love": 3        # ずんだもん（あまあま）
         }
+        
+        # 感情ごとの音声クエリの調整（voicevox_emotion_mode が "prosody" の場合）
+        self.emotion_prosody = {
+            "happy": {"speedScale": 1.1, "pitchScale": 0.03, "intonationScale": 1.2},
+            "excited": {"speedScale": 1.2, "pitchScale": 0.06, "intonationScale": 1.4, "volumeScale": 1.1},
+            "sad": {"speedScale": 0.9, "pitchScale": -0.03, "intonationScale": 0.8, "volumeScale": 0.9},
+            "shy": {"speedScale": 0.95, "pitchScale": 0.02, "intonationScale": 0.9, "volumeScale": 0.8},
+            "angry": {"speedScale": 1.1, "pitchScale": -0.02, "intonationScale": 1.3, "volumeScale": 1.1},
+            "calm": {},
+            "love": {"speedScale": 0.95, "pitchScale": 0.04, "intonationScale": 1.2}
+        }
     
     async def synthesize(self, text: str, emotion: str = "neutral") -> bool:
         """VOICEVOX APIを使用した音声合成"""
         try:
-            speaker_id = self.emotion_speakers.get(emotion, self.speaker_id)
-            
-            # 音声クエリの生成
-            audio_query = await self._create_audio_query(text, speaker_id)
-            if not audio_query:
-                return False
-            
-            # 音声合成
-            audio_data = await self._synthesize_audio(audio_query, speaker_id)
+            audio_data = await self.render(text, emotion)
             if not audio_data:
                 return False
             
             # 音声再生
-            await self._play_audio(audio_data)
-            
-            return True
+            return await self.play(audio_data)
             
         except Exception as e:
             self.logger.error(f"VOICEVOX音声合成エラー: {e}")
             return False
     
+    def _voice_for_emotion(self, emotion: str) -> Tuple[int, Dict[str, float]]:
+        """感情に応じた (スピーカーID, 音声クエリの調整)"""
+        if (config.voicevox_emotion_mode or "prosody") == "prosody":
+            return self.speaker_id, self.emotion_prosody.get(emotion, {})
+        return self.emotion_speakers.get(emotion, self.speaker_id), {}
+    
+    def cache_identity(self, emotion: str) -> Optional[Tuple]:
+        speaker_id, prosody = self._voice_for_emotion(emotion)
+        return ("voicevox", speaker_id, prosody or None)
+    
+    async def render(self, text: str, emotion: str = "neutral") -> Optional[bytes]:
+        """音声クエリの生成と音声合成"""
+        speaker_id, prosody = self._voice_for_emotion(emotion)
+        
+        # 音声クエリの生成（キャッシュ済みなら再利用）
+        audio_query = await self._get_audio_query(text, speaker_id)
+        if not audio_query:
+            return None
+        
+        # 音声合成
+        return await self._synthesize_audio({**audio_query, **prosody}, speaker_id)
+    
+    async def render_stream(self, text: str, emotion: str = "neutral") -> AsyncIterator[PCMClip]:
+        """/synthesis の応答（WAV）を受信した分ずつ返す"""
+        speaker_id, prosody = self._voice_for_emotion(emotion)
+        audio_query = await self._get_audio_query(text, speaker_id)
+        if not audio_query:
+            return
+        decoder = WavStreamDecoder()
+        async with self.http.stream(
+            "POST", "/synthesis",
+            params={"speaker": speaker_id},
+            content=json.dumps({**audio_query, **prosody}),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            async for data in response.aiter_bytes():
+                clip = decoder.feed(data)
+                if clip is not None:
+                    yield clip
+    
+    async def render_batch(self, items: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        """スピーカーごとに /multi_synthesis で1回のリクエストにまとめて合成"""
+        voices = [self._voice_for_emotion(emotion) for _, emotion in items]
+        queries = await asyncio.gather(*(
+            self._get_audio_query(text, speaker_id) for (text, _), (speaker_id, _) in zip(items, voices)
+        ))
+        
+        results: List[Optional[bytes]] = [None] * len(items)
+        groups: Dict[int, List[int]] = {}
+        for i, ((speaker_id, _), query) in enumerate(zip(voices, queries)):
+            if query:
+                groups.setdefault(speaker_id, []).append(i)
+        
+        async def synthesize_group(speaker_id: int, indices: List[int]):
+            edited = [{**queries[i], **voices[i][1]} for i in indices]
+            audio = await self._multi_synthesize(edited, speaker_id) if len(indices) > 1 else None
+            if audio is None:
+                audio = await asyncio.gather(*(self._synthesize_audio(query, speaker_id) for query in edited))
+            for i, data in zip(indices, audio):
+                results[i] = data
+        
+        size = max(1, config.voicevox_batch_size)
+        await asyncio.gather(*(
+            synthesize_group(speaker_id, indices[start:start + size])
+            for speaker_id, indices in groups.items()
+            for start in range(0, len(indices), size)
+        ))
+        return results
+    
+    async def _get_audio_query(self, text: str, speaker_id: int) -> Optional[dict]:
+        """音声クエリをキャッシュから取得（無ければ作成してキャッシュ）
+
+        返す辞書はキャッシュと共有しているため、調整する場合はコピーしてから変更する
+        """
+        key = (text, speaker_id)
+        audio_query = self.query_cache.get(key)
+        if audio_query is not None:
+            self.query_cache.move_to_end(key)
+            self.query_hits += 1
+            return audio_query
+        # 同じクエリを作成中なら、その結果を待つ
+        pending = self._pending_queries.get(key)
+        if pending is not None:
+            self.query_hits += 1
+            return await asyncio.shield(pending)
+        
+        self.query_misses += 1
+        pending = asyncio.ensure_future(self._create_audio_query(text, speaker_id))
+        self._pending_queries[key] = pending
+        try:
+            audio_query = await asyncio.shield(pending)
+        finally:
+            if pending.done():
+                self._pending_queries.pop(key, None)
+            else:
+                pending.add_done_callback(lambda _: self._pending_queries.pop(key, None))
+        if audio_query and self.query_cache_size > 0:
+            self.query_cache[key] = audio_query
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+        return audio_query
+    
+    def query_cache_stats(self) -> Dict[str, Any]:
+        """音声クエリキャッシュの件数とヒット率"""
+        lookups = self.query_hits + self.query_misses
+        return {
+            "entries": len(self.query_cache),
+            "hits": self.query_hits,
+            "misses": self.query_misses,
+            "hit_rate": self.query_hits / lookups if lookups else 0.0
+        }
+    
+    async def aclose(self):
+        for pending in list(self._pending_queries.values()):
+            pending.cancel()
+        await self.http.aclose()
+    
+    async def health_check(self) -> bool:
+        """/version が応答するか（再試行はせず短いタイムアウトで確認）"""
+        try:
+            response = await self.http.client.get("/version", timeout=config.tts_health_timeout)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+    
     async def _create_audio_query(self, text: str, speaker_id: int) -> Optional[dict]:
         """音声クエリを作成"""
         try:
-            url = f"{self.base_url}/audio_query"
             params = {"text": text, "speaker": speaker_id}
             
-            response = requests.post(url, params=params)
-            response.raise_for_status()
+            response = await self.http.post("/audio_query", params=params)
             
             return response.json()
             
@@ -142,16 +328,14 @@ class VoicevoxVoiceSynthesizer(VoiceSynthesizer):
     async def _synthesize_audio(self, audio_query: dict, speaker_id: int) -> Optional[bytes]:
         """音声データを合成"""
         try:
-            url = f"{self.base_url}/synthesis"
             params = {"speaker": speaker_id}
             
-            response = requests.post(
-                url, 
+            response = await self.http.post(
+                "/synthesis",
                 params=params,
-                data=json.dumps(audio_query),
+                content=json.dumps(audio_query),
                 headers={"Content-Type": "application/json"}
             )
-            response.raise_for_status()
             
             return response.content
             
@@ -159,36 +343,58 @@ class VoicevoxVoiceSynthesizer(VoiceSynthesizer):
             self.logger.error(f"音声合成エラー: {e}")
             return None
     
-    async def _play_audio(self, audio_data: bytes):
-        """音声データを再生"""
+    async def _multi_synthesize(self, audio_queries: List[dict], speaker_id: int) -> Optional[List[bytes]]:
+        """複数の音声クエリを /multi_synthesis でまとめて合成（非対応・失敗時はNone）"""
+        if not self.multi_synthesis_supported:
+            return None
         try:
-            import pygame
-            import io
-            
-            pygame.mixer.init()
-            audio_file = io.BytesIO(audio_data)
-            pygame.mixer.music.load(audio_file)
-            pygame.mixer.music.play()
-            
-            # 再生完了まで待機
-            while pygame.mixer.music.get_busy():
-                await asyncio.sleep(0.1)
-                
-        except ImportError:
-            self.logger.warning("pygame未インストール。音声ファイルを保存します。")
-            with open("temp_voice.wav", "wb") as f:
-                f.write(audio_data)
+            response = await self.http.post(
+                "/multi_synthesis",
+                params={"speaker": speaker_id},
+                content=json.dumps(audio_queries),
+                headers={"Content-Type": "application/json"}
+            )
+            # 応答はクエリの順に 001.wav, 002.wav, ... を格納したZIP
+            with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+                names = sorted(archive.namelist())
+                if len(names) != len(audio_queries):
+                    raise ValueError(f"音声の数が一致しません ({len(names)} != {len(audio_queries)})")
+                return [archive.read(name) for name in names]
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (404, 405):
+                self.multi_synthesis_supported = False
+                self.logger.warning("VOICEVOXエンジンが /multi_synthesis に対応していません。1件ずつ合成します")
+            else:
+                self.logger.error(f"まとめての音声合成エラー: {e}")
+            return None
         except Exception as e:
-            self.logger.error(f"音声再生エラー: {e}")
+            self.logger.error(f"まとめての音声合成エラー: {e}")
+            return None
 
 class ElevenLabsVoiceSynthesizer(VoiceSynthesizer):
     """ElevenLabsを使用した音声合成"""
     
+    supports_render = True
+    supports_stream = True
+    
+    # 音声出力ステージでそのまま再生できる16bit PCMで受け取る
+    output_format = "pcm_24000"
+    output_sample_rate = 24000
+    
     def __init__(self):
         self.api_key = config.elevenlabs_api_key
         self.voice_id = config.elevenlabs_voice_id
         self.base_url = "https://api.elevenlabs.io/v1"
         self.logger = logging.getLogger(__name__)
+        self.http = AsyncHTTPClient(
+            "elevenlabs",
+            base_url=self.base_url,
+            timeout=config.elevenlabs_timeout,
+            max_connections=config.tts_http_max_connections,
+            max_concurrency=config.elevenlabs_max_concurrency,
+            max_retries=config.tts_http_max_retries,
+            backoff=config.tts_http_retry_backoff
+        )
     
     async def synthesize(self, text: str, emotion: str = "neutral") -> bool:
         """ElevenLabs APIを使用した音声合成"""
@@ -198,23 +404,31 @@ class ElevenLabsVoiceSynthesizer(VoiceSynthesizer):
                 return False
             
             # 音声合成リクエスト
-            audio_data = await self._generate_speech(text, emotion)
+            audio_data = await self.render(text, emotion)
             if not audio_data:
                 return False
             
             # 音声再生
-            await self._play_audio(audio_data)
-            
-            return True
+            return await self.play(audio_data)
             
         except Exception as e:
             self.logger.error(f"ElevenLabs音声合成エラー: {e}")
             return False
     
+    async def aclose(self):
+        await self.http.aclose()
+    
+    def cache_identity(self, emotion: str) -> Optional[Tuple]:
+        return ("elevenlabs", self.voice_id,
+                {**self._get_voice_settings_for_emotion(emotion), "output_format": self.output_format})
+    
+    async def render(self, text: str, emotion: str = "neutral") -> Optional[bytes]:
+        return await self._generate_speech(text, emotion)
+    
     async def _generate_speech(self, text: str, emotion: str) -> Optional[bytes]:
         """音声を生成"""
         try:
-            url = f"{self.base_url}/text-to-speech/{self.voice_id}"
+            url = f"/text-to-speech/{self.voice_id}"
             
             # 感情に応じた設定
             voice_settings = self._get_voice_settings_for_emotion(emotion)
@@ -226,20 +440,42 @@ class ElevenLabsVoiceSynthesizer(VoiceSynthesizer):
             }
             
             headers = {
-                "Accept": "audio/mpeg",
                 "Content-Type": "application/json",
                 "xi-api-key": self.api_key
             }
             
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
+            response = await self.http.post(
+                url, params={"output_format": self.output_format}, json=payload, headers=headers
+            )
             
-            return response.content
+            # ヘッダーの無いPCMが返るので、キャッシュ・再生できるようWAVにする
+            pcm = response.content
+            return wav_header(len(pcm), self.output_sample_rate) + pcm
             
         except Exception as e:
             self.logger.error(f"ElevenLabs音声生成エラー: {e}")
             return None
     
+    async def render_stream(self, text: str, emotion: str = "neutral") -> AsyncIterator[PCMClip]:
+        """ストリーミング用のエンドポイントから、生成されたPCMを受信した分ずつ返す"""
+        if not self.api_key:
+            return
+        decoder = WavStreamDecoder(self.output_sample_rate)
+        async with self.http.stream(
+            "POST", f"/text-to-speech/{self.voice_id}/stream",
+            params={"output_format": self.output_format},
+            json={
+                "text": text,
+                "model_id": "eleven_multilingual_v2",
+                "voice_settings": self._get_voice_settings_for_emotion(emotion)
+            },
+            headers={"Content-Type": "application/json", "xi-api-key": self.api_key}
+        ) as response:
+            async for data in response.aiter_bytes():
+                clip = decoder.feed(data)
+                if clip is not None:
+                    yield clip
+    
     def _get_voice_settings_for_emotion(self, emotion: str) -> dict:
         """感情に応じた音声設定"""
         emotion_settings = {
@@ -252,47 +488,327 @@ class ElevenLabsVoiceSynthesizer(VoiceSynthesizer):
         }
         
         return emotion_settings.get(emotion, emotion_settings["calm"])
+
+class EnginePoolMember:
+    """エンジンプール内の1エンジンと、その負荷・障害の状態"""
+    
+    def __init__(self, name: str, synthesizer: VoiceSynthesizer, breaker: CircuitBreaker):
+        self.name = name
+        self.synthesizer = synthesizer
+        self.breaker = breaker
+        self.outstanding = 0  # 処理中のリクエスト数
+        self.requests = 0
+        self.failures = 0
+        self.latency = LatencyStats()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            **self.breaker.stats(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency": self.latency.summary()
+        }
+
+class TTSEnginePool(VoiceSynthesizer):
+    """複数の音声合成エンジンを1つのエンジンとして扱う
+    
+    - 処理中のリクエストが最も少ないエンジンに振り分ける
+    - 失敗が続いたエンジンはサーキットブレーカーで外し、別のエンジンで合成し直す
+    - バックグラウンドで定期的にヘルスチェックし、落ちたエンジンは先に外し、復旧したら戻す
+    - すべてのエンジンが使えない場合は代替エンジン（pyttsx3）で読み上げる
+    """
+    
+    supports_render = True
+    
+    def __init__(self, members: List[EnginePoolMember], fallback: Optional[VoiceSynthesizer] = None,
+                 health_interval: Optional[float] = None):
+        self.members = members
+        self.fallback = fallback
+        self.health_interval = config.tts_health_interval if health_interval is None else health_interval
+        self.supports_batch = all(member.synthesizer.supports_batch for member in members)
+        self.supports_stream = all(member.synthesizer.supports_stream for member in members)
+        self.logger = logging.getLogger(__name__)
+        self._probe_task: Optional[asyncio.Task] = None
+        
+        # 統計
+        self.failovers = 0  # 別のエンジンで合成し直した回数
+        self.fallbacks = 0  # 代替エンジンで読み上げた回数
+    
+    def cache_identity(self, emotion: str) -> Optional[Tuple]:
+        # プール内のエンジンは同じ設定なので、どれで合成しても同じキー
+        return self.members[0].synthesizer.cache_identity(emotion)
+    
+    def _pick(self, tried: set) -> Optional[EnginePoolMember]:
+        """まだ試していない使用可能なエンジンのうち、処理中が最も少ないもの"""
+        candidates = [member for member in self.members
+                      if member not in tried and member.breaker.available()]
+        if not candidates:
+            return None
+        member = min(candidates, key=lambda m: (m.outstanding, m.requests))
+        member.breaker.allow()
+        return member
     
-    async def _play_audio(self, audio_data: bytes):
-        """音声データを再生"""
+    async def _attempt(self, member: EnginePoolMember, call):
+        """1エンジンで合成し、結果をブレーカーに記録（失敗時はNone）"""
+        member.outstanding += 1
+        member.requests += 1
+        start = time.perf_counter()
         try:
-            import pygame
-            import io
-            
-            pygame.mixer.init()
-            audio_file = io.BytesIO(audio_data)
-            pygame.mixer.music.load(audio_file)
-            pygame.mixer.music.play()
-            
-            while pygame.mixer.music.get_busy():
-                await asyncio.sleep(0.1)
-                
+            result = await call(member.synthesizer)
+        except asyncio.CancelledError:
+            # 割り込みによる中断はエンジンの障害ではない
+            member.breaker.release()
+            raise
         except Exception as e:
-            self.logger.error(f"音声再生エラー: {e}")
+            self.logger.error(f"{member.name}: 音声合成エラー: {e}")
+            result = None
+        finally:
+            member.outstanding -= 1
+        
+        ok = bool(result) and (not isinstance(result, list) or all(result))
+        if ok:
+            member.breaker.record_success()
+            member.latency.record(time.perf_counter() - start)
+        else:
+            self._record_failure(member)
+        return result
+    
+    def _record_failure(self, member: EnginePoolMember):
+        member.failures += 1
+        member.breaker.record_failure()
+        if member.breaker.state == "open":
+            self.logger.warning(f"{member.name}: 失敗が続いたため一時的に外します")
+    
+    async def render(self, text: str, emotion: str = "neutral") -> Optional[bytes]:
+        """使用可能なエンジンで順に合成を試す（すべて失敗したらNone）"""
+        self._ensure_probing()
+        tried: set = set()
+        while True:
+            member = self._pick(tried)
+            if member is None:
+                return None
+            if tried:
+                self.failovers += 1
+            tried.add(member)
+            audio_data = await self._attempt(member, lambda synthesizer: synthesizer.render(text, emotion))
+            if audio_data:
+                return audio_data
+    
+    async def render_stream(self, text: str, emotion: str = "neutral") -> AsyncIterator[PCMClip]:
+        """最初の音声が届くまでは別のエンジンで合成し直し、届いた後はそのエンジンから受信し続ける"""
+        self._ensure_probing()
+        tried: set = set()
+        while True:
+            member = self._pick(tried)
+            if member is None:
+                return
+            if tried:
+                self.failovers += 1
+            tried.add(member)
+            stream = member.synthesizer.render_stream(text, emotion)
+            member.outstanding += 1
+            member.requests += 1
+            start = time.perf_counter()
+            try:
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                except asyncio.CancelledError:
+                    member.breaker.release()
+                    raise
+                except Exception as e:
+                    self.logger.error(f"{member.name}: 音声合成エラー: {e}")
+                    first = None
+                if first is None:
+                    self._record_failure(member)
+                    continue
+                # レイテンシは最初の音声が届くまで
+                member.breaker.record_success()
+                member.latency.record(time.perf_counter() - start)
+                yield first
+                try:
+                    async for clip in stream:
+                        yield clip
+                except Exception:
+                    # 受信の途中で切れた分は合成し直さない（再生済みの部分と重なるため）
+                    self._record_failure(member)
+                    raise
+                return
+            finally:
+                member.outstanding -= 1
+                await stream.aclose()
+    
+    async def render_batch(self, items: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        """エンジンごとのまとめ数で区切り、各まとまりを空いているエンジンで並行して合成"""
+        self._ensure_probing()
+        size = max(1, config.voicevox_batch_size)
+        chunks = await asyncio.gather(*(
+            self._render_chunk(items[start:start + size]) for start in range(0, len(items), size)
+        ))
+        return [audio_data for chunk in chunks for audio_data in chunk]
+    
+    async def _render_chunk(self, items: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        results: List[Optional[bytes]] = [None] * len(items)
+        remaining = list(range(len(items)))
+        tried: set = set()
+        while remaining:
+            member = self._pick(tried)
+            if member is None:
+                break
+            if tried:
+                self.failovers += 1
+            tried.add(member)
+            batch = [items[i] for i in remaining]
+            rendered = await self._attempt(member, lambda synthesizer: synthesizer.render_batch(batch))
+            rendered = rendered or [None] * len(batch)
+            for i, audio_data in zip(remaining, rendered):
+                results[i] = audio_data
+            remaining = [i for i in remaining if not results[i]]
+        return results
+    
+    async def synthesize(self, text: str, emotion: str = "neutral") -> bool:
+        audio_data = await self.render(text, emotion)
+        if not audio_data:
+            return await self.synthesize_fallback(text, emotion)
+        return await self.play(audio_data)
+    
+    async def synthesize_fallback(self, text: str, emotion: str = "neutral") -> bool:
+        if self.fallback is None:
+            return False
+        self.fallbacks += 1
+        self.logger.warning("使用可能な音声合成エンジンが無いため、代替エンジンで読み上げます")
+        return await self.fallback.synthesize(text, emotion)
+    
+    def _ensure_probing(self):
+        """ヘルスチェックのタスクが動いていなければ開始"""
+        if self.health_interval > 0 and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+    
+    async def _probe_loop(self):
+        while True:
+            await asyncio.gather(*(self._probe(member) for member in self.members))
+            await asyncio.sleep(self.health_interval)
+    
+    async def _probe(self, member: EnginePoolMember):
+        """応答しないエンジンは外し、応答するようになったら戻す"""
+        try:
+            healthy = await member.synthesizer.health_check()
+        except Exception:
+            healthy = False
+        state = member.breaker.state
+        if healthy and state != "closed":
+            member.breaker.reset()
+            self.logger.info(f"{member.name}: 復旧を確認しました")
+        elif not healthy and state != "open":
+            # 半開きのエンジンも、応答しない間は実際の合成で試さない
+            member.breaker.trip()
+            if state == "closed":
+                self.logger.warning(f"{member.name}: ヘルスチェックに失敗したため一時的に外します")
+    
+    def stats(self) -> Dict[str, Any]:
+        """エンジンごとの状態と、合成し直し・代替エンジンの使用回数"""
+        return {
+            "members": [member.stats() for member in self.members],
+            "failovers": self.failovers,
+            "fallbacks": self.fallbacks
+        }
+    
+    async def aclose(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+        for member in self.members:
+            await member.synthesizer.aclose()
+        if self.fallback is not None:
+            await self.fallback.aclose()
 
 class VoiceSynthesisManager:
     """音声合成マネージャー"""
     
-    def __init__(self):
+    def __init__(self, osc_output=None):
         self.synthesizer = self._create_synthesizer()
         self.logger = logging.getLogger(__name__)
+        
+        # 同時に実行する音声合成数の上限（エンジンごと。pyttsx3は読み上げワーカーが受け付け順に処理する）
+        engines = len(self.synthesizer.members) if isinstance(self.synthesizer, TTSEnginePool) else 1
+        self.tts_semaphore = asyncio.Semaphore(config.max_concurrent_tts_requests * engines)
+        
+        # 割り込みで中断した読み上げ数と、読み上げずに捨てた文の数
+        self.cancelled = 0
+        self.discarded = 0
+        
+        # 合成済み音声のディスクキャッシュ
+        self.cache = AudioCache(config.tts_cache_dir, config.tts_cache_max_bytes) \
+            if config.tts_cache_enabled and self.synthesizer.supports_render else None
+        self._cache_writes: set = set()  # 書き込み中のキャッシュ
+        # 合成済み音声を再生する常駐の出力ステージ（pyttsx3は自前で再生する）
+        self.output = get_audio_output() if self.synthesizer.supports_render else None
+        # 感情は合成後の音声処理で付け、合成とキャッシュは感情に依らない基本の声で行う
+        self.dsp = VoiceProcessor() if config.tts_dsp_enabled and self.synthesizer.supports_render else None
+        # 口の動きは再生前に音声処理と一緒に解析し、再生に合わせてOSCで送る
+        self.lip_sync = LipSyncDriver(osc_output) \
+            if osc_output is not None and config.lip_sync_enabled and self.synthesizer.supports_render else None
+        
+        # 文ごとの合成パイプラインの計測
+        self.streamed = 0  # 受信しながら再生した文の数
+        self.stream_first_audio = LatencyStats()  # 受信しながら再生する文の、合成開始から最初の音声が届くまで
+        self.lead_in = LatencyStats()  # 最初の文を受け取ってから再生開始まで
+        self.gaps = LatencyStats()  # 文と文の間の無音（合成待ち）
+        self._lookahead_observations = 0
+        self._lookahead_in_flight = 0.0
+        self._lookahead_ready = 0.0
     
     def _create_synthesizer(self) -> VoiceSynthesizer:
         """設定に基づいて音声合成エンジンを作成"""
         engine = config.voice_engine.lower()
         
         if engine == "voicevox":
-            return VoicevoxVoiceSynthesizer()
+            # 複数のVOICEVOXエンジンは音声クエリのキャッシュを共有する
+            query_cache: "OrderedDict[Tuple[str, int], dict]" = OrderedDict()
+            synthesizers = [
+                VoicevoxVoiceSynthesizer(url, query_cache) for url in config.voicevox_urls or [config.voicevox_url]
+            ]
         elif engine == "elevenlabs":
-            return ElevenLabsVoiceSynthesizer()
+            synthesizers = [ElevenLabsVoiceSynthesizer()]
         else:  # デフォルトはpyttsx3
             return PyttsxVoiceSynthesizer()
+        
+        members = [
+            EnginePoolMember(
+                getattr(synthesizer, "base_url", engine), synthesizer,
+                CircuitBreaker(config.tts_breaker_failures, config.tts_breaker_reset)
+            )
+            for synthesizer in synthesizers
+        ]
+        fallback = PyttsxVoiceSynthesizer() if config.tts_fallback_enabled else None
+        return TTSEnginePool(members, fallback)
     
-    async def speak(self, text: str, emotion: str = "neutral") -> bool:
-        """テキストを音声で読み上げ"""
+    async def speak(self, text: str, emotion: str = "neutral", tone: Optional[float] = None) -> bool:
+        """テキストを音声で読み上げ（tone は声のトーン 0.0〜1.0）"""
         try:
             self.logger.info(f"音声合成開始: {text[:50]}...")
-            success = await self.synthesizer.synthesize(text, emotion)
+            sentences = split_sentences(text) if self.synthesizer.supports_render else [text]
+            if not self.synthesizer.supports_render:
+                success = await self.synthesizer.synthesize(text, emotion)
+            elif len(sentences) <= 1:
+                audio_data = await self.render(text, emotion, tone)
+                if audio_data:
+                    success = await self.play(audio_data)
+                else:
+                    success = await self.synthesizer.synthesize_fallback(text, emotion)
+            else:
+                # 複数の文は次の文を合成しながら今の文を再生する
+                stream = self.open_stream()
+                try:
+                    for sentence in sentences:
+                        await stream.put(sentence, emotion, tone)
+                    success = await stream.close()
+                except BaseException:
+                    await stream.cancel()
+                    raise
             
             if success:
                 self.logger.info("音声合成完了")
@@ -301,9 +817,363 @@ class VoiceSynthesisManager:
             
             return success
             
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            self.logger.info("音声合成を中断しました")
+            raise
         except Exception as e:
             self.logger.error(f"音声合成マネージャーエラー: {e}")
             return False
+    
+    def _synthesis_emotion(self, emotion: str) -> str:
+        """エンジンに渡す感情（音声処理で感情を付ける場合は基本の声）
+
+        音声処理をする場合、エンジン側の感情の調整（voicevox_emotion_mode）は使われない
+        """
+        return DSP_BASE_EMOTION if self.dsp is not None else emotion
+    
+    async def render(self, text: str, emotion: str = "neutral", tone: Optional[float] = None):
+        """再生する音声を返す（キャッシュ済みならキャッシュから、無ければ合成して保存）"""
+        emotion_for_engine = self._synthesis_emotion(emotion)
+        key = self._cache_key(text, emotion_for_engine)
+        audio_data = self.cache.get(key) if key is not None else None
+        if audio_data is None and self.streams(text):
+            # 音声処理をしないのでエンジンに感情を渡す（同じ声になる場合だけキャッシュする）
+            return await self._render_stream(text, emotion, key if emotion_for_engine == emotion else None)
+        if audio_data is None:
+            async with self.tts_semaphore:
+                audio_data = await self.synthesizer.render(text, emotion_for_engine)
+            if audio_data and key is not None:
+                self._store(key, audio_data)
+        return await self._apply_voice(audio_data, emotion, tone)
+    
+    def streams(self, text: str) -> bool:
+        """合成結果を受信しながら再生する文か（キャッシュに無い場合）"""
+        return config.tts_streaming_enabled and self.synthesizer.supports_stream and \
+            len(text) >= config.tts_stream_min_chars
+    
+    async def _render_stream(self, text: str, emotion: str, key: Optional[str]) -> Optional[PCMStream]:
+        """最初の音声が届いた時点で、残りを受信しながら再生するストリームを返す（合成できなければNone）"""
+        start = time.perf_counter()
+        chunks = self.synthesizer.render_stream(text, emotion)
+        try:
+            async with self.tts_semaphore:
+                first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except asyncio.CancelledError:
+            await chunks.aclose()
+            raise
+        except Exception as e:
+            self.logger.error(f"音声合成エラー: {e}")
+            first = None
+        if first is None:
+            await chunks.aclose()
+            return None
+        
+        self.streamed += 1
+        self.stream_first_audio.record(time.perf_counter() - start)
+        stream = self.output.open_stream()
+        stream.feeder = asyncio.ensure_future(self._feed_stream(stream, first, chunks, key))
+        return stream
+    
+    async def _feed_stream(self, stream: PCMStream, first: PCMClip, chunks: AsyncIterator[PCMClip],
+                           key: Optional[str]):
+        """受信した音声をストリームに積み、最後まで受信できたらキャッシュする"""
+        received: List[memoryview] = []
+        complete = False
+        try:
+            await stream.write(first)
+            received.append(first.samples)
+            async for clip in chunks:
+                await stream.write(clip)
+                received.append(clip.samples)
+            complete = True
+        except Exception as e:
+            self.logger.error(f"音声の受信エラー: {e}")
+        finally:
+            await chunks.aclose()
+            stream.finish(complete)
+        if complete and key is not None:
+            pcm = b"".join(received)
+            self._store(key, wav_header(len(pcm), first.sample_rate, first.channels) + pcm)
+    
+    async def _apply_voice(self, audio_data, emotion: str, tone: Optional[float]):
+        """感情と声のトーンに応じた音声処理（イベントループを止めないよう別スレッドで行う）"""
+        if (self.dsp is None and self.lip_sync is None) or not audio_data:
+            return audio_data
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self._process_voice, audio_data, emotion, tone)
+        except ValueError as e:
+            # PCMのWAV以外は処理せずにそのまま再生する
+            self.logger.warning(f"音声処理をスキップ: {e}")
+            return audio_data
+    
+    def _process_voice(self, audio_data, emotion: str, tone: Optional[float]):
+        """音声処理と口の動きの解析（別スレッドで実行）"""
+        clip = self.dsp.apply(audio_data, emotion, tone) if self.dsp is not None else parse_wav(audio_data)
+        if self.lip_sync is not None:
+            clip.lip_sync = self.lip_sync.analyzer.analyze(clip)
+        return clip
+    
+    async def play(self, audio_data) -> bool:
+        """合成済みの音声を再生（口の動きを解析済みなら再生に合わせて送る）"""
+        track = getattr(audio_data, "lip_sync", None)
+        if track is None or self.lip_sync is None:
+            return await self.synthesizer.play(audio_data)
+        # 同じチャンネルに続けて積まれた次のクリップは、この再生が終わる前に始まることがあるので
+        # このクリップの口の動きだけを止める
+        handles: List[asyncio.Task] = []
+        
+        def on_start(started_at: float):
+            handles.append(self.lip_sync.begin(track, started_at))
+        
+        try:
+            return await self.synthesizer.play(audio_data, on_start=on_start)
+        finally:
+            for handle in handles:
+                self.lip_sync.end(handle)
+    
+    async def render_batch(self, items: List[Tuple[str, str]],
+                           tones: Optional[List[Optional[float]]] = None) -> List[Optional[Any]]:
+        """複数の (テキスト, 感情) の再生する音声を返す（キャッシュに無いものはまとめて合成）"""
+        base = await self._render_base_batch([(text, self._synthesis_emotion(emotion)) for text, emotion in items])
+        tones = tones or [None] * len(items)
+        return list(await asyncio.gather(*(
+            self._apply_voice(audio_data, emotion, tone)
+            for audio_data, (_, emotion), tone in zip(base, items, tones)
+        )))
+    
+    async def _render_base_batch(self, items: List[Tuple[str, str]]) -> List[Optional[Any]]:
+        """エンジンが合成した音声（キャッシュ済みならキャッシュから）。同じキーは1回だけ合成する"""
+        results: List[Optional[Any]] = [None] * len(items)
+        keys = [self._cache_key(text, emotion) for text, emotion in items]
+        missing: Dict[Any, List[int]] = {}
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(key if key is not None else i, []).append(i)
+        if missing:
+            groups = list(missing.values())
+            async with self.tts_semaphore:
+                rendered = await self.synthesizer.render_batch([items[indices[0]] for indices in groups])
+            for indices, audio_data in zip(groups, rendered):
+                for i in indices:
+                    results[i] = audio_data
+                if audio_data and keys[indices[0]] is not None:
+                    self._store(keys[indices[0]], audio_data)
+        return results
+    
+    def record_lookahead(self, in_flight: int, ready: int, lookahead: int):
+        """再生開始時点で先行して合成中・合成済みだった文の数を記録"""
+        self._lookahead_observations += 1
+        self._lookahead_in_flight += in_flight / lookahead
+        self._lookahead_ready += ready / lookahead
+    
+    def pipeline_stats(self) -> Dict[str, Any]:
+        """最初の再生までの時間、文の間の無音、先読みの使用率"""
+        observations = self._lookahead_observations or 1
+        return {
+            "lead_in": self.lead_in.summary(),
+            "gaps": self.gaps.summary(),
+            "lookahead_in_flight": self._lookahead_in_flight / observations,
+            "lookahead_ready": self._lookahead_ready / observations
+        }
+    
+    def _store(self, key: str, audio_data):
+        """音声キャッシュへの書き込みを別スレッドで始める（再生は書き込みを待たない）"""
+        task = asyncio.ensure_future(self.cache.put_async(key, audio_data))
+        self._cache_writes.add(task)
+        task.add_done_callback(self._cache_writes.discard)
+    
+    def _cache_key(self, text: str, emotion: str) -> Optional[str]:
+        """音声キャッシュのキー（キャッシュを使わない場合はNone）"""
+        if self.cache is None:
+            return None
+        identity = self.synthesizer.cache_identity(emotion)
+        if identity is None:
+            return None
+        return audio_cache_key(*identity, text)
+    
+    async def prewarm(self, phrases: Iterable[Tuple[str, str]]) -> int:
+        """定型文を前もって合成してキャッシュし、新たに合成した件数を返す"""
+        # 話者と調整が同じ感情は同じキーになるので、キーごとに1回だけ合成する
+        # （音声処理で感情を付ける場合は、すべての感情が基本の声の1件にまとまる）
+        missing = {}
+        for text, emotion in phrases:
+            emotion = self._synthesis_emotion(emotion)
+            key = self._cache_key(text, emotion)
+            if key is not None and key not in self.cache:
+                missing.setdefault(key, (text, emotion))
+        if not missing:
+            return 0
+        
+        try:
+            results = await self._render_base_batch(list(missing.values()))
+        except Exception as e:
+            self.logger.warning(f"事前合成エラー: {e}")
+            return 0
+        warmed = sum(1 for audio_data in results if audio_data)
+        if warmed:
+            self.logger.info(f"定型文を{warmed}件事前合成しました")
+        return warmed
+    
+    async def close(self):
+        """音声合成エンジンの接続と音声出力を閉じる（書き込み中のキャッシュは書き終える）"""
+        if self._cache_writes:
+            await asyncio.gather(*self._cache_writes, return_exceptions=True)
+        await self.synthesizer.aclose()
+        if self.output is not None:
+            self.output.close()
+    
+    def open_stream(self) -> "SpeechStream":
+        """文単位で逐次読み上げるストリームを開く"""
+        return SpeechStream(self)
+
+class SpeechStream:
+    """LLMの生成と並行して文を順番に読み上げるストリーム
+    
+    put()は読み上げを待たずに戻るため、後続トークンの受信を妨げない。
+    render()に対応したエンジンでは、再生中の文の後ろ lookahead 文までを
+    先に合成しておき、合成が終わった音声を順番どおりに途切れなく再生する
+    """
+    
+    def __init__(self, manager: VoiceSynthesisManager, lookahead: Optional[int] = None):
+        self.manager = manager
+        self.lookahead = max(1, lookahead or config.tts_lookahead)
+        self.logger = logging.getLogger(__name__)
+        self._pending: deque = deque()  # 合成待ちの (文, 感情, トーン, 受付時刻)
+        self._jobs: deque = deque()  # 合成中・合成済み（pyttsx3は読み上げ中）の (文, 感情, 受付時刻, タスク)
+        self._batches: List[asyncio.Future] = []  # まとめて合成中のリクエスト
+        self._started = False
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._worker = asyncio.create_task(self._run())
+    
+    async def put(self, text: str, emotion: str = "neutral", tone: Optional[float] = None):
+        """読み上げる文を追加"""
+        self._pending.append((text, emotion, tone, time.perf_counter()))
+        self._schedule()
+        self._wakeup.set()
+    
+    def _schedule(self):
+        """先読みの枠が空いている分だけ合成を始める"""
+        if not self.manager.synthesizer.supports_render:
+            # 読み上げワーカーにすぐ積み、溜まった文をまとめて読み上げさせる
+            while self._pending:
+                text, emotion, _, queued_at = self._pending.popleft()
+                task = asyncio.ensure_future(self.manager.synthesizer.synthesize(text, emotion))
+                self._jobs.append((text, emotion, queued_at, task))
+            return
+        while self._pending and len(self._jobs) < self.lookahead:
+            # 最初の文はすぐ再生できるよう単独で、以降は空いている枠の分をまとめて合成する
+            # （受信しながら再生する文は単独で合成する）
+            limit = min(len(self._pending), self.lookahead - len(self._jobs))
+            count = 0
+            while count < limit and not self.manager.streams(self._pending[count][0]):
+                count += 1
+            if not self.manager.synthesizer.supports_batch or not self._started or count < 2:
+                text, emotion, tone, queued_at = self._pending.popleft()
+                task = asyncio.ensure_future(self.manager.render(text, emotion, tone))
+                self._jobs.append((text, emotion, queued_at, task))
+                self._started = True
+                continue
+            items = [self._pending.popleft() for _ in range(count)]
+            batch = asyncio.ensure_future(self.manager.render_batch(
+                [(text, emotion) for text, emotion, _, _ in items], [tone for _, _, tone, _ in items]
+            ))
+            self._batches.append(batch)
+            batch.add_done_callback(self._batches.remove)
+            for i, (text, emotion, _, queued_at) in enumerate(items):
+                task = asyncio.ensure_future(self._batch_item(batch, i))
+                self._jobs.append((text, emotion, queued_at, task))
+    
+    @staticmethod
+    def _discard(task: asyncio.Future):
+        """合成中なら取り消し、受信しながら再生する予定だった音声なら受信を止める"""
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled() and task.exception() is None and isinstance(task.result(), PCMStream):
+            task.result().close()
+    
+    @staticmethod
+    async def _batch_item(batch: asyncio.Future, index: int):
+        """まとめて合成した結果のうち index 番目（待つ側が取り消されても合成は止めない）"""
+        return (await asyncio.shield(batch))[index]
+    
+    async def close(self) -> bool:
+        """残りの文をすべて読み上げてから終了"""
+        self._closed = True
+        self._wakeup.set()
+        return await self._worker
+    
+    async def cancel(self):
+        """読み上げ中の文を止め、合成中・合成待ちの文を捨てる"""
+        self.manager.discarded += len(self._pending) + len(self._jobs)
+        self._pending.clear()
+        while self._jobs:
+            self._discard(self._jobs.popleft()[3])
+        for batch in list(self._batches):
+            batch.cancel()
+        if not self._worker.done():
+            self.manager.cancelled += 1
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+    
+    async def _run(self) -> bool:
+        """合成済みの音声を順番に再生"""
+        success = True
+        last_end = None
+        while True:
+            if not self._jobs:
+                if self._closed:
+                    return success
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            text, emotion, queued_at, task = self._jobs.popleft()
+            if not self.manager.synthesizer.supports_render:
+                success = await task and success
+                continue
+            
+            # 再生する文が抜けた枠で次の文の合成を始める
+            self._schedule()
+            try:
+                audio_data = await task
+            except Exception as e:
+                self.logger.error(f"音声合成エラー: {e}")
+                audio_data = None
+            if not audio_data:
+                success = await self.manager.synthesizer.synthesize_fallback(text, emotion) and success
+                last_end = time.perf_counter()
+                continue
+            
+            started = time.perf_counter()
+            if last_end is None:
+                self.manager.lead_in.record(started - queued_at)
+            else:
+                # 前の文の再生が終わった時点で届いていなかった文の待ち時間は含めない
+                self.manager.gaps.record(started - max(last_end, queued_at))
+            self.manager.record_lookahead(
+                len(self._jobs), sum(1 for job in self._jobs if job[3].done()), self.lookahead
+            )
+            success = await self.manager.play(audio_data) and success
+            last_end = time.perf_counter()
+
+def prewarm_phrases() -> List[Tuple[str, str]]:
+    """起動時に事前合成する (テキスト, 感情) の組"""
+    return [
+        (text, emotion)
+        for text in config.fallback_responses + config.greeting_phrases
+        for emotion in config.tts_prewarm_emotions
+    ]
 
 # 使用例
 async def test_voice_synthesis():
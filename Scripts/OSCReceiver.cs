@@ -130,6 +130,14 @@ public class OSCReceiver : MonoBehaviour
                 float voiceTone = ExtractFloatValue(message);
                 aiController.OnVoiceToneReceived(voiceTone);
             }
+            else if (message.Contains("/avatar/parameters/MouthOpen"))
+            {
+                aiController.OnMouthOpenReceived(ExtractFloatValue(message));
+            }
+            else if (message.Contains("/avatar/parameters/MouthShape"))
+            {
+                aiController.OnMouthShapeReceived((int)ExtractFloatValue(message));
+            }
         }
         catch (Exception e)
         {
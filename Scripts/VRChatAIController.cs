@@ -33,12 +33,16 @@ public class VRChatAIController : UdonSharpBehaviour
     private string currentGesture = "idle";
     private float intimacyLevel = 0.0f;
     private float voiceTone = 0.5f;
+    private float mouthOpen = 0.0f;
+    private int mouthShape = 0; // 0:無音 1:あ 2:い 3:う 4:え 5:お
     
     // アニメーションパラメータ
     private readonly string EMOTION_PARAM = "Emotion";
     private readonly string GESTURE_PARAM = "Gesture";
     private readonly string INTIMACY_PARAM = "Intimacy";
     private readonly string VOICE_TONE_PARAM = "VoiceTone";
+    private readonly string MOUTH_OPEN_PARAM = "MouthOpen";
+    private readonly string MOUTH_SHAPE_PARAM = "MouthShape";
     
     // プレイヤー検出
     private VRCPlayerApi nearestPlayer;
@@ -104,6 +108,26 @@ public class VRChatAIController : UdonSharpBehaviour
         Debug.Log($"音声トーン更新: {tone}");
     }
     
+    /// <summary>
+    /// OSCから口の動き（再生中の音声に合わせて毎フレーム届く）を受信
+    /// </summary>
+    public void OnLipSyncReceived(float open, int shape)
+    {
+        mouthOpen = Mathf.Clamp01(open);
+        mouthShape = Mathf.Clamp(shape, 0, 5);
+        UpdateVoiceParameters();
+    }
+    
+    public void OnMouthOpenReceived(float open)
+    {
+        OnLipSyncReceived(open, mouthShape);
+    }
+    
+    public void OnMouthShapeReceived(int shape)
+    {
+        OnLipSyncReceived(mouthOpen, shape);
+    }
+    
     void UpdateEmotionDisplay()
     {
         if (avatarAnimator != null)
@@ -243,6 +267,8 @@ public class VRChatAIController : UdonSharpBehaviour
         if (avatarAnimator != null)
         {
             avatarAnimator.SetFloat(VOICE_TONE_PARAM, voiceTone);
+            avatarAnimator.SetFloat(MOUTH_OPEN_PARAM, mouthOpen);
+            avatarAnimator.SetInteger(MOUTH_SHAPE_PARAM, mouthShape);
         }
         
         if (voiceAudioSource != null)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+応答レイテンシのベンチマーク
+遅延の大きい代替LLMサーバーに対して、締め切りレースの有無で
+最初の発話までの p50/p95/p99 を比較する
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root / "AI"))
+sys.path.append(str(Path(__file__).parent))
+
+from config import config
+from deadline_racing import DeadlineRacer
+from llm_backends import LocalLLMBackend
+from metrics import LatencyStats
+from standin_servers import llm_handler, server_url, start_server
+
+MESSAGES = [{"role": "user", "content": "こんにちは"}]
+
+
+def print_summary(label, stats):
+    """p50/p95/p99を表示"""
+    print(f"{label:24}: p50 {stats['p50_ms']:7.1f}ms | p95 {stats['p95_ms']:7.1f}ms | "
+          f"p99 {stats['p99_ms']:7.1f}ms (n={stats['count']})")
+
+
+async def run_baseline(backend, turns):
+    """締め切りなしで最初のトークンまでの時間を計測"""
+    stats = LatencyStats()
+    for _ in range(turns):
+        start = time.perf_counter()
+        async for _ in backend.stream(MESSAGES):
+            stats.record(time.perf_counter() - start)
+            break
+    return stats.summary()
+
+
+async def run_racing(backend, turns):
+    """締め切りレースありで計測"""
+    racer = DeadlineRacer(backend, hedge_after=config.llm_hedge_after, deadline=config.response_deadline)
+    for _ in range(turns):
+        async for _ in racer.stream(MESSAGES, filler="えっと…\n", fallback="ごめんね"):
+            pass
+    return racer.stats()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="応答レイテンシのベンチマーク")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--slow-probability", type=float, default=0.1)
+    parser.add_argument("--slow-delay", type=float, default=4.0)
+    args = parser.parse_args()
+
+    server = await start_server(llm_handler(
+        first_token_delay=args.first_token_delay,
+        slow_probability=args.slow_probability,
+        slow_delay=args.slow_delay
+    ))
+    config.local_llm_url = server_url(server) + "/v1"
+    config.local_llm_max_retries = 0
+    backend = LocalLLMBackend()
+
+    try:
+        print_summary("締め切りなし(最初のトークン)", await run_baseline(backend, args.turns))
+        stats = await run_racing(backend, args.turns)
+        print_summary("締め切りあり(最初の発話)", stats["first_audio"])
+        print_summary("締め切りあり(最初のトークン)", stats["first_token"])
+        print(f"予備リクエスト: {stats['hedged']}回 (採用 {stats['hedge_wins']}回) | "
+              f"つなぎ: {stats['fillers']}回 | 失敗: {stats['failures']}回")
+    finally:
+        await backend.aclose()
+        server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
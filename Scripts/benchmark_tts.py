@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音声合成HTTPのベンチマーク
+代替VOICEVOXサーバーに対して、同期HTTP（従来の実装）と接続プール付きの
+非同期HTTPで音声合成リクエストを送り、イベントループの停止時間を比較する
+
+--stream では、音声をゆっくりチャンク転送するサーバーに対して、受信し終えてから
+再生する場合と受信しながら再生する場合の、長い文の最初の音声までの時間を比較する
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root / "AI"))
+sys.path.append(str(Path(__file__).parent))
+
+from config import config
+from metrics import EventLoopMonitor
+from standin_servers import start_server_in_thread, voicevox_handler
+from voice_synthesis import VoiceSynthesisManager, VoicevoxVoiceSynthesizer
+
+TEXT = "こんにちは！今日はいい天気ですね♪"
+LONG_TEXT = "今日は朝から晴れていて、公園を散歩していたら桜がとてもきれいに咲いていたので、ついたくさん写真を撮ってしまいました♪"
+
+
+async def synthesize_blocking(base_url: str, speaker_id: int) -> bytes:
+    """従来の実装と同じく、async関数の中で同期HTTPを呼ぶ"""
+    query_url = f"{base_url}/audio_query?" + urllib.parse.urlencode({"text": TEXT, "speaker": speaker_id})
+    with urllib.request.urlopen(urllib.request.Request(query_url, method="POST")) as response:
+        audio_query = json.loads(response.read())
+    request = urllib.request.Request(
+        f"{base_url}/synthesis?speaker={speaker_id}",
+        data=json.dumps(audio_query).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+async def synthesize_async(synthesizer: VoicevoxVoiceSynthesizer, speaker_id: int) -> bytes:
+    """接続プール付きの非同期HTTPで合成（再生は行わない）"""
+    audio_query = await synthesizer._create_audio_query(TEXT, speaker_id)
+    return await synthesizer._synthesize_audio(audio_query, speaker_id)
+
+
+async def run(label: str, make_request, requests: int, concurrency: int):
+    """同時実行数concurrencyでrequests回合成し、停止時間を表示"""
+    monitor = EventLoopMonitor(interval=0.005)
+    monitor.start()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            audio = await make_request()
+            assert audio, "音声データが空です"
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.02)
+    monitor.stop()
+
+    stalls = monitor.summary()
+    print(f"{label:10}: {elapsed:6.2f}秒 ({requests / elapsed:5.1f}件/秒) | "
+          f"ループ停止 p50 {stalls['p50_ms']:6.1f}ms | p95 {stalls['p95_ms']:6.1f}ms | "
+          f"最大 {stalls['max_ms']:6.1f}ms")
+
+
+async def first_audio(manager: VoiceSynthesisManager, text: str) -> float:
+    """合成を始めてから最初のサンプルが出力されるまでの秒数（再生は最後まで待つ）"""
+    start = time.perf_counter()
+    audio = await manager.render(text, "calm")
+    assert audio, "音声データが空です"
+    started = asyncio.get_running_loop().create_future()
+
+    def on_start(at: float):
+        if not started.done():
+            started.set_result(time.perf_counter())
+
+    assert await manager.output.play(audio, on_start=on_start), "再生が途中で終わりました"
+    return (await started) - start
+
+
+async def run_stream(args):
+    """受信し終えてから再生する場合と、受信しながら再生する場合の最初の音声までの時間"""
+    base_url, stop = start_server_in_thread(voicevox_handler(
+        synthesis_delay=args.synthesis_delay, audio_seconds=args.audio_seconds,
+        chunk_seconds=args.chunk_seconds, chunk_interval=args.chunk_interval
+    ))
+    config.voice_engine = "voicevox"
+    config.voicevox_url = base_url
+    config.voicevox_urls = None
+    config.audio_output_sink = "null"
+    config.tts_cache_enabled = False
+    config.tts_stream_min_chars = 1
+    manager = VoiceSynthesisManager()
+
+    try:
+        for label, streaming in (("受信後に再生", False), ("受信中に再生", True)):
+            config.tts_streaming_enabled = streaming
+            latencies = sorted([await first_audio(manager, LONG_TEXT) for _ in range(args.requests)])
+            print(f"{label:8}: 最初の音声まで p50 {latencies[len(latencies) // 2] * 1000:7.1f}ms | "
+                  f"最大 {latencies[-1] * 1000:7.1f}ms")
+        stats = manager.output.stats()
+        print(f"受信しながら再生: {manager.streamed}件 | 途切れ {stats['underruns']}回")
+    finally:
+        await manager.close()
+        stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="音声合成HTTPのベンチマーク")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--synthesis-delay", type=float, default=0.15)
+    parser.add_argument("--stream", action="store_true", help="長い文の最初の音声までの時間を比較")
+    parser.add_argument("--audio-seconds", type=float, default=6.0)
+    parser.add_argument("--chunk-seconds", type=float, default=0.5)
+    parser.add_argument("--chunk-interval", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.stream:
+        await run_stream(args)
+        return
+
+    base_url, stop = start_server_in_thread(voicevox_handler(synthesis_delay=args.synthesis_delay))
+    config.voicevox_url = base_url
+    config.voicevox_max_concurrency = args.concurrency
+    speaker_id = config.voicevox_speaker_id
+    synthesizer = VoicevoxVoiceSynthesizer()
+
+    try:
+        await run("同期HTTP", lambda: synthesize_blocking(base_url, speaker_id), args.requests, args.concurrency)
+        await run("非同期HTTP", lambda: synthesize_async(synthesizer, speaker_id), args.requests, args.concurrency)
+        print(f"非同期HTTP統計: {synthesizer.http.stats()['requests']}件 | "
+              f"再試行 {synthesizer.http.retries}回 | 失敗 {synthesizer.http.failures}回")
+    finally:
+        await synthesizer.aclose()
+        stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -15,6 +15,11 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root / "AI"))
 
 from ai_dialogue_system import AIDialogueSystem
+from voice_synthesis import TTSEnginePool, VoiceSynthesisManager, prewarm_phrases
+from session_manager import SessionManager
+from osc_server import OSCServer
+from speech_input import create_speech_input
+from tts_worker import get_tts_worker
 from config import config, validate_config, print_config
 
 def setup_logging():
@@ -56,18 +61,38 @@ async def main():
             vrchat_osc_ip=config.vrchat_osc_ip,
             vrchat_osc_port=config.vrchat_osc_port
         )
+        voice_manager = VoiceSynthesisManager(ai_system.osc_output) if config.streaming_response else None
+        session_manager = SessionManager(ai_system, voice_manager)
+        osc_server = await start_osc_server(ai_system, session_manager, logger)
+        prewarm_task = None
+        if voice_manager is not None and config.tts_prewarm:
+            # 定型文の音声をバックグラウンドで合成しておく
+            prewarm_task = asyncio.create_task(voice_manager.prewarm(prewarm_phrases()))
+        voice_task = None
+        if config.voice_input_enabled:
+            player_id = ai_system.session.player_id
+            
+            def on_speech_start():
+                # 話し始めたら応答の読み上げを止める（割り込み）
+                if config.barge_in_enabled:
+                    asyncio.ensure_future(session_manager.cancel_turn(player_id, "発話開始"))
+            
+            speech_input = create_speech_input(ai_system.recognizer, on_speech_start=on_speech_start)
+            voice_task = asyncio.create_task(run_voice_input(speech_input, ai_system, session_manager, logger))
         
         print("✅ AIシステムの初期化完了")
         print("\n使用方法:")
         print("- テキスト入力で対話")
+        print("- '@プレイヤー名 メッセージ' で別プレイヤーとして対話")
         print("- 'quit' または 'exit' で終了")
         print("- 'help' でヘルプ表示")
         print("-" * 40)
         
-        # 対話ループ
+        # 対話ループ（入力待ちの間も他プレイヤーのターンは進行する）
+        loop = asyncio.get_running_loop()
         while True:
             try:
-                user_input = input("\n💬 あなた: ").strip()
+                user_input = (await loop.run_in_executor(None, input, "\n💬 あなた: ")).strip()
                 
                 if not user_input:
                     continue
@@ -81,7 +106,12 @@ async def main():
                     continue
                 
                 if user_input.lower() == 'status':
-                    show_status(ai_system)
+                    show_status(ai_system, session_manager, osc_server)
+                    continue
+                
+                if user_input.lower() == 'stop':
+                    cancelled = await session_manager.cancel_all()
+                    print(f"⏹ {cancelled}件の応答を中断しました")
                     continue
                 
                 if user_input.lower().startswith('config'):
@@ -89,32 +119,117 @@ async def main():
                     continue
                 
                 # AI応答の生成
-                logger.info(f"ユーザー入力: {user_input}")
-                response = await ai_system.process_input(user_input)
-                
-                # 応答の表示
-                print(f"🤖 AI: {response.text}")
-                print(f"   感情: {response.emotion.value} | "
-                      f"ジェスチャー: {response.gesture} | "
-                      f"親密度: {response.intimacy_level:.2f}")
+                player_id, text = parse_player_input(user_input, ai_system.session.player_id)
+                logger.info(f"ユーザー入力 [{player_id}]: {text}")
+                if voice_manager is not None:
+                    # ストリーミング時は読み上げと並行して次の入力を受け付ける
+                    session_manager.submit(player_id, text).add_done_callback(
+                        lambda task, player_id=player_id: report_turn(task, player_id, logger)
+                    )
+                else:
+                    response = await session_manager.handle_turn(player_id, text)
+                    show_response(response, player_id)
+                    
+                    # 音声出力
+                    if hasattr(ai_system, 'speak'):
+                        await ai_system.speak(response.text)
+                    
+                    logger.info(f"AI応答: {response.text}")
                 
-                # 音声出力
-                if hasattr(ai_system, 'speak'):
-                    ai_system.speak(response.text)
-                
-                logger.info(f"AI応答: {response.text}")
-                
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\n\n👋 システムを終了します...")
                 break
             except Exception as e:
                 logger.error(f"エラーが発生しました: {e}")
                 print(f"❌ エラー: {e}")
+        
+        if voice_task is not None:
+            voice_task.cancel()
+        if prewarm_task is not None:
+            prewarm_task.cancel()
+        if osc_server is not None:
+            await osc_server.close()
+        await session_manager.shutdown()
+        await ai_system.close()
+        if voice_manager is not None:
+            await voice_manager.close()
+        # 共有の読み上げワーカーは使う側がすべて閉じてから止める
+        get_tts_worker().close()
     
     except Exception as e:
         logger.error(f"システム初期化エラー: {e}")
         print(f"❌ システム初期化エラー: {e}")
 
+async def start_osc_server(ai_system, session_manager, logger):
+    """VRChatからのOSC受信を開始"""
+    if not config.osc_listen_enabled:
+        return None
+    
+    def on_chatbox(address, text="", *args):
+        text = str(text).strip()
+        if not text:
+            return
+        player_id = config.osc_chatbox_player_id
+        logger.info(f"チャットボックス入力 [{player_id}]: {text}")
+        session_manager.submit(player_id, text).add_done_callback(
+            lambda task: report_turn(task, player_id, logger)
+        )
+    
+    server = OSCServer()
+    server.route("/avatar/parameters/*", ai_system.handle_avatar_parameter)
+    server.route("/chatbox/input", on_chatbox)
+    try:
+        await server.start()
+    except OSError as e:
+        logger.error(f"OSC受信を開始できません: {e}")
+        return None
+    return server
+
+async def run_voice_input(speech_input, ai_system, session_manager, logger):
+    """音声入力の認識結果を対話に流す"""
+    player_id = ai_system.session.player_id
+    try:
+        async for transcript in speech_input.transcripts():
+            if not transcript.final:
+                print(f"\n🎤 ...{transcript.text}")
+                continue
+            print(f"\n🎤 あなた: {transcript.text} ({transcript.latency * 1000:.0f}ms)")
+            logger.info(f"音声入力 [{player_id}]: {transcript.text}")
+            session_manager.submit(player_id, transcript.text).add_done_callback(
+                lambda task: report_turn(task, player_id, logger)
+            )
+    except Exception as e:
+        logger.error(f"音声入力エラー: {e}")
+    finally:
+        speech_input.close()
+
+def parse_player_input(user_input, default_player_id):
+    """'@プレイヤー名 メッセージ' 形式の入力を分解"""
+    if user_input.startswith('@'):
+        player_id, _, text = user_input[1:].partition(' ')
+        if player_id and text.strip():
+            return player_id, text.strip()
+    return default_player_id, user_input
+
+def show_response(response, player_id):
+    """応答を表示"""
+    print(f"🤖 AI → {player_id}: {response.text}")
+    print(f"   感情: {response.emotion.value} | "
+          f"ジェスチャー: {response.gesture} | "
+          f"親密度: {response.intimacy_level:.2f}")
+
+def report_turn(task, player_id, logger):
+    """バックグラウンドで完了したターンの結果を表示"""
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error(f"エラーが発生しました: {task.exception()}")
+        print(f"❌ エラー: {task.exception()}")
+        return
+    response = task.result()
+    show_response(response, player_id)
+    logger.info(f"AI応答 [{player_id}]: {response.text}")
+
 def show_help():
     """ヘルプを表示"""
     help_text = """
@@ -123,8 +238,12 @@ def show_help():
 基本コマンド:
   help     - このヘルプを表示
   status   - システム状態を表示
+  stop     - 応答と読み上げを中断
   quit     - システムを終了
 
+マルチプレイヤー:
+  @<名前> <メッセージ>    - 指定プレイヤーのセッションで対話
+
 設定コマンド:
   config show              - 現在の設定を表示
   config personality       - 性格設定を表示
@@ -139,16 +258,97 @@ VRChat連携:
   - VRChatでOSCを有効にしてください
   - アバターにAIコントローラーを設定してください
   - リアルタイムで感情とジェスチャーが反映されます
+  - アバターへのタッチや接近、チャットボックス入力にも反応します
 """
     print(help_text)
 
-def show_status(ai_system):
+def show_status(ai_system, session_manager, osc_server=None):
     """システム状態を表示"""
     print("\n📊 システム状態")
     print(f"感情状態: {ai_system.emotion_state.value}")
+    levels = ai_system.emotion_dynamics.levels(ai_system.session.player_id)
+    active = [f"{emotion} {level:.2f}" for emotion, level in sorted(levels.items(), key=lambda item: -item[1]) if level > 0.01]
+    if active:
+        print(f"感情の強さ: {' / '.join(active)}")
     print(f"親密度: {ai_system.intimacy_level:.2f}")
     print(f"会話履歴: {len(ai_system.conversation_history)}件")
-    print(f"OSC接続: {ai_system.osc_client._sock is not None}")
+    sender_stats = ai_system.osc_sender.stats()
+    print(f"OSC接続: {sender_stats['connected']} | 送信 {sender_stats['sent']} / "
+          f"破棄 {sender_stats['dropped']} | キュー {sender_stats['queue_depth']} | "
+          f"送信遅延p95 {sender_stats['send_latency']['p95_ms']:.2f}ms")
+    osc_stats = ai_system.osc_output.stats()
+    print(f"OSC送信: {osc_stats['messages_sent']}件 (バンドル {osc_stats['bundles_sent']}) | "
+          f"未変更で省略 {osc_stats['unchanged_dropped']} | 統合 {osc_stats['coalesced']} | "
+          f"間隔制限 {osc_stats['rate_limited']}")
+    if osc_server is not None:
+        server_stats = osc_server.stats()
+        print(f"OSC受信: {server_stats['received']}件 | 振り分け {server_stats['dispatched']} | "
+              f"該当なし {server_stats['unmatched']} | デコード失敗 {server_stats['decode_errors']}")
+    voice_manager = session_manager.voice_manager
+    if voice_manager is not None and voice_manager.cache is not None:
+        stats = voice_manager.cache.stats()
+        print(f"音声キャッシュ: {stats['entries']}件 ({stats['bytes'] / 1024 / 1024:.1f}MB) | "
+              f"ヒット率: {stats['hit_rate']:.1%} | 読み出しp95: {stats['hit_p95_ms']:.2f}ms")
+    pool = getattr(voice_manager, "synthesizer", None)
+    if isinstance(pool, TTSEnginePool):
+        pool_stats = pool.stats()
+        print(f"音声合成エンジン: 合成し直し {pool_stats['failovers']}回 | "
+              f"代替エンジン {pool_stats['fallbacks']}回")
+        for member in pool_stats["members"]:
+            print(f"  {member['name']}: {member['state']} | 処理中 {member['outstanding']} | "
+                  f"{member['requests']}件 / 失敗 {member['failures']} | p95 {member['latency']['p95_ms']:.0f}ms")
+        first = pool.members[0].synthesizer
+        if hasattr(first, "query_cache_stats"):
+            stats = first.query_cache_stats()
+            print(f"音声クエリキャッシュ: {stats['entries']}件 | ヒット率: {stats['hit_rate']:.1%}")
+    if voice_manager is not None and voice_manager.dsp is not None and voice_manager.dsp.latency.count:
+        stats = voice_manager.dsp.stats()
+        print(f"音声処理: {stats['count']}文 | p50 {stats['p50_ms']:.1f}ms / p95 {stats['p95_ms']:.1f}ms")
+    if voice_manager is not None and voice_manager.lip_sync is not None and voice_manager.lip_sync.tracks:
+        stats = voice_manager.lip_sync.stats()
+        print(f"リップシンク: {stats['tracks']}件 / {stats['frames_sent']}フレーム "
+              f"(飛ばし {stats['frames_skipped']}) | 遅れ p95 {stats['lag']['p95_ms']:.1f}ms | "
+              f"解析 p95 {stats['analysis']['p95_ms']:.1f}ms (実時間の{stats['analysis']['speed']:.0f}倍)")
+    if voice_manager is not None and voice_manager.output is not None:
+        stats = voice_manager.output.stats()
+        print(f"音声出力: {stats['sink']} | 再生 {stats['clips']}件 / 中断 {stats['stopped']} | "
+              f"再生開始まで p95 {stats['start_latency']['p95_ms']:.1f}ms")
+    if voice_manager is not None and voice_manager.streamed:
+        stats = voice_manager.stream_first_audio.summary()
+        print(f"受信しながら再生: {voice_manager.streamed}文 | 最初の音声まで p50 {stats['p50_ms']:.0f}ms / "
+              f"p95 {stats['p95_ms']:.0f}ms | 途切れ {voice_manager.output.underruns}回")
+    tts_stats = ai_system.tts_worker.stats()
+    if tts_stats["jobs"]:
+        print(f"pyttsx3: 読み上げ {tts_stats['jobs']}件 / runAndWait {tts_stats['batches']}回 "
+              f"(1回あたり {tts_stats['jobs_per_batch']:.1f}件) | 取り消し {tts_stats['cancelled']}")
+    print(f"セッション数: {len(session_manager.sessions)} | 実行中ターン: {session_manager.active_turns}")
+    barge_in = session_manager.barge_in_stats()
+    if barge_in["cancellations"]:
+        print(f"割り込み: {barge_in['cancellations']}回 | "
+              f"停止まで p50 {barge_in['cancel_latency']['p50_ms']:.1f}ms / "
+              f"p95 {barge_in['cancel_latency']['p95_ms']:.1f}ms | "
+              f"破棄した文 {barge_in.get('tts_discarded', 0)}")
+    
+    stage_summary = ai_system.stage_metrics.summary()
+    if stage_summary:
+        print("ステージ完了時刻 (p50 / p95):")
+        for name, stats in stage_summary.items():
+            print(f"  {name:14}: {stats['p50_ms']:7.1f}ms / {stats['p95_ms']:7.1f}ms")
+    
+    if ai_system.racer is not None:
+        stats = ai_system.racer.stats()
+        first_audio = stats["first_audio"]
+        print(f"応答レイテンシ(最初の発話): p50 {first_audio['p50_ms']:.0f}ms | "
+              f"p95 {first_audio['p95_ms']:.0f}ms | p99 {first_audio['p99_ms']:.0f}ms | "
+              f"予備リクエスト {stats['hedged']}回 / つなぎ {stats['fillers']}回")
+    
+    if ai_system.response_cache is not None:
+        stats = ai_system.response_cache.stats()
+        print(f"応答キャッシュ: {stats['entries']}件 | "
+              f"ヒット率: {stats['hit_rate']:.1%} "
+              f"(完全一致 {stats['exact_hits']} / 類似 {stats['similar_hits']} / ミス {stats['misses']}) | "
+              f"検索p95: {stats['lookup_p95_ms']:.2f}ms | "
+              f"メモリ: {stats['memory_bytes'] / 1024:.0f}KB")
     
     print("\n性格特性:")
     for trait, value in ai_system.personality_traits.items():
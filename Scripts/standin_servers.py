@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク用の代替サーバー
+外部サービスの代わりにローカルで動く最小限のHTTPサーバー
+"""
+
+import asyncio
+import io
+import json
+import random
+import threading
+import wave
+import zipfile
+from typing import Awaitable, Callable, Dict, Tuple
+
+# (メソッド, パス, クエリ, ボディ) -> None（ハンドラがwriterへ直接書き込む）
+Handler = Callable[[str, str, Dict[str, str], bytes, asyncio.StreamWriter], Awaitable[None]]
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    """HTTPリクエストを読み込む（keep-alive対応）"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    body = b""
+    length = int(headers.get("content-length", "0"))
+    if length:
+        body = await reader.readexactly(length)
+
+    path, _, query_string = target.partition("?")
+    query = {}
+    for pair in query_string.split("&"):
+        if "=" in pair:
+            name, value = pair.split("=", 1)
+            query[name] = value
+    return method, path, query, body
+
+
+def write_response(writer: asyncio.StreamWriter, body: bytes, content_type: str = "application/json",
+                   status: str = "200 OK"):
+    """固定長のレスポンスを書き込む"""
+    writer.write(
+        f"HTTP/1.1 {status}\r\ncontent-type: {content_type}\r\n"
+        f"content-length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+def write_chunk_header(writer: asyncio.StreamWriter, content_type: str):
+    """チャンク転送のレスポンスヘッダーを書き込む"""
+    writer.write(
+        f"HTTP/1.1 200 OK\r\ncontent-type: {content_type}\r\n"
+        f"transfer-encoding: chunked\r\n\r\n".encode("latin-1")
+    )
+
+
+def write_chunk(writer: asyncio.StreamWriter, data: bytes):
+    """1チャンクを書き込む（空なら終端）"""
+    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+async def start_server(handler: Handler, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+    """ハンドラでHTTPサーバーを起動"""
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                method, path, query, body = await _read_request(reader)
+                await handler(method, path, query, body, writer)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # クライアントの切断やシャットダウン時のキャンセルは正常終了として扱う
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve, host, port)
+
+
+def server_url(server: asyncio.AbstractServer) -> str:
+    """サーバーのベースURL"""
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}"
+
+
+def start_server_in_thread(handler: Handler) -> Tuple[str, Callable[[], None]]:
+    """別スレッドのイベントループでサーバーを起動し、(URL, 停止関数) を返す
+
+    計測対象のイベントループが止まってもサーバーは応答し続ける
+    """
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        holder["server"] = loop.run_until_complete(start_server(handler))
+        ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+
+    async def shutdown():
+        # keep-aliveで待機中の接続も含めて終了させる
+        holder["server"].close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=1.0)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=1.0)
+        loop.close()
+
+    return server_url(holder["server"]), stop
+
+
+def llm_handler(tokens=("こんにちは！", "今日は", "いい天気", "ですね♪"),
+                first_token_delay: float = 0.3, slow_probability: float = 0.1,
+                slow_delay: float = 4.0, token_interval: float = 0.05) -> Handler:
+    """OpenAI互換のChat Completions APIの代替
+
+    一定の確率で最初のトークンが大きく遅れる（テールレイテンシの再現）
+    """
+    async def handle(method, path, query, body, writer):
+        request = json.loads(body or b"{}")
+        delay = slow_delay if random.random() < slow_probability else first_token_delay
+        await asyncio.sleep(delay)
+
+        if not request.get("stream"):
+            payload = {
+                "id": "standin", "object": "chat.completion", "created": 0, "model": "standin",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}]
+            }
+            write_response(writer, json.dumps(payload).encode("utf-8"))
+            return
+
+        write_chunk_header(writer, "text/event-stream")
+        for token in tokens:
+            chunk = {
+                "id": "standin", "object": "chat.completion.chunk", "created": 0, "model": "standin",
+                "choices": [{"index": 0, "finish_reason": None, "delta": {"content": token}}]
+            }
+            write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await writer.drain()
+            await asyncio.sleep(token_interval)
+        write_chunk(writer, b"data: [DONE]\n\n")
+        write_chunk(writer, b"")
+
+    return handle
+
+
+def make_wav(seconds: float, sample_rate: int = 24000) -> bytes:
+    """無音のWAVデータ"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def voicevox_handler(query_delay: float = 0.02, synthesis_delay: float = 0.15,
+                     audio_seconds: float = 1.0, chunk_seconds: float = 0.0,
+                     chunk_interval: float = 0.0) -> Handler:
+    """VOICEVOXエンジンの /audio_query・/synthesis・/multi_synthesis・/version の代替
+
+    chunk_seconds を指定すると、/synthesis はWAVを chunk_seconds 分ずつチャンク転送で返す
+    （最初のチャンクは synthesis_delay 後、以降は chunk_interval ごと）
+    """
+    audio = make_wav(audio_seconds)
+    header_size = len(audio) - int(audio_seconds * 24000) * 2
+    chunk_size = int(chunk_seconds * 24000) * 2
+
+    async def handle(method, path, query, body, writer):
+        if path == "/audio_query":
+            await asyncio.sleep(query_delay)
+            payload = {
+                "accent_phrases": [], "speedScale": 1.0, "pitchScale": 0.0,
+                "intonationScale": 1.0, "volumeScale": 1.0, "prePhonemeLength": 0.1,
+                "postPhonemeLength": 0.1, "outputSamplingRate": 24000, "outputStereo": False,
+                "kana": query.get("text", "")
+            }
+            write_response(writer, json.dumps(payload).encode("utf-8"))
+        elif path == "/synthesis" and chunk_size:
+            await asyncio.sleep(synthesis_delay)
+            write_chunk_header(writer, "audio/wav")
+            for start in range(0, len(audio) - header_size, chunk_size):
+                if start:
+                    await asyncio.sleep(chunk_interval)
+                end = header_size + start + chunk_size
+                write_chunk(writer, audio[0 if not start else header_size + start:end])
+                await writer.drain()
+            write_chunk(writer, b"")
+        elif path == "/synthesis":
+            await asyncio.sleep(synthesis_delay)
+            write_response(writer, audio, content_type="audio/wav")
+        elif path == "/version":
+            write_response(writer, b'"0.0.0-standin"')
+        elif path == "/multi_synthesis":
+            # 件数に関わらず1回分の遅延で、001.wav から順に格納したZIPを返す
+            await asyncio.sleep(synthesis_delay)
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as z:
+                for i in range(len(json.loads(body))):
+                    z.writestr(f"{i + 1:03}.wav", audio)
+            write_response(writer, archive.getvalue(), content_type="application/zip")
+        else:
+            write_response(writer, b"{}", status="404 Not Found")
+
+    return handle
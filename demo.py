@@ -7,12 +7,27 @@
 
 import asyncio
 import random
+import sys
 import time
 from datetime import datetime
+from pathlib import Path
+
+# 辞書マッチャー（標準ライブラリのみで動作）
+sys.path.append(str(Path(__file__).parent / "AI"))
+from lexicon import Lexicon
 
 class SimpleAIGirl:
     """シンプルなAI美少女クラス"""
     
+    # 応答タイプ判定用の辞書（クラス定義時に一度だけコンパイル）
+    INTENT_PRIORITY = ("greeting", "compliment", "love", "question")
+    INTENT_LEXICON = Lexicon({
+        "greeting": ["こんにちは", "はじめまして", "おはよう", "こんばんは", "hello", "hi"],
+        "compliment": ["かわいい", "きれい", "美しい", "素敵", "可愛い", "綺麗"],
+        "love": ["好き", "愛してる", "大好き", "love", "愛"],
+        "question": ["？", "?", "どう思う", "どうですか", "なぜ", "why", "how"]
+    })
+    
     def __init__(self, name="あいちゃん"):
         self.name = name
         self.emotion = "calm"
@@ -76,23 +91,7 @@ class SimpleAIGirl:
     
     def analyze_input(self, text):
         """入力を分析して適切な応答タイプを決定"""
-        text_lower = text.lower()
-        
-        greetings = ["こんにちは", "はじめまして", "おはよう", "こんばんは", "hello", "hi"]
-        compliments = ["かわいい", "きれい", "美しい", "素敵", "可愛い", "綺麗"]
-        love_words = ["好き", "愛してる", "大好き", "love", "愛"]
-        questions = ["？", "?", "どう思う", "どうですか", "なぜ", "why", "how"]
-        
-        if any(word in text_lower for word in greetings):
-            return "greeting"
-        elif any(word in text_lower for word in compliments):
-            return "compliment"
-        elif any(word in text_lower for word in love_words):
-            return "love"
-        elif any(word in text_lower for word in questions):
-            return "question"
-        else:
-            return "default"
+        return self.INTENT_LEXICON.classify(text, self.INTENT_PRIORITY, default="default")
     
     def update_emotion_and_intimacy(self, response_type):
         """感情と親密度を更新"""